@@ -1,39 +1,113 @@
+import json
 import streamlit as st
 import requests
-from utils import frontent_utils
+
+BACKEND_URL = "http://127.0.0.1:8000"
 
 st.set_page_config(page_title="Social Support Application Automation", layout="wide")
 st.title("Social Support Application Automation")
 st.write("Upload applicant documents (PDF/Image) and check eligibility for social support.")
 
-uploaded_files = st.file_uploader("Upload Application form, Passport, Salary slip and Bank Statement", 
+# Stored on the backend after the first evaluation; re-uploads and follow-up
+# questions only rerun what they change
+if st.button("New application"):
+    st.session_state.pop("application_id", None)
+application_id = st.session_state.get("application_id")
+
+uploaded_files = st.file_uploader("Upload Application form, Passport, Salary slip and Bank Statement",
                                  type=["pdf", "png", "jpg", "jpeg"],
                                  accept_multiple_files=True)
 
-if uploaded_files:
-    st.info("📄 Extracting Applicant Information...")
-    document_info = frontent_utils.process_uploaded_files(uploaded_files)
-    print(document_info)
-    payload = {"data": document_info, "followup_query": ""}
 
-    try:
-        st.info("🏛 Evaluating Eligibility...")
-        response = requests.post("http://127.0.0.1:8000/check_eligibility", json=payload)
+def show_extracted(data):
+    st.subheader("Extracted Information")
+    st.json(data.get("extracted_data", {}), expanded=False)
+
+
+def show_eligibility(data):
+    st.subheader("Eligibility Check")
+    if data.get("eligibility"):
+        st.markdown("Meets the support criteria, validating documents...")
+    else:
+        st.markdown("Does not meet the support criteria.")
+
+
+def show_validation(data):
+    validation = data.get("validation_results", {})
+    st.subheader("Document Validation")
+    st.markdown(f"- Age: **{validation.get('age_validation', '-')}**\n"
+                f"- Income: **{validation.get('income_validation', '-')}**")
 
-        if response.status_code == 200:
-            result = response.json()
 
-            final_status = result.get("final_status", "")
-            reason = result.get("reason", "")
-            status = "✅ Eligible" if final_status == "eligible" else "❌ Not Eligible"
+def show_decision(result):
+    final_status = result.get("final_status", "")
+    reason = result.get("reason", "")
+    status = {"eligible": "✅ Eligible", "needs review": "⚠️ Needs Manual Review"}.get(final_status, "❌ Not Eligible")
 
-            st.subheader("Final Decision")
-            st.markdown(f"### {status}")
-            st.subheader("Reason")
-            st.markdown(f"##### {reason}")
+    st.subheader("Final Decision")
+    st.markdown(f"### {status}")
+    st.subheader("Reason")
+    st.markdown(f"##### {reason}")
 
-        else:
-            st.error(f"Error: {response.status_code}")
+
+# Each pipeline stage renders into its own slot as soon as it finishes
+RENDERERS = {
+    "data_extractor": show_extracted,
+    "eligibility_checker": show_eligibility,
+    "data_validator": show_validation,
+}
+
+if uploaded_files:
+    # The backend OCRs the raw files; nothing is written or OCRed on the UI host
+    files = [("files", (file.name, file.getvalue(), file.type)) for file in uploaded_files]
+
+    try:
+        progress = st.info("📄 Extracting Applicant Information...")
+        slots = {name: st.empty() for name in RENDERERS}
+        decision_slot = st.empty()
+
+        # requests leaves out a None application_id, which starts a new application
+        with requests.post(f"{BACKEND_URL}/check_eligibility/upload", files=files,
+                           data={"followup_query": "", "application_id": application_id}, stream=True) as response:
+            if response.status_code != 200:
+                st.error(f"Error: {response.status_code}")
+            else:
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+                    event = json.loads(line)
+                    name = event.get("event")
+                    if name == "ocr":
+                        progress.info("🏛 Evaluating Eligibility...")
+                    elif name in RENDERERS:
+                        with slots[name].container():
+                            RENDERERS[name](event.get("data") or {})
+                    elif name == "done":
+                        progress.empty()
+                        if event.get("application_id"):
+                            st.session_state["application_id"] = application_id = event["application_id"]
+                        with decision_slot.container():
+                            show_decision(event.get("final_response") or {})
+                    elif name == "error":
+                        progress.empty()
+                        st.error(f"Error: {event.get('status')} {event.get('detail')}")
 
     except Exception as e:
-        st.error(f"Request failed: {e}")
\ No newline at end of file
+        st.error(f"Request failed: {e}")
+
+if application_id:
+    st.caption(f"Application {application_id}")
+    question = st.text_input("Ask a follow-up question about this application")
+    if question:
+        try:
+            # Only the response stage runs for a question on a stored application
+            response = requests.post(f"{BACKEND_URL}/check_eligibility/stream", json={
+                "data": {}, "followup_query": question, "application_id": application_id})
+            events = [json.loads(line) for line in response.text.splitlines() if line]
+            done = next((e for e in events if e.get("event") == "done"), None)
+            if done is None:
+                st.error(f"Error: {response.status_code}")
+            else:
+                st.markdown((done.get("final_response") or {}).get("reason", ""))
+        except Exception as e:
+            st.error(f"Request failed: {e}")
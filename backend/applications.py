@@ -0,0 +1,146 @@
+"""
+Stored applications for follow-up questions and document resubmissions.
+
+Each application id is a LangGraph thread whose AppState is checkpointed in
+SQLite. A new turn is turned into the smallest state update that gets the
+graph to the right node:
+
+    new application         -> full run from data_extractor
+    replaced document(s)    -> re-extraction of what those documents supply;
+                               eligibility only reruns when its inputs changed
+    follow-up question only -> response_generator
+"""
+import asyncio
+import uuid
+from contextlib import asynccontextmanager
+from typing import Any, Dict, Optional, Tuple
+from config import APPLICATION_DB
+from duplicates import get_index, record_application
+from graph import compile_graph, evaluater
+
+# Reset at the start of every turn, they describe one pass through the graph
+TURN_RESET = {"next": None, "hops": 0, "llm_routing_calls": 0, "routing_ms": 0.0}
+
+# Fields returned by GET /applications/{id} (the raw OCR text stays out)
+SUMMARY_FIELDS = ("extracted_data", "extraction", "income_features", "duplicate_matches", "eligibility",
+                  "validation_results", "final_response")
+
+
+def plan_turn(previous: Dict[str, Any], applicant_info: Dict[str, str], followup_query: str) -> Tuple[dict, str]:
+    """(state update, turn kind) for a turn against the stored state `previous`."""
+    applicant_info = {key: text for key, text in (applicant_info or {}).items() if text}
+    if not previous.get("applicant_info"):
+        return {"applicant_info": applicant_info, "followup_query": followup_query, **TURN_RESET}, "new"
+
+    stored = previous["applicant_info"]
+    changed = sorted(key for key, text in applicant_info.items() if stored.get(key) != text)
+    update = {"followup_query": followup_query, **TURN_RESET}
+    if changed:
+        # DataExtractor sees the previous extracted_data and only redoes
+        # the fields these documents can supply
+        update.update(applicant_info={**stored, **applicant_info}, changed_documents=changed)
+        return update, "resubmission"
+    return update, "followup" if followup_query else "unchanged"
+
+
+class ApplicationStore:
+    """The graph compiled with an SQLite checkpointer, opened in the FastAPI lifespan."""
+
+    def __init__(self, path: str = APPLICATION_DB):
+        self.path = path
+        self.graph = None
+        self._saver_cm = None
+        # application id -> [lock, turns holding or waiting for it]
+        self._locks = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self.graph is not None
+
+    async def open(self) -> None:
+        if not self.path:
+            return
+        try:
+            from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+        except ImportError:
+            print("langgraph-checkpoint-sqlite is not installed, applications are not stored")
+            return
+        self._saver_cm = AsyncSqliteSaver.from_conn_string(self.path)
+        saver = await self._saver_cm.__aenter__()
+        await saver.setup()
+        self.graph = compile_graph(checkpointer=saver)
+        print(f"🗂 Application state stored in {self.path}")
+
+    async def close(self) -> None:
+        if self._saver_cm is not None:
+            await self._saver_cm.__aexit__(None, None, None)
+        self.graph = self._saver_cm = None
+
+    @asynccontextmanager
+    async def lock(self, application_id: str):
+        # One turn per application at a time (per worker process). The lock is
+        # dropped once no turn holds or waits for it, so ids don't pile up
+        entry = self._locks.setdefault(application_id, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0 and self._locks.get(application_id) is entry:
+                del self._locks[application_id]
+
+    @staticmethod
+    def config(application_id: str) -> dict:
+        return {"configurable": {"thread_id": application_id}}
+
+    async def load(self, application_id: str) -> Dict[str, Any]:
+        snapshot = await self.graph.aget_state(self.config(application_id))
+        return dict(snapshot.values or {})
+
+    @asynccontextmanager
+    async def turn(self, application_id: Optional[str], applicant_info: dict, followup_query: str,
+                   image_hashes: Optional[dict] = None):
+        """
+        Yields (application id, graph, graph input, run kwargs) for one
+        evaluation; a missing id starts a new application. Without a store it
+        is a plain stateless run and the id is None. image_hashes: pHash of
+        the image uploads by document (see duplicates.upload_image_hashes).
+        """
+        if not self.enabled:
+            yield None, evaluater, {"applicant_info": applicant_info, "followup_query": followup_query,
+                                    "image_hashes": image_hashes or {}}, {}
+            return
+        application_id = application_id or uuid.uuid4().hex
+        async with self.lock(application_id):
+            previous = await self.load(application_id)
+            update, kind = plan_turn(previous, applicant_info, followup_query)
+            update["application_id"] = application_id
+            if image_hashes:
+                update["image_hashes"] = {**(previous.get("image_hashes") or {}), **image_hashes}
+            print(f"🗂 Application {application_id}: {kind} turn"
+                  + (f", changed {update['changed_documents']}" if kind == "resubmission" else ""))
+            # One checkpoint write when the turn ends instead of one per node
+            yield application_id, self.graph, update, {"config": self.config(application_id), "durability": "exit"}
+            if kind in ("new", "resubmission"):
+                # Only reached when the run finished (not on a timeout or
+                # disconnect), so the client has the id a retry would reuse
+                state = await self.load(application_id)
+                await asyncio.to_thread(record_application, application_id, state)
+
+    async def summary(self, application_id: str) -> Optional[Dict[str, Any]]:
+        state = await self.load(application_id)
+        if not state:
+            return None
+        return {"application_id": application_id,
+                "documents": sorted(state.get("applicant_info") or {}),
+                **{key: state.get(key) for key in SUMMARY_FIELDS}}
+
+    async def delete(self, application_id: str) -> None:
+        await self.graph.checkpointer.adelete_thread(application_id)
+        index = get_index()
+        if index is not None:
+            await asyncio.to_thread(index.forget, application_id)
+
+
+applications = ApplicationStore()
@@ -0,0 +1,202 @@
+"""
+Offline batch evaluation for application backlogs.
+
+Takes a folder with one sub-folder per applicant (documents named the way the
+upload form expects: *application*, *passport*, *salary*, *bank*) or a
+manifest.jsonl written by utils/data_prep.py, and runs OCR -> graph for every
+applicant. OCR and the graph run as two pipelined worker pools, results are
+appended to the output as each applicant finishes, and a rerun skips
+applicants already in the output.
+
+    python batch.py ../applications results.jsonl
+    python batch.py --manifest ../data/synthetic/manifest.jsonl results.parquet --concurrency 16
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+
+from config import MAX_INFLIGHT_REQUESTS
+from duplicates import record_application
+from graph import evaluater
+from tracing import start_trace
+from utils.frontent_utils import document_key
+from utils.ocr_utils import OCR_WORKERS, extract_texts, get_ocr_pool
+
+DOCUMENT_EXTENSIONS = (".pdf", ".png", ".jpg", ".jpeg")
+
+# State keys written for each applicant
+RESULT_KEYS = ("final_response", "eligibility", "extracted_data", "extraction", "income_features", "duplicate_matches",
+               "validation_results")
+
+
+def discover(root: str) -> list:
+    """One application per sub-folder of root, documents grouped by document_key."""
+    applications = []
+    for entry in sorted(os.scandir(root), key=lambda e: e.name):
+        if not entry.is_dir():
+            continue
+        paths = {}
+        for file_name in sorted(os.listdir(entry.path)):
+            key = document_key(file_name)
+            if key and file_name.lower().endswith(DOCUMENT_EXTENSIONS):
+                paths.setdefault(key, []).append(os.path.join(entry.path, file_name))
+        if paths:
+            applications.append({"applicant_id": entry.name, "paths": paths})
+        else:
+            print(f"Skipping {entry.path}: no recognised documents")
+    return applications
+
+
+def load_manifest(path: str, use_texts: bool = False) -> list:
+    """Manifest lines with applicant_id and document paths (relative to the manifest) or texts."""
+    base = os.path.dirname(os.path.abspath(path))
+    applications = []
+    with open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            paths = {} if use_texts else {key: [os.path.join(base, p)] for key, p in (record.get("paths") or {}).items()}
+            applications.append({"applicant_id": str(record["applicant_id"]), "paths": paths,
+                                 "texts": None if paths else record.get("texts")})
+    return applications
+
+
+def completed_ids(out_path: str) -> set:
+    """Applicants already written successfully; failed ones are retried."""
+    done = set()
+    if not os.path.exists(out_path):
+        return done
+    with open(out_path) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # partial line from an interrupted run
+            if record.get("status") == "ok":
+                done.add(record["applicant_id"])
+    return done
+
+
+def ocr_application(application: dict, workers: int) -> dict:
+    files = [p for paths in application["paths"].values() for p in paths]
+    doc_types = {p: key for key, paths in application["paths"].items() for p in paths}
+    texts = extract_texts(files, workers=workers, doc_types=doc_types)
+    return {key: "\n".join(texts[p] for p in paths) for key, paths in application["paths"].items()}
+
+
+async def run_batch(applications: list, out, concurrency: int, ocr_concurrency: int, ocr_workers: int) -> dict:
+    # Bounded hand-off: OCR stays at most a couple of batches ahead of the graph
+    ready = asyncio.Queue(maxsize=concurrency * 2)
+    pending = iter(applications)
+    stats = {"ok": 0, "error": 0}
+    start = time.perf_counter()
+
+    async def ocr_worker():
+        for application in pending:
+            t = time.perf_counter()
+            try:
+                texts = application.get("texts") or await asyncio.to_thread(ocr_application, application, ocr_workers)
+                await ready.put((application, texts, None, (time.perf_counter() - t) * 1000))
+            except Exception as e:
+                await ready.put((application, None, e, 0.0))
+
+    async def graph_worker():
+        while True:
+            item = await ready.get()
+            if item is None:
+                return
+            application, texts, error, ocr_ms = item
+            record = {"applicant_id": application["applicant_id"], "ocr_ms": round(ocr_ms, 1)}
+            t = time.perf_counter()
+            if error is None:
+                try:
+                    with start_trace("batch") as trace:
+                        # Looked up, then indexed for duplicates, under the applicant id
+                        result = await evaluater.ainvoke({"applicant_info": texts, "followup_query": "",
+                                                          "application_id": str(application["applicant_id"])})
+                    await asyncio.to_thread(record_application, str(application["applicant_id"]), result)
+                    record.update(status="ok", request_id=trace.request_id,
+                                  **{key: result.get(key) for key in RESULT_KEYS})
+                except Exception as e:
+                    error = e
+            if error is not None:
+                record.update(status="error", error=f"{type(error).__name__}: {error}")
+            record["graph_ms"] = round((time.perf_counter() - t) * 1000, 1)
+
+            out.write(json.dumps(record, default=str) + "\n")
+            out.flush()
+            stats[record["status"]] += 1
+            done = stats["ok"] + stats["error"]
+            if done % 25 == 0 or done == len(applications):
+                rate = done / (time.perf_counter() - start)
+                print(f"[{done}/{len(applications)}] {rate:.2f} apps/s, {stats['error']} errors")
+
+    graph_tasks = [asyncio.create_task(graph_worker()) for _ in range(concurrency)]
+    await asyncio.gather(*(ocr_worker() for _ in range(ocr_concurrency)))
+    for _ in graph_tasks:
+        await ready.put(None)
+    await asyncio.gather(*graph_tasks)
+    return stats
+
+
+def write_parquet(jsonl_path: str, parquet_path: str) -> None:
+    import pandas as pd
+    with open(jsonl_path) as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    # Retried applicants appear more than once; the last attempt wins
+    frame = pd.DataFrame(records).drop_duplicates("applicant_id", keep="last")
+    # Nested results (dicts, and lists such as duplicate_matches that are empty
+    # for most applicants) go in as JSON strings, so every column has one type
+    for column in RESULT_KEYS:
+        if column in frame:
+            frame[column] = frame[column].map(
+                lambda v: json.dumps(v, default=str) if isinstance(v, (dict, list)) else v)
+    frame.to_parquet(parquet_path, index=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", nargs="?", help="Folder with one sub-folder per applicant")
+    parser.add_argument("output", help="Results file (.jsonl, or .parquet written once the run completes)")
+    parser.add_argument("--manifest", help="manifest.jsonl instead of a folder")
+    parser.add_argument("--concurrency", type=int, default=MAX_INFLIGHT_REQUESTS, help="Graph runs at once")
+    parser.add_argument("--ocr-concurrency", type=int, default=2, help="Applicants OCRed at once")
+    parser.add_argument("--ocr-workers", type=int, default=OCR_WORKERS, help="Tesseract worker processes")
+    parser.add_argument("--use-texts", action="store_true", help="Use the texts stored in the manifest, no OCR")
+    parser.add_argument("--fresh", action="store_true", help="Ignore earlier results instead of resuming")
+    args = parser.parse_args()
+
+    if bool(args.input) == bool(args.manifest):
+        parser.error("give either an input folder or --manifest")
+    applications = load_manifest(args.manifest, args.use_texts) if args.manifest else discover(args.input)
+
+    # Results stream to JSONL, which doubles as the resume checkpoint
+    parquet = args.output.endswith(".parquet")
+    jsonl_path = args.output[:-len(".parquet")] + ".partial.jsonl" if parquet else args.output
+    if args.fresh and os.path.exists(jsonl_path):
+        os.remove(jsonl_path)
+    done = completed_ids(jsonl_path)
+    todo = [a for a in applications if a["applicant_id"] not in done]
+    print(f"{len(applications)} applications, {len(done)} already done, {len(todo)} to run")
+
+    if args.ocr_workers > 1:
+        get_ocr_pool(args.ocr_workers)  # create once, before OCR threads share it
+
+    start = time.perf_counter()
+    with open(jsonl_path, "a") as out:
+        stats = asyncio.run(run_batch(todo, out, args.concurrency, args.ocr_concurrency, args.ocr_workers))
+    print(f"✅ {stats['ok']} ok, {stats['error']} errors in {time.perf_counter() - start:.1f}s -> {jsonl_path}")
+
+    if parquet:
+        try:
+            write_parquet(jsonl_path, args.output)
+            print(f"✅ Parquet saved at {args.output}")
+        except ImportError as e:
+            print(f"Parquet needs pyarrow or fastparquet ({e}); results kept in {jsonl_path}")
+
+
+if __name__ == "__main__":
+    main()
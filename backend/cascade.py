@@ -0,0 +1,217 @@
+"""
+Per-stage model cascades.
+
+cascade() / acascade() stand in for chat() / achat(): the models configured
+for the stage (LLM_CASCADES) are tried in order, smallest first. Each reply
+but the last model's goes through the stage's check, which raises when the
+reply is unusable (no JSON, missing keys) and returns a list of problems when
+it parses but can't be trusted (numbers that don't parse, an age that
+contradicts the passport, a status that contradicts the rules). An error,
+an unusable reply or any problem escalates the call to the next model; the
+last model's reply is returned as is, exactly as without a cascade.
+
+Every call in the cascade gets the stage deadline of its own; the request
+deadline still bounds the whole run. A model Ollama doesn't have (404) is
+left out of the cascade from then on.
+
+The cascade itself is a generator (_tiers) that yields the model to call
+and is sent back its reply, so the sync and async versions share every
+decision and differ only in the call. Stages do the same one level up: a
+stage generator yields Call requests and run_stage() / arun_stage() answer
+them with cascade() / acascade().
+
+Per stage: social_support_llm_cascade_total (by model and outcome),
+social_support_llm_escalations_total (by reason),
+social_support_llm_cascade_seconds, and cascade_stats() for GET /cascade.
+"""
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Callable, Dict, Generator, List, NamedTuple, Optional
+
+import ollama
+
+from config import LLM_CASCADES
+from llm_client import MODEL_NAME, achat, chat, warm_model
+from tracing import metrics, record
+
+# reply -> problems; raises when the reply can't be used at all
+Check = Callable[[str], List[str]]
+
+
+class Call(NamedTuple):
+    """A cascade call a stage asks for; its reply, or the error, is sent back."""
+    messages: List[Dict[str, str]]
+    stage: str
+    check: Optional[Check] = None
+    options: Dict[str, Any] = {}
+
+metrics.describe("social_support_llm_cascade_total", "counter", "Cascade tiers answered, by model and outcome")
+metrics.describe("social_support_llm_escalations_total", "counter", "Replies passed on to the next model, by reason")
+metrics.describe("social_support_llm_cascade_seconds", "histogram", "Cascade wall time, by stage and answering model")
+
+# Models Ollama doesn't have; skipped from the first 404 on
+_missing = set()
+
+_stats = defaultdict(lambda: {"calls": 0, "escalated": 0, "seconds": 0.0, "answered_by": defaultdict(int)})
+_stats_lock = threading.Lock()
+
+
+def models_for(stage: str) -> List[str]:
+    configured = LLM_CASCADES.get(stage) or [MODEL_NAME]
+    # Never leave a stage without a model, even if Ollama has none of them
+    return [m for m in configured if m not in _missing] or configured[-1:]
+
+
+def all_models() -> List[str]:
+    """Every configured model once, in first-use order."""
+    return list(dict.fromkeys(m for models in LLM_CASCADES.values() for m in models))
+
+
+def _note_missing(model: str, error: Exception) -> None:
+    if isinstance(error, ollama.ResponseError) and error.status_code == 404 and model not in _missing:
+        _missing.add(model)
+        print(f"[WARN] Ollama has no model {model} ({error}), leaving it out of the cascade")
+
+
+def _verdict(content: str, check: Optional[Check]) -> Optional[tuple]:
+    """None to accept `content`, else (reason label, detail) to escalate it."""
+    if check is None:
+        return None
+    try:
+        problems = check(content)
+    except Exception as e:
+        return "invalid", f"{type(e).__name__}: {e}"
+    return ("inconsistent", "; ".join(problems)) if problems else None
+
+
+def _escalate(stage: str, model: str, reason: str, detail: str) -> None:
+    metrics.inc("social_support_llm_cascade_total", {"stage": stage, "model": model, "outcome": "escalated"})
+    metrics.inc("social_support_llm_escalations_total", {"stage": stage, "reason": reason})
+    record({"kind": "escalation", "stage": stage, "model": model, "ms": 0.0, "reason": detail[:200]})
+    print(f"⤴ {stage}: {model} escalated ({reason}: {detail[:120]})")
+
+
+def _finish(stage: str, model: Optional[str], start: float, escalated: bool) -> None:
+    seconds = time.perf_counter() - start
+    if model is not None:
+        metrics.inc("social_support_llm_cascade_total", {"stage": stage, "model": model, "outcome": "accepted"})
+        metrics.observe("social_support_llm_cascade_seconds", {"stage": stage, "model": model}, seconds)
+    with _stats_lock:
+        stats = _stats[stage]
+        stats["calls"] += 1
+        stats["escalated"] += escalated
+        stats["seconds"] += seconds
+        stats["answered_by"][model or "none"] += 1
+
+
+def _tiers(stage: str, check: Optional[Check]) -> Generator[str, tuple, str]:
+    """Yields each model to try; is sent (content, None) or (None, error); returns the accepted content."""
+    start = time.perf_counter()
+    models = models_for(stage)
+    escalated = False
+    for tier, model in enumerate(models):
+        last = tier == len(models) - 1
+        content, error = yield model
+        if error is not None:
+            _note_missing(model, error)
+            if last:
+                _finish(stage, None, start, escalated)
+                raise error
+            _escalate(stage, model, "error", f"{type(error).__name__}: {error}")
+        else:
+            verdict = None if last else _verdict(content, check)
+            if verdict is None:
+                _finish(stage, model, start, escalated)
+                return content
+            _escalate(stage, model, *verdict)
+        escalated = True
+
+
+def cascade(messages: List[Dict[str, str]], stage: str, check: Optional[Check] = None,
+            timeout: Optional[float] = None, **kwargs) -> str:
+    tiers = _tiers(stage, check)
+    model = next(tiers)
+    while True:
+        try:
+            reply = chat(messages, model=model, stage=stage, timeout=timeout, **kwargs), None
+        except Exception as e:
+            reply = None, e
+        try:
+            model = tiers.send(reply)
+        except StopIteration as done:
+            return done.value
+
+
+async def acascade(messages: List[Dict[str, str]], stage: str, check: Optional[Check] = None,
+                   timeout: Optional[float] = None, **kwargs) -> str:
+    tiers = _tiers(stage, check)
+    model = next(tiers)
+    while True:
+        try:
+            reply = await achat(messages, model=model, stage=stage, timeout=timeout, **kwargs), None
+        except Exception as e:
+            reply = None, e
+        try:
+            model = tiers.send(reply)
+        except StopIteration as done:
+            return done.value
+
+
+def run_stage(steps: Generator[Call, str, Any]) -> Any:
+    """Run a stage generator, answering each Call it yields with cascade(); returns its result."""
+    try:
+        call = next(steps)
+        while True:
+            try:
+                content = cascade(call.messages, call.stage, call.check, **call.options)
+            except Exception as e:
+                call = steps.throw(e)
+            else:
+                call = steps.send(content)
+    except StopIteration as done:
+        return done.value
+
+
+async def arun_stage(steps: Generator[Call, str, Any]) -> Any:
+    try:
+        call = next(steps)
+        while True:
+            try:
+                content = await acascade(call.messages, call.stage, call.check, **call.options)
+            except Exception as e:
+                call = steps.throw(e)
+            else:
+                call = steps.send(content)
+    except StopIteration as done:
+        return done.value
+
+
+def cascade_stats() -> Dict[str, dict]:
+    """Per stage: calls, share escalated past the first model, mean latency and who answered."""
+    with _stats_lock:
+        return {
+            stage: {
+                "models": models_for(stage),
+                "calls": s["calls"],
+                "escalation_rate": round(s["escalated"] / s["calls"], 3) if s["calls"] else None,
+                "mean_ms": round(s["seconds"] / s["calls"] * 1000, 1) if s["calls"] else None,
+                "answered_by": dict(s["answered_by"]),
+            }
+            for stage, s in sorted(_stats.items())
+        }
+
+
+async def warm_models() -> Dict[str, float]:
+    """Load every cascade model in Ollama; {model: seconds}. Missing models are skipped."""
+    timings = {}
+    for model in all_models():
+        try:
+            timings[model] = await warm_model(model)
+        except ollama.ResponseError as e:
+            _note_missing(model, e)
+            if e.status_code != 404:
+                raise
+    if not timings:
+        raise RuntimeError(f"Ollama has none of the cascade models {all_models()}")
+    return timings
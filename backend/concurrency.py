@@ -0,0 +1,78 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+
+class QueueFullError(Exception):
+    """Raised when no slot is free and the wait queue is already full."""
+
+
+class AdmissionQueue:
+    """
+    Bounded admission control for pipeline runs.
+    At most `max_inflight` runs execute at once, up to `max_queued` more wait
+    for a slot, and anything beyond that is rejected immediately so callers
+    can answer 429 instead of piling up work.
+    """
+
+    def __init__(self, max_inflight: int, max_queued: int):
+        self.max_inflight = max_inflight
+        self.max_queued = max_queued
+        self.inflight = 0
+        self.waiting = 0
+        self._slots = None
+
+    def _get_slots(self) -> asyncio.Semaphore:
+        # Created lazily so it binds to the serving event loop
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_inflight)
+        return self._slots
+
+    def check(self) -> None:
+        """Raise QueueFullError if a new run would be rejected right now."""
+        if self._get_slots().locked() and self.waiting >= self.max_queued:
+            raise QueueFullError(f"{self.inflight} running, {self.waiting} queued")
+
+    @asynccontextmanager
+    async def slot(self):
+        slots = self._get_slots()
+        self.check()
+
+        self.waiting += 1
+        try:
+            await slots.acquire()
+        finally:
+            self.waiting -= 1
+
+        self.inflight += 1
+        try:
+            yield
+        finally:
+            self.inflight -= 1
+            slots.release()
+
+    def stats(self) -> dict:
+        return {
+            "inflight": self.inflight,
+            "waiting": self.waiting,
+            "max_inflight": self.max_inflight,
+            "max_queued": self.max_queued,
+        }
+
+
+async def run_until_disconnect(request, coro, poll_interval: float = 0.5):
+    """
+    Run `coro` as a task and cancel it if the HTTP client goes away,
+    so abandoned applications stop consuming LLM slots.
+    """
+    task = asyncio.ensure_future(coro)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=poll_interval)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                task.cancel()
+                raise asyncio.CancelledError("client disconnected")
+    finally:
+        if not task.done():
+            task.cancel()
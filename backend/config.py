@@ -0,0 +1,116 @@
+import os
+import sys
+
+# Repository root, so backend modules can share utils/ (cache, OCR)
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.append(ROOT_DIR)
+
+# Resolved from the package location, so the backend runs from any cwd
+MODELS_DIR = os.path.join(ROOT_DIR, "models")
+DATA_DIR = os.path.join(ROOT_DIR, "data")
+BACKEND_DIR = os.path.join(ROOT_DIR, "backend")
+
+# Routing mode for the orchestrator:
+#   "rules" - walk the fixed extract -> eligibility -> validate -> respond state
+#             machine directly from state, only asking the LLM when ambiguous
+#   "llm"   - ask the LLM for the next node before every hop (original behaviour)
+ROUTING_MODE = os.getenv("ROUTING_MODE", "rules").lower()
+
+# Graph shape:
+#   "sequential" - the orchestrator picks one node at a time (ROUTING_MODE applies)
+#   "parallel"   - fixed graph: after extraction the eligibility model and the
+#                  validator run concurrently (validation speculatively, as if
+#                  eligible) and join before the response; no routing calls
+GRAPH_MODE = os.getenv("GRAPH_MODE", "sequential").lower()
+
+# Safety net against routing loops, applies to both modes
+MAX_HOPS = int(os.getenv("MAX_HOPS", "10"))
+
+# Ollama server, shared by the sync and async clients
+OLLAMA_HOST = os.getenv("OLLAMA_HOST", "http://127.0.0.1:11434")
+
+# Max concurrent requests to Ollama from one process, sync and async together.
+# Per worker process, so the load on Ollama is WORKERS x LLM_CONCURRENCY.
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "4"))
+
+# LLM call robustness (see llm_client.py). Every call has a deadline covering
+# the wait for a slot, all attempts and backoff; a single attempt is also
+# capped at LLM_ATTEMPT_TIMEOUT_S. Override per stage with LLM_DEADLINE_<STAGE>.
+LLM_DEADLINES_S = {
+    stage: float(os.getenv(f"LLM_DEADLINE_{stage.upper()}", default))
+    for stage, default in (("orchestrator", 15), ("extraction", 60), ("validation", 60), ("response", 45))
+}
+LLM_DEFAULT_DEADLINE_S = float(os.getenv("LLM_DEFAULT_DEADLINE_S", "60"))
+LLM_ATTEMPT_TIMEOUT_S = float(os.getenv("LLM_ATTEMPT_TIMEOUT_S", "40"))
+# Retries of timeouts, connection errors and 429/5xx, with jittered backoff
+LLM_RETRIES = int(os.getenv("LLM_RETRIES", "2"))
+LLM_RETRY_BACKOFF_S = float(os.getenv("LLM_RETRY_BACKOFF_S", "0.5"))
+# Consecutive transient failures that open the circuit, and how long it stays
+# open; while open, LLM stages use their rule/regex fallbacks immediately
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+LLM_BREAKER_RESET_S = float(os.getenv("LLM_BREAKER_RESET_S", "30"))
+
+# Model cascade per LLM stage (see cascade.py): comma-separated Ollama models,
+# tried smallest first; a reply that fails the stage's checks goes to the next
+# one. LLM_CASCADE applies to every stage, LLM_MODELS_<STAGE> overrides one.
+# A single model (e.g. LLM_CASCADE=qwen2.5:7b-instruct) disables the cascade.
+LLM_CASCADE = os.getenv("LLM_CASCADE", "qwen2.5:1.5b-instruct,qwen2.5:7b-instruct")
+LLM_CASCADES = {
+    stage: [m.strip() for m in os.getenv(f"LLM_MODELS_{stage.upper()}", LLM_CASCADE).split(",") if m.strip()]
+    for stage in ("orchestrator", "extraction", "validation", "response")
+}
+
+# How long Ollama keeps the model loaded after a call, and whether each worker
+# loads it at startup so the first applicant doesn't pay the model-load time
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+OLLAMA_WARMUP = os.getenv("OLLAMA_WARMUP", "1") != "0"
+
+# Admission control for /check_eligibility: applications running the graph at
+# once, and applications allowed to wait for a slot before we answer 429
+MAX_INFLIGHT_REQUESTS = int(os.getenv("MAX_INFLIGHT_REQUESTS", "16"))
+MAX_QUEUED_REQUESTS = int(os.getenv("MAX_QUEUED_REQUESTS", "64"))
+
+# Per-request deadline (seconds) covering queueing and the whole graph run
+REQUEST_TIMEOUT_S = float(os.getenv("REQUEST_TIMEOUT_S", "180"))
+
+# Eligibility model backend: "compiled" uses the memory-mapped flattened forest
+# the model schema names (models/eligibility_model.npz, see forest.py) when it
+# exists, "sklearn" always loads the joblib model
+ELIGIBILITY_PREDICTOR = os.getenv("ELIGIBILITY_PREDICTOR", "compiled").lower()
+
+# Trained model version to load (models/eligibility_model-<version>.json, see
+# training.py). Empty loads the promoted one, models/eligibility_model.json,
+# or the unversioned models/eligibility_model.joblib when there is none.
+ELIGIBILITY_MODEL_VERSION = os.getenv("ELIGIBILITY_MODEL_VERSION", "")
+
+# Prompt budgets (estimated tokens, ~4 chars each) for document text and state
+# sent to each LLM stage; see context.py. Override with PROMPT_BUDGET_<STAGE>.
+PROMPT_TOKEN_BUDGETS = {
+    stage: int(os.getenv(f"PROMPT_BUDGET_{stage.upper()}", default))
+    for stage, default in (("extraction", 1500), ("validation", 800))
+}
+
+# Applicant field extraction:
+#   "rules" - parse the documents by type first (see extractors.py) and only
+#             ask the LLM for required fields that are missing or below
+#             EXTRACTION_MIN_CONFIDENCE
+#   "llm"   - always extract every field with the LLM (original behaviour)
+EXTRACTION_MODE = os.getenv("EXTRACTION_MODE", "rules").lower()
+EXTRACTION_MIN_CONFIDENCE = float(os.getenv("EXTRACTION_MIN_CONFIDENCE", "0.8"))
+
+# Serving. WORKERS > 1 runs that many processes (see gunicorn.conf.py for the
+# preforked production setup); RELOAD only applies to a single dev worker.
+HOST = os.getenv("HOST", "127.0.0.1")
+PORT = int(os.getenv("PORT", "8000"))
+WORKERS = int(os.getenv("WORKERS", "1"))
+RELOAD = os.getenv("RELOAD", "1") != "0"
+
+# Stored application state (SQLite LangGraph checkpoints, one thread per
+# application id), so follow-up questions and resubmitted documents only rerun
+# what they affect. Empty disables it: every request is evaluated from scratch.
+APPLICATION_DB = os.getenv("APPLICATION_DB", os.path.join(DATA_DIR, "applications.sqlite"))
+
+# Near-duplicate index of every evaluated application's documents and identity
+# fields (see duplicates.py), checked for each new one. Empty disables it.
+DUPLICATE_DB = os.getenv("DUPLICATE_DB", os.path.join(DATA_DIR, "duplicates.sqlite"))
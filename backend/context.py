@@ -0,0 +1,153 @@
+"""
+Prompt context builder.
+
+Each LLM stage only gets the parts of AppState it uses. OCR text is cleaned
+(whitespace runs, table rules, repeated page headers) and cut down to a
+per-stage token budget by keeping the most relevant chunks in their original
+order. Sizes before and after are recorded so the reduction is visible in
+/metrics and the request trace.
+"""
+import json
+import re
+from collections import Counter
+from typing import Any, Dict, List
+
+from config import PROMPT_TOKEN_BUDGETS
+from tracing import metrics, record
+
+metrics.describe("social_support_prompt_tokens_raw_total", "counter",
+                 "Estimated prompt tokens before context slimming")
+metrics.describe("social_support_prompt_tokens_sent_total", "counter",
+                 "Estimated prompt tokens after context slimming")
+
+# Words that make a chunk worth keeping, per stage
+STAGE_KEYWORDS = {
+    "extraction": [
+        "name", "age", "gender", "sex", "marital", "employ", "years", "income", "salary", "family",
+        "member", "dependent", "address", "disab", "support", "asset", "liabilit", "loan", "birth",
+    ],
+    "validation": ["birth", "dob", "name", "salary", "net", "gross", "total", "basic", "pay", "earning"],
+}
+
+# Lines made only of table/box drawing characters
+_RULE_LINE = re.compile(r"^[\s\-_=|+*~.:#]+$")
+_SPACES = re.compile(r"[ \t\f\v]+")
+_BLANK_LINES = re.compile(r"\n{3,}")
+
+
+def estimate_tokens(text: str) -> int:
+    # ~4 characters per token for English/Latin OCR output
+    return (len(text) + 3) // 4
+
+
+def clean_ocr_text(text: str) -> str:
+    """Collapse whitespace, drop table rules and headers/footers repeated on every page."""
+    lines = [_SPACES.sub(" ", line).strip() for line in (text or "").splitlines()]
+    lines = [line for line in lines if line and not _RULE_LINE.match(line) and re.search(r"\w", line)]
+
+    # A short line seen 3+ times is a page header/footer, keep its first occurrence
+    counts = Counter(line for line in lines if len(line) < 80)
+    seen = set()
+    kept = []
+    for line in lines:
+        if counts.get(line, 0) >= 3:
+            if line in seen:
+                continue
+            seen.add(line)
+        kept.append(line)
+    return _BLANK_LINES.sub("\n\n", "\n".join(kept))
+
+
+def _chunks(text: str, lines_per_chunk: int = 6) -> List[str]:
+    lines = text.splitlines()
+    return ["\n".join(lines[i:i + lines_per_chunk]) for i in range(0, len(lines), lines_per_chunk)]
+
+
+def _relevance(chunk: str, keywords: List[str]) -> float:
+    lower = chunk.lower()
+    hits = sum(lower.count(k) for k in keywords)
+    numbers = len(re.findall(r"\d", chunk))
+    return hits * 10 + min(numbers, 20) / (1 + len(chunk) / 200)
+
+
+def fit_to_budget(text: str, stage: str, budget_tokens: int) -> str:
+    """Keep the highest-scoring chunks that fit the budget, in document order."""
+    if estimate_tokens(text) <= budget_tokens:
+        return text
+    keywords = STAGE_KEYWORDS.get(stage, [])
+    chunks = _chunks(text)
+    ranked = sorted(range(len(chunks)), key=lambda i: (-_relevance(chunks[i], keywords), i))
+    chosen, used = set(), 0
+    for i in ranked:
+        cost = estimate_tokens(chunks[i]) + 1
+        if used + cost > budget_tokens:
+            continue
+        chosen.add(i)
+        used += cost
+    return "\n".join(chunks[i] for i in sorted(chosen))
+
+
+def record_prompt_size(stage: str, raw: str, sent: str) -> None:
+    raw_tokens, sent_tokens = estimate_tokens(raw), estimate_tokens(sent)
+    metrics.inc("social_support_prompt_tokens_raw_total", {"stage": stage}, raw_tokens)
+    metrics.inc("social_support_prompt_tokens_sent_total", {"stage": stage}, sent_tokens)
+    record({"kind": "prompt", "stage": stage, "ms": 0.0, "raw_tokens": raw_tokens, "sent_tokens": sent_tokens})
+
+
+def document_context(texts: Dict[str, str], stage: str) -> Dict[str, str]:
+    """Clean each document and split the stage budget across them by cleaned size."""
+    budget = PROMPT_TOKEN_BUDGETS.get(stage, 1000)
+    cleaned = {name: clean_ocr_text(text) for name, text in texts.items() if text and text.strip()}
+    total = sum(estimate_tokens(t) for t in cleaned.values()) or 1
+    fitted = {}
+    for name, text in cleaned.items():
+        share = max(int(budget * estimate_tokens(text) / total), 64)
+        fitted[name] = fit_to_budget(text, stage, share)
+    record_prompt_size(stage, "".join(texts.values()), "".join(fitted.values()))
+    return fitted
+
+
+def extraction_text(applicant_info: Dict[str, str]) -> str:
+    """
+    Text handed to the extraction LLM: the form alone, else the supporting
+    documents. The bank statement never goes to the LLM; its figures come
+    from the transaction parser (utils/bank_statement.py).
+    """
+    form = applicant_info.get("application_form", "")
+    if form.strip():
+        docs = {"application_form": form}
+    else:
+        docs = {key: applicant_info.get(key, "") for key in ("salary_slip", "salary", "passport")}
+    return "\n\n".join(document_context(docs, "extraction").values())
+
+
+def project_state(state: Dict[str, Any], stage: str) -> Dict[str, Any]:
+    """The subset of AppState a routing/response prompt needs, without raw OCR text."""
+    validation = state.get("validation_results") or {}
+    if stage == "orchestrator":
+        projected = {
+            "documents_received": sorted(k for k, v in (state.get("applicant_info") or {}).items() if v),
+            "extracted_data_available": state.get("extracted_data") is not None,
+            "changed_documents": state.get("changed_documents") or None,
+            "eligibility": state.get("eligibility"),
+            "validation_results": {"overall_status": validation["overall_status"]} if validation else None,
+            "final_response_available": bool(state.get("final_response")),
+            "followup_query": state.get("followup_query") or None,
+        }
+    elif stage == "response":
+        projected = {
+            "eligibility": state.get("eligibility", False),
+            "data_validation": {k: validation[k] for k in
+                                ("age_validation", "income_validation", "duplicate_validation", "overall_status", "reason")
+                                if k in validation},
+        }
+        if state.get("followup_query"):
+            # Answering a caseworker question about a stored application
+            projected["followup_query"] = state["followup_query"]
+            projected["applicant"] = {k: v for k, v in (state.get("extracted_data") or {}).items() if v not in (None, "")}
+    else:
+        raise ValueError(f"No state projection for stage {stage!r}")
+
+    raw = json.dumps(state, indent=2, default=str)
+    record_prompt_size(stage, raw, json.dumps(projected, default=str))
+    return projected
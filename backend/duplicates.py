@@ -0,0 +1,386 @@
+"""
+Near-duplicate index across applications.
+
+Every finished application with a durable id (a stored application or a
+batch applicant id) adds its documents and identity fields to a local SQLite
+index, and each evaluation is looked up against all of them:
+
+    document text    MinHash signature of the OCR text (values of "Label: value"
+                     lines, so two filled-in copies of the same template don't
+                     match), split into LSH bands
+    document images  1024-bit perceptual hash (DCT pHash) of image uploads,
+                     split into chunks for multi-index lookup; not counted
+                     when the OCR text of the two documents differs
+    passport number  normalised, exact
+    name             normalised (accents, case, punctuation, word order), exact
+
+Bands and chunks are stored as (band, bucket) -> document rows under a
+primary key, so a lookup is a few index seeks plus a check of the candidates
+they return, whatever the size of the archive. Matches come back as a list on
+AppState["duplicate_matches"]; validation.flag_duplicates() sends the
+application to a caseworker when any of them is strong.
+"""
+import io
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+import zlib
+from hashlib import blake2b
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from config import DUPLICATE_DB
+from tracing import metrics
+
+# MinHash: NUM_PERM hash functions in BANDS bands of ROWS. Two documents become
+# candidates with probability 1 - (1 - J^ROWS)^BANDS: ~0.96 at Jaccard 0.9,
+# ~0.02 at 0.44 (the most two different filled-in bank digests share)
+NUM_PERM = 128
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+SHINGLE_WORDS = 3
+# Documents with fewer shingles carry too little to compare
+MIN_SHINGLES = 8
+TEXT_SIMILARITY = 0.85
+
+# pHash: signs of the lowest IMAGE_HASH_SIDE^2 DCT frequencies of an
+# IMAGE_SAMPLE-pixel greyscale copy. Filled-in copies of one template
+# (passports, slips) are within a few bits of each other at the usual 64-bit
+# size; at 1024 bits they stay 28+ bits apart while a re-scaled, re-compressed
+# copy of the same upload stays within ~24
+IMAGE_SAMPLE = 128
+IMAGE_HASH_SIDE = 32
+IMAGE_HASH_BITS = IMAGE_HASH_SIDE ** 2
+IMAGE_MAX_DISTANCE = 24
+# Split into IMAGE_MAX_DISTANCE + 1 chunks: two hashes within that distance
+# agree on at least one whole chunk (pigeonhole), so each chunk is a bucket
+_base, _extra = divmod(IMAGE_HASH_BITS, IMAGE_MAX_DISTANCE + 1)
+IMAGE_CHUNK_BITS = tuple(_base + (i < _extra) for i in range(IMAGE_MAX_DISTANCE + 1))
+# Text-heavy pages of one template can still come that close (short salary
+# slips); when both documents also have OCR text, an image match only stands
+# if the texts share at least this much
+IMAGE_TEXT_AGREEMENT = 0.5
+# Band numbers of the image chunks, after the text bands
+_IMAGE_BAND = 100
+
+# Rows read per bucket, so a crowded bucket (blank pages) can't make a lookup slow
+MAX_BUCKET_CANDIDATES = 500
+MAX_MATCHES = 20
+
+# Matches that send an application to review; a name alone only gets listed
+STRONG_MATCHES = {"passport_no", "document_text", "document_image"}
+
+_MERSENNE = np.uint64((1 << 31) - 1)
+_rng = np.random.default_rng(20250801)
+_PERM_A = _rng.integers(1, (1 << 31) - 1, NUM_PERM, dtype=np.uint64)
+_PERM_B = _rng.integers(0, (1 << 31) - 1, NUM_PERM, dtype=np.uint64)
+
+_WORD = re.compile(r"[a-z0-9]+")
+_PASSPORT_LABEL = re.compile(r"passport\s*(?:no|number|#)\.?\s*[:#]?\s*([A-Z0-9]{6,9})\b", re.IGNORECASE)
+
+metrics.describe("social_support_duplicate_matches_total", "counter", "Cross-application matches found, by kind")
+metrics.describe("social_support_duplicate_lookup_seconds", "histogram", "Duplicate index lookup and insert time")
+
+
+def _content(text: str) -> str:
+    # Labels are the template; the values are what makes a document this one
+    return "\n".join(line.split(":", 1)[1] if ":" in line else line for line in text.splitlines())
+
+
+def shingles(text: str) -> np.ndarray:
+    """Distinct word SHINGLE_WORDS-grams of the document content, as uint32 hashes."""
+    words = _WORD.findall(_content(text or "").lower())
+    grams = {" ".join(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)}
+    return np.fromiter((zlib.crc32(g.encode()) for g in grams), dtype=np.uint64, count=len(grams))
+
+
+def minhash(text: str) -> Optional[np.ndarray]:
+    """NUM_PERM-value MinHash signature, or None for documents too short to compare."""
+    hashed = shingles(text)
+    if len(hashed) < MIN_SHINGLES:
+        return None
+    # (a * x + b) mod 2^31 - 1 for every permutation and shingle at once;
+    # x < 2^32 and a < 2^31 keep the product inside uint64
+    values = (_PERM_A[:, None] * hashed[None, :] + _PERM_B[:, None]) % _MERSENNE
+    return values.min(axis=1).astype(np.uint32)
+
+
+def _signed64(value: int) -> int:
+    # SQLite integers are signed 64-bit
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def text_buckets(signature: np.ndarray) -> List[tuple]:
+    """(band, bucket) for each LSH band of a signature."""
+    return [(band, _signed64(int.from_bytes(blake2b(rows.tobytes(), digest_size=8).digest(), "little")))
+            for band, rows in enumerate(signature.reshape(BANDS, ROWS))]
+
+
+_DCT = np.cos(np.pi * (2 * np.arange(IMAGE_SAMPLE)[None, :] + 1) * np.arange(IMAGE_HASH_SIDE)[:, None]
+              / (2 * IMAGE_SAMPLE))
+
+
+def image_hash(data: bytes) -> Optional[int]:
+    """IMAGE_HASH_BITS-bit pHash of an image file, None if it isn't one."""
+    from PIL import Image
+
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            pixels = np.asarray(img.convert("L").resize((IMAGE_SAMPLE, IMAGE_SAMPLE), Image.LANCZOS),
+                                dtype=np.float64)
+    except Exception:
+        return None
+    low = (_DCT @ pixels @ _DCT.T).flatten()
+    # The DC term is overall brightness, not structure
+    bits = low > np.median(low[1:])
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def image_buckets(value: int) -> List[tuple]:
+    buckets, shift = [], IMAGE_HASH_BITS
+    for chunk, width in enumerate(IMAGE_CHUNK_BITS):
+        shift -= width
+        buckets.append((_IMAGE_BAND + chunk, (value >> shift) & ((1 << width) - 1)))
+    return buckets
+
+
+def upload_image_hashes(files: Dict[str, bytes], key_of) -> Dict[str, str]:
+    """{document key: hex pHash} for the image uploads among {file name: bytes}."""
+    hashes = {}
+    for name, data in files.items():
+        key = key_of(name)
+        value = image_hash(data) if key and not name.lower().endswith(".pdf") else None
+        if value is not None:
+            hashes[key] = f"{value:0{IMAGE_HASH_BITS // 4}x}"
+    return hashes
+
+
+def normalise_passport(value: Any) -> str:
+    return re.sub(r"[^A-Z0-9]", "", str(value or "").upper())
+
+
+def normalise_name(value: Any) -> str:
+    """Accents, case, punctuation and word order removed: "Al-Kaabi, Saif" == "SAIF ALKAABI"."""
+    text = unicodedata.normalize("NFKD", str(value or "")).encode("ascii", "ignore").decode().lower()
+    return "".join(sorted(re.findall(r"[a-z]+", text)))
+
+
+def identity_keys(applicant_info: Dict[str, str], extracted_data: Dict[str, Any]) -> Dict[str, str]:
+    """Normalised passport number and name of an application, where known."""
+    from extractors import parse_mrz
+
+    keys = {}
+    passport = (applicant_info or {}).get("passport") or ""
+    mrz = parse_mrz(passport)
+    label = _PASSPORT_LABEL.search(passport)
+    number = normalise_passport(mrz["passport_no"] if mrz and mrz["valid"] else label.group(1) if label else "")
+    if len(number) >= 6:
+        keys["passport_no"] = number
+    name = normalise_name((extracted_data or {}).get("name"))
+    if len(name) >= 4:
+        keys["name"] = name
+    return keys
+
+
+class DuplicateIndex:
+    def __init__(self, path: str = DUPLICATE_DB):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        conn = self._conn()
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS documents (
+                id INTEGER PRIMARY KEY,
+                application_id TEXT NOT NULL,
+                document TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                signature BLOB NOT NULL,
+                created REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS documents_application ON documents (application_id, document, kind);
+            CREATE TABLE IF NOT EXISTS buckets (
+                band INTEGER NOT NULL,
+                bucket INTEGER NOT NULL,
+                doc_id INTEGER NOT NULL,
+                PRIMARY KEY (band, bucket, doc_id)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS buckets_doc ON buckets (doc_id);
+            CREATE TABLE IF NOT EXISTS identities (
+                kind TEXT NOT NULL,
+                value TEXT NOT NULL,
+                application_id TEXT NOT NULL,
+                PRIMARY KEY (kind, value, application_id)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS identities_application ON identities (application_id);
+        """)
+
+    def _conn(self) -> sqlite3.Connection:
+        # One connection per thread, WAL so every worker process shares the file
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _candidates(self, conn, buckets: List[tuple], application_id: str) -> list:
+        ids = set()
+        for band, bucket in buckets:
+            ids.update(row[0] for row in conn.execute(
+                "SELECT doc_id FROM buckets WHERE band = ? AND bucket = ? LIMIT ?",
+                (band, bucket, MAX_BUCKET_CANDIDATES)))
+        if not ids:
+            return []
+        ids = sorted(ids)
+        rows = []
+        for i in range(0, len(ids), 900):
+            part = ids[i:i + 900]
+            rows += conn.execute(
+                f"SELECT application_id, document, signature FROM documents "
+                f"WHERE id IN ({','.join('?' * len(part))}) AND application_id != ?",
+                (*part, application_id)).fetchall()
+        return rows
+
+    @staticmethod
+    def _texts_agree(conn, signature: Optional[np.ndarray], other: str, other_document: str) -> bool:
+        if signature is None:
+            return True
+        row = conn.execute("SELECT signature FROM documents WHERE application_id = ? AND document = ? AND kind = 'text'",
+                           (other, other_document)).fetchone()
+        return row is None or float((np.frombuffer(row[0], dtype=np.uint32) == signature).mean()) >= IMAGE_TEXT_AGREEMENT
+
+    def find(self, application_id: str, signatures: Dict[str, np.ndarray], images: Dict[str, int],
+             identities: Dict[str, str]) -> List[Dict[str, Any]]:
+        conn = self._conn()
+        matches = []
+        for kind, value in identities.items():
+            for (other,) in conn.execute(
+                    "SELECT application_id FROM identities WHERE kind = ? AND value = ? AND application_id != ? LIMIT ?",
+                    (kind, value, application_id, MAX_MATCHES)):
+                matches.append({"application_id": other, "match": kind, "similarity": 1.0})
+        for document, signature in signatures.items():
+            for other, other_document, stored in self._candidates(conn, text_buckets(signature), application_id):
+                similarity = float((np.frombuffer(stored, dtype=np.uint32) == signature).mean())
+                if similarity >= TEXT_SIMILARITY:
+                    matches.append({"application_id": other, "match": "document_text", "document": document,
+                                    "other_document": other_document, "similarity": round(similarity, 3)})
+        for document, value in images.items():
+            for other, other_document, stored in self._candidates(conn, image_buckets(value), application_id):
+                distance = (value ^ int.from_bytes(stored, "big")).bit_count()
+                if distance <= IMAGE_MAX_DISTANCE and self._texts_agree(
+                        conn, signatures.get(document), other, other_document):
+                    matches.append({"application_id": other, "match": "document_image", "document": document,
+                                    "other_document": other_document,
+                                    "similarity": round(1 - distance / IMAGE_HASH_BITS, 3)})
+        matches.sort(key=lambda m: (m["match"] not in STRONG_MATCHES, -m["similarity"]))
+        return matches[:MAX_MATCHES]
+
+    def add(self, application_id: str, signatures: Dict[str, np.ndarray], images: Dict[str, int],
+            identities: Dict[str, str]) -> None:
+        """Index an application's documents, replacing what was indexed for them before."""
+        now = time.time()
+        documents = [(d, "text", s.tobytes(), text_buckets(s)) for d, s in signatures.items()]
+        documents += [(d, "image", v.to_bytes(IMAGE_HASH_BITS // 8, "big"), image_buckets(v)) for d, v in images.items()]
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for document, kind, signature, buckets in documents:
+                old = [row[0] for row in conn.execute(
+                    "SELECT id FROM documents WHERE application_id = ? AND document = ? AND kind = ?",
+                    (application_id, document, kind))]
+                for doc_id in old:
+                    conn.execute("DELETE FROM buckets WHERE doc_id = ?", (doc_id,))
+                    conn.execute("DELETE FROM documents WHERE id = ?", (doc_id,))
+                doc_id = conn.execute(
+                    "INSERT INTO documents (application_id, document, kind, signature, created) VALUES (?, ?, ?, ?, ?)",
+                    (application_id, document, kind, signature, now)).lastrowid
+                conn.executemany("INSERT OR IGNORE INTO buckets (band, bucket, doc_id) VALUES (?, ?, ?)",
+                                 [(band, bucket, doc_id) for band, bucket in buckets])
+            for kind, value in identities.items():
+                conn.execute("DELETE FROM identities WHERE application_id = ? AND kind = ?", (application_id, kind))
+                conn.execute("INSERT OR IGNORE INTO identities (kind, value, application_id) VALUES (?, ?, ?)",
+                             (kind, value, application_id))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def forget(self, application_id: str) -> None:
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM buckets WHERE doc_id IN (SELECT id FROM documents WHERE application_id = ?)",
+                         (application_id,))
+            conn.execute("DELETE FROM documents WHERE application_id = ?", (application_id,))
+            conn.execute("DELETE FROM identities WHERE application_id = ?", (application_id,))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    @staticmethod
+    def _entry(applicant_info: Dict[str, str], extracted_data: Dict[str, Any],
+               image_hashes: Dict[str, str] = None) -> tuple:
+        signatures = {}
+        for document, text in (applicant_info or {}).items():
+            signature = minhash(text)
+            if signature is not None:
+                signatures[document] = signature
+        images = {document: int(value, 16) for document, value in (image_hashes or {}).items()}
+        return signatures, images, identity_keys(applicant_info, extracted_data)
+
+    def check(self, application_id: Optional[str], applicant_info: Dict[str, str], extracted_data: Dict[str, Any],
+              image_hashes: Dict[str, str] = None) -> List[Dict[str, Any]]:
+        """Matches of this application against every indexed one (see record() to index it)."""
+        start = time.perf_counter()
+        try:
+            # "" for a stateless run: excludes nothing
+            matches = self.find(application_id or "", *self._entry(applicant_info, extracted_data, image_hashes))
+        except sqlite3.Error as e:
+            print(f"[WARN] Duplicate index unavailable: {e}")
+            return []
+        finally:
+            metrics.observe("social_support_duplicate_lookup_seconds", {}, time.perf_counter() - start)
+        for match in matches:
+            metrics.inc("social_support_duplicate_matches_total", {"match": match["match"]})
+        return matches
+
+    def record(self, application_id: str, applicant_info: Dict[str, str], extracted_data: Dict[str, Any],
+               image_hashes: Dict[str, str] = None) -> None:
+        """Index a finished application under its durable id (stored application or batch applicant id)."""
+        try:
+            self.add(application_id, *self._entry(applicant_info, extracted_data, image_hashes))
+        except sqlite3.Error as e:
+            print(f"[WARN] Duplicate index unavailable, application {application_id} not indexed: {e}")
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index() -> Optional[DuplicateIndex]:
+    """Process-wide index, or None when DUPLICATE_DB is empty."""
+    global _index
+    if not DUPLICATE_DB:
+        return None
+    with _index_lock:
+        if _index is None:
+            _index = DuplicateIndex()
+    return _index
+
+
+def record_application(application_id: str, state: Dict[str, Any]) -> None:
+    """
+    Index a finished evaluation's documents. Called once the turn or batch
+    run has completed, never from inside the graph, so a run that timed out
+    (its id never reached the client) can't match its own retry.
+    """
+    index = get_index()
+    if index is None or not application_id or not state.get("extracted_data"):
+        return
+    index.record(application_id, state.get("applicant_info"), state["extracted_data"], state.get("image_hashes"))
@@ -3,7 +3,11 @@
 """
 Eligibility module for Social Support Automation.
 This module decides whether an applicant qualifies for support.
+The thresholds are defined once, in policies/ (see utils/policy.py).
 """
+from config import ROOT_DIR  # noqa: F401  (puts utils/ on the path)
+from utils.policy import get_policy
+
 
 def check_eligibility(applicant_info):
     """
@@ -24,22 +28,8 @@ def check_eligibility(applicant_info):
     bool: True if eligible, False otherwise
     """
 
-    # Extract fields with defaults
-    monthly_income = applicant_info.get("monthly_income", 0)
-    other_income = applicant_info.get("other_income", 0)
-    family_size = applicant_info.get("family_size", 1)  # assume at least 1
-    assets = applicant_info.get("assets", 0)
-    liabilities = applicant_info.get("liabilities", 0)
-
-    total_income = monthly_income + other_income
-    net_assets = assets - liabilities
-
-    # Rule-based eligibility logic
-    # You can adjust thresholds as per your requirement
-    if total_income <= 10000 and family_size >= 4 and net_assets <= 50000:
-        return True
-    else:
-        return False
+    # Same rule as the scoring fallback: the eligibility policy in policies/
+    return get_policy().check(applicant_info)["eligible"]
 
 
 # Example usage
@@ -0,0 +1,320 @@
+"""
+Rule-based first pass for applicant field extraction.
+
+Each uploaded document is classified (application form, passport, salary slip,
+bank statement) and run through a parser for its type: labelled fields for
+forms and slips, the ICAO 9303 machine-readable zone (with check digits) for
+passports, and salary credits for bank statements. Every field carries a
+confidence; the LLM is only asked for required fields that end up missing or
+below EXTRACTION_MIN_CONFIDENCE.
+"""
+import re
+import statistics
+from datetime import date
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+from config import EXTRACTION_MIN_CONFIDENCE
+from tracing import metrics
+from utils.bank_statement import statement_features
+from validation import age_on, passport_dob
+
+metrics.describe("social_support_extraction_fields_total", "counter",
+                 "Extracted applicant fields by source (rules or llm)")
+
+FIELDS = [
+    "name", "age", "gender", "marital_status", "employment_status", "employment_years",
+    "monthly_income", "family_members", "address", "disability_status",
+    "other_support_received", "assets", "liabilities",
+]
+
+# Fields the eligibility model and validator act on; the rest are informational
+# and never trigger an LLM call on their own
+REQUIRED_FIELDS = ["name", "age", "employment_years", "monthly_income", "family_members", "assets", "liabilities"]
+
+NUMERIC_FIELDS = {"age", "employment_years", "monthly_income", "family_members", "assets", "liabilities"}
+
+# Plausible ranges; values outside keep a low confidence
+_RANGES = {
+    "age": (16, 110),
+    "employment_years": (0, 60),
+    "family_members": (1, 30),
+    "monthly_income": (0, 1_000_000),
+    "assets": (0, 100_000_000),
+    "liabilities": (0, 100_000_000),
+}
+
+_VALUE = r"[ \t]*:[ \t]*"
+
+
+def _label(pattern: str, value: str) -> re.Pattern:
+    return re.compile(rf"^[ \t]*{pattern}[^:\n]*?{_VALUE}{value}", re.IGNORECASE | re.MULTILINE)
+
+
+_NUMBER = r"(\d[\d,]*)"
+_TEXT = r"([^\n]*\S)"
+
+FORM_LABELS = {
+    "name": [_label(r"(?:full\s*)?name\b", _TEXT)],
+    "age": [_label(r"age\b", r"(\d{1,3})\b")],
+    "gender": [_label(r"(?:gender|sex)\b", r"(male|female|m|f)\b")],
+    "marital_status": [_label(r"marital\s*status", _TEXT)],
+    "employment_status": [_label(r"employment\s*status", _TEXT)],
+    "employment_years": [_label(r"years\s*of\s*employment", r"(\d{1,2})\b")],
+    "monthly_income": [_label(r"monthly\s*income", _NUMBER)],
+    "family_members": [_label(r"family\s*size", r"(\d{1,2})\b"),
+                       _label(r"(?:family|household)\s*members", r"(\d{1,2})\b")],
+    "address": [_label(r"address\b", _TEXT)],
+    "disability_status": [_label(r"disability", _TEXT)],
+    "other_support_received": [_label(r"other\s*support", _TEXT)],
+    "assets": [_label(r"total\s*assets", _NUMBER)],
+    "liabilities": [_label(r"total\s*liabilities", _NUMBER)],
+}
+
+_SLIP_NAME = _label(r"employee\s*name", _TEXT)
+_SLIP_INCOME = [
+    (_label(r"net\s*(?:salary|pay)", _NUMBER), 0.9),
+    (_label(r"(?:gross|total)\s*(?:salary|pay|earnings)", _NUMBER), 0.75),
+]
+_HOLDER = re.compile(r"account\s*holder[ \t]*:?[ \t]*([^\n]*[A-Za-z][^\n]*)", re.IGNORECASE)
+_MONEY = re.compile(r"\d{1,3}(?:,\d{3})*\.\d{2}")
+_SALARY_CREDIT = re.compile(r"salary|payroll|wages", re.IGNORECASE)
+_MRZ_LINE1 = re.compile(r"P[A-Z<][A-Z<]{3}[A-Z<]{39}")
+_MRZ_LINE2 = re.compile(r"[A-Z0-9<]{9}\d[A-Z<]{3}\d{6}\d[MF<]\d{6}\d[A-Z0-9<]{14}[\d<]\d")
+
+# Checked in order: forms mention passports and salary certificates too
+DOC_MARKERS = [
+    ("application_form", re.compile(r"application\s*form", re.IGNORECASE)),
+    ("passport", re.compile(r"^\s*P[A-Z<][A-Z]{3}[A-Z<]*<<|^\s*passport\s*$", re.IGNORECASE | re.MULTILINE)),
+    ("salary_slip", re.compile(r"salary\s*(slip|certificate)|pay\s*slip|payslip", re.IGNORECASE)),
+    ("bank_statement", re.compile(r"bank\s*statement|account\s*holder|opening\s*balance", re.IGNORECASE)),
+]
+
+
+def classify_document(key: str, text: str) -> str:
+    """Document type from its content, falling back to the upload slot it came in."""
+    for doc_type, marker in DOC_MARKERS:
+        if marker.search(text or ""):
+            return doc_type
+    key = (key or "").lower()
+    if key == "salary":
+        return "salary_slip"
+    return key if key in ("application_form", "passport", "salary_slip", "bank_statement") else "unknown"
+
+
+def _number_field(field: str, raw: str, confidence: float) -> Tuple[Any, float]:
+    value = int(raw.replace(",", ""))
+    low, high = _RANGES.get(field, (0, float("inf")))
+    return value, confidence if low <= value <= high else 0.3
+
+
+def parse_form(text: str) -> Dict[str, Tuple[Any, float]]:
+    fields = {}
+    for field, patterns in FORM_LABELS.items():
+        for pattern in patterns:
+            match = pattern.search(text)
+            if not match:
+                continue
+            raw = match.group(1).strip()
+            if field in NUMERIC_FIELDS:
+                fields[field] = _number_field(field, raw, 0.95)
+            elif field == "gender":
+                fields[field] = ({"m": "Male", "f": "Female"}.get(raw.lower(), raw.title()), 0.95)
+            else:
+                fields[field] = (raw, 0.95)
+            break
+    return fields
+
+
+def mrz_check_digit(value: str) -> str:
+    total = 0
+    for i, char in enumerate(value):
+        if char.isdigit():
+            v = int(char)
+        elif char.isalpha():
+            v = ord(char) - 55
+        else:
+            v = 0
+        total += v * (7, 3, 1)[i % 3]
+    return str(total % 10)
+
+
+def _mrz_date(yymmdd: str, past: bool, today: date) -> Optional[date]:
+    try:
+        year = 2000 + int(yymmdd[:2])
+        if past and year > today.year:
+            year -= 100
+        return date(year, int(yymmdd[2:4]), int(yymmdd[4:6]))
+    except ValueError:
+        return None
+
+
+def parse_mrz(text: str, today: Optional[date] = None) -> Optional[Dict[str, Any]]:
+    """TD3 passport MRZ fields, with "valid" set when every check digit matches."""
+    today = today or date.today()
+    compact = re.sub(r"[ \t]", "", (text or "").upper())
+    line1, line2 = _MRZ_LINE1.search(compact), _MRZ_LINE2.search(compact)
+    if not line1 or not line2:
+        return None
+    line1, line2 = line1.group(0), line2.group(0)
+
+    checks = [
+        mrz_check_digit(line2[0:9]) == line2[9],
+        mrz_check_digit(line2[13:19]) == line2[19],
+        mrz_check_digit(line2[21:27]) == line2[27],
+        mrz_check_digit(line2[0:10] + line2[13:20] + line2[21:43]) == line2[43],
+    ]
+    surname, _, given = line1[5:].partition("<<")
+    return {
+        "surname": surname.replace("<", " ").strip().title(),
+        "given_names": given.replace("<", " ").strip().title(),
+        "passport_no": line2[0:9].replace("<", ""),
+        "dob": _mrz_date(line2[13:19], past=True, today=today),
+        "sex": {"M": "Male", "F": "Female"}.get(line2[20], ""),
+        "valid": all(checks),
+    }
+
+
+def parse_passport(text: str, today: Optional[date] = None) -> Dict[str, Tuple[Any, float]]:
+    today = today or date.today()
+    fields = {}
+    mrz = parse_mrz(text, today)
+    if mrz:
+        confidence = 0.99 if mrz["valid"] else 0.5
+        name = f"{mrz['given_names']} {mrz['surname']}".strip()
+        if name:
+            fields["name"] = (name, confidence)
+        if mrz["sex"]:
+            fields["gender"] = (mrz["sex"], confidence)
+        if mrz["dob"]:
+            fields["age"] = (age_on(mrz["dob"], today), confidence)
+    if "age" not in fields:
+        dob = passport_dob(text)
+        if dob:
+            fields["age"] = (age_on(dob, today), 0.85)
+    return fields
+
+
+def parse_salary_slip(text: str) -> Dict[str, Tuple[Any, float]]:
+    fields = {}
+    match = _SLIP_NAME.search(text)
+    if match:
+        fields["name"] = (match.group(1).strip(), 0.9)
+    for pattern, confidence in _SLIP_INCOME:
+        match = pattern.search(text)
+        if match:
+            fields["monthly_income"] = _number_field("monthly_income", match.group(1), confidence)
+            break
+    return fields
+
+
+def salary_credits(text: str) -> List[float]:
+    """Amounts of salary credit rows; the amount may share the line or follow on the next one."""
+    lines = (text or "").splitlines()
+    credits = []
+    for i, line in enumerate(lines):
+        match = _SALARY_CREDIT.search(line)
+        if not match:
+            continue
+        amounts = _MONEY.findall(line[match.end():])
+        if not amounts and i + 1 < len(lines):
+            amounts = _MONEY.findall(lines[i + 1])
+        if amounts:
+            credits.append(float(amounts[0].replace(",", "")))
+    return credits
+
+
+# Parsed once per statement text (or digest), shared by extraction and scoring
+_statement_features = lru_cache(maxsize=64)(statement_features)
+
+
+def income_features(text: str) -> Dict[str, Any]:
+    """Income figures of a bank statement (see utils/bank_statement.py); {} without transactions."""
+    return dict(_statement_features(text or ""))
+
+
+def parse_bank_statement(text: str) -> Dict[str, Tuple[Any, float]]:
+    fields = {}
+    match = _HOLDER.search(text)
+    if match:
+        fields["name"] = (match.group(1).strip(), 0.8)
+    # A statement shows credits, not the contractual salary: below the
+    # threshold unless nothing better is available
+    salary = income_features(text).get("salary_monthly")
+    if salary:
+        fields["monthly_income"] = (int(salary), 0.6)
+    else:
+        credits = salary_credits(text)
+        if credits:
+            fields["monthly_income"] = (int(statistics.median(credits)), 0.6)
+    return fields
+
+
+PARSERS = {
+    "application_form": parse_form,
+    "passport": parse_passport,
+    "salary_slip": parse_salary_slip,
+    "bank_statement": parse_bank_statement,
+}
+
+# Fields a document of each type can supply; a form (or an unrecognised
+# document, which only the LLM can read) may supply any of them
+DOCUMENT_FIELDS = {
+    "passport": {"name", "age", "gender"},
+    "salary_slip": {"name", "monthly_income"},
+    "bank_statement": {"name", "monthly_income"},
+}
+
+
+def affected_fields(applicant_info: Dict[str, str], changed: List[str]) -> set:
+    """Fields whose value can change when the documents under the `changed` keys are replaced."""
+    fields = set()
+    for key in changed:
+        fields |= DOCUMENT_FIELDS.get(classify_document(key, applicant_info.get(key, "")), set(FIELDS))
+    return fields
+
+
+def statement_income(applicant_info: Dict[str, str]) -> Optional[Dict[str, Any]]:
+    """income_features() of the uploaded bank statement, None without one."""
+    for key, text in (applicant_info or {}).items():
+        if text and classify_document(key, text) == "bank_statement":
+            return income_features(text) or None
+    return None
+
+
+def extract_fields(applicant_info: Dict[str, str]) -> Dict[str, Any]:
+    """
+    First-pass extraction over the uploaded documents.
+    The application form is authoritative when present, as it is the
+    application being checked; otherwise fields come from the supporting
+    documents, highest confidence first. Returns {"values", "confidence",
+    "documents", "needs_llm"}.
+    """
+    documents = {key: classify_document(key, text) for key, text in applicant_info.items() if text and text.strip()}
+    forms = [key for key, doc_type in documents.items() if doc_type == "application_form"]
+    sources = forms or [key for key in documents if documents[key] != "unknown"]
+
+    best = {}
+    for key in sources:
+        for field, (value, confidence) in PARSERS[documents[key]](applicant_info[key]).items():
+            if confidence > best.get(field, (None, -1.0))[1]:
+                best[field] = (value, confidence)
+
+    values = {field: best[field][0] if field in best else "" for field in FIELDS}
+    confidence = {field: round(best[field][1], 2) for field in best}
+    needs_llm = [field for field in REQUIRED_FIELDS if confidence.get(field, 0.0) < EXTRACTION_MIN_CONFIDENCE]
+    return {"values": values, "confidence": confidence, "documents": documents, "needs_llm": needs_llm}
+
+
+def merge_llm_fields(first_pass: Dict[str, Any], llm_values: Dict[str, Any]) -> Dict[str, Any]:
+    """Take the LLM's answer only for the fields the first pass could not settle."""
+    values = dict(first_pass["values"])
+    filled = []
+    for field in first_pass["needs_llm"]:
+        if llm_values.get(field) not in (None, ""):
+            values[field] = llm_values[field]
+            filled.append(field)
+    metrics.inc("social_support_extraction_fields_total", {"source": "llm"}, len(filled))
+    metrics.inc("social_support_extraction_fields_total", {"source": "rules"},
+                sum(1 for f in FIELDS if f not in filled and values.get(f) not in (None, "")))
+    return values
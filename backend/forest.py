@@ -0,0 +1,201 @@
+"""
+Flattened RandomForest predictor.
+
+The sklearn forest is exported once into plain NumPy arrays (split feature,
+threshold, children, normalised leaf values) stored uncompressed in a .npz.
+CompiledForest walks those arrays directly and memory-maps them, so every
+uvicorn worker shares one copy of the model through the page cache.
+
+    python forest.py export  [model.joblib] [model.npz]
+    python forest.py verify  [model.joblib] [model.npz] [applicants.csv]
+"""
+import os
+import struct
+import sys
+import zipfile
+import numpy as np
+from config import MODELS_DIR, DATA_DIR
+
+DEFAULT_JOBLIB = os.path.join(MODELS_DIR, "eligibility_model.joblib")
+DEFAULT_NPZ = os.path.join(MODELS_DIR, "eligibility_model.npz")
+DEFAULT_CSV = os.path.join(DATA_DIR, "applicants.csv")
+
+
+def _leaf_proba(tree) -> np.ndarray:
+    """Per-node class probabilities exactly as DecisionTreeClassifier.predict_proba returns them."""
+    import sklearn
+
+    value = tree.value[:, 0, :].astype(np.float64)
+    major, minor = (int(part) for part in sklearn.__version__.split(".")[:2])
+    if (major, minor) >= (1, 4):
+        # sklearn >= 1.4 already stores weighted fractions and returns them as-is
+        return value
+    normalizer = value.sum(axis=1)[:, np.newaxis]
+    normalizer[normalizer == 0.0] = 1.0
+    return value / normalizer
+
+
+def export_forest(model, path: str) -> None:
+    """Flatten a fitted RandomForestClassifier into `path` (.npz, uncompressed)."""
+    features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+    offset = 0
+    max_depth = 0
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        n_nodes = tree.node_count
+        index = np.arange(n_nodes) + offset
+        leaf = tree.children_left == -1
+
+        # Leaves point at themselves so a fixed number of steps is enough
+        lefts.append(np.where(leaf, index, tree.children_left + offset))
+        rights.append(np.where(leaf, index, tree.children_right + offset))
+        features.append(np.where(leaf, 0, tree.feature))
+        thresholds.append(tree.threshold)
+
+        values.append(_leaf_proba(tree))
+
+        roots.append(offset)
+        max_depth = max(max_depth, tree.max_depth)
+        offset += n_nodes
+
+    feature_names = getattr(model, "feature_names_in_", np.arange(model.n_features_in_).astype(str))
+    np.savez(
+        path,
+        feature=np.concatenate(features).astype(np.int32),
+        threshold=np.concatenate(thresholds).astype(np.float64),
+        left=np.concatenate(lefts).astype(np.int32),
+        right=np.concatenate(rights).astype(np.int32),
+        value=np.concatenate(values),
+        roots=np.asarray(roots, dtype=np.int32),
+        classes=np.asarray(model.classes_),
+        feature_names=np.asarray(feature_names, dtype=str),
+        max_depth=np.asarray(max_depth, dtype=np.int32),
+    )
+
+
+def _load_npz_mmap(path: str) -> dict:
+    """
+    Memory-map every member of an uncompressed .npz.
+    np.load ignores mmap_mode for archives, so locate each .npy inside the
+    zip ourselves and map it at its data offset.
+    """
+    arrays = {}
+    with zipfile.ZipFile(path) as archive, open(path, "rb") as f:
+        for info in archive.infolist():
+            name = info.filename[:-4] if info.filename.endswith(".npy") else info.filename
+            if info.compress_type != zipfile.ZIP_STORED:
+                with archive.open(info) as member:
+                    arrays[name] = np.lib.format.read_array(member)
+                continue
+
+            f.seek(info.header_offset)
+            header = f.read(30)
+            name_len, extra_len = struct.unpack("<HH", header[26:30])
+            f.seek(info.header_offset + 30 + name_len + extra_len)
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+
+            if not shape or 0 in shape:
+                with archive.open(info) as member:
+                    arrays[name] = np.lib.format.read_array(member)
+            else:
+                arrays[name] = np.memmap(path, dtype=dtype, mode="r", shape=shape,
+                                         order="F" if fortran_order else "C", offset=f.tell())
+    return arrays
+
+
+class CompiledForest:
+    """Drop-in replacement for RandomForestClassifier.predict / predict_proba."""
+
+    def __init__(self, arrays: dict):
+        # Plain ndarray views over the mapped memory; np.memmap's subclass
+        # hooks make every take() noticeably slower
+        self.feature = arrays["feature"].view(np.ndarray)
+        self.threshold = arrays["threshold"].view(np.ndarray)
+        self.left = arrays["left"].view(np.ndarray)
+        self.right = arrays["right"].view(np.ndarray)
+        self.value = arrays["value"].view(np.ndarray)
+        self.roots = np.asarray(arrays["roots"])
+        self.classes_ = np.asarray(arrays["classes"])
+        self.feature_names_in_ = np.asarray(arrays["feature_names"])
+        self.max_depth = int(arrays["max_depth"])
+        self.n_estimators = len(self.roots)
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_NPZ, mmap: bool = True) -> "CompiledForest":
+        if mmap:
+            return cls(_load_npz_mmap(path))
+        with np.load(path) as data:
+            return cls({key: data[key] for key in data.files})
+
+    def _as_matrix(self, X) -> np.ndarray:
+        if hasattr(X, "columns"):
+            X = X[list(self.feature_names_in_)].to_numpy()
+        # sklearn trees compare float32 inputs against float64 thresholds
+        return np.asarray(X, dtype=np.float32)
+
+    def apply(self, X) -> np.ndarray:
+        """Leaf node index per (row, tree)."""
+        X = self._as_matrix(X)
+        n_rows, n_features = X.shape
+        flat_X = X.ravel()
+
+        # One cursor per (row, tree), advanced a level at a time; cursors
+        # that reached a leaf drop out of the active set
+        node = np.tile(self.roots, n_rows)
+        row_offset = np.repeat(np.arange(n_rows) * n_features, self.n_estimators)
+        active = np.arange(node.size)
+        for _ in range(self.max_depth):
+            current = node.take(active)
+            left = self.left.take(current)
+            split = left != current
+            if not split.all():
+                active, current, left = active[split], current[split], left[split]
+            if not active.size:
+                break
+            x = flat_X.take(row_offset.take(active) + self.feature.take(current))
+            go_left = x <= self.threshold.take(current)
+            node[active] = np.where(go_left, left, self.right.take(current))
+        return node.reshape(n_rows, self.n_estimators)
+
+    def predict_proba(self, X) -> np.ndarray:
+        leaf_values = self.value[self.apply(X)]
+        # cumsum adds trees strictly in order, like sklearn's accumulation,
+        # so the result is bit-for-bit identical
+        total = np.cumsum(leaf_values, axis=1)[:, -1, :]
+        return total / self.n_estimators
+
+    def predict(self, X) -> np.ndarray:
+        return self.classes_.take(np.argmax(self.predict_proba(X), axis=1), axis=0)
+
+
+def verify(model, compiled: CompiledForest, csv_path: str = DEFAULT_CSV) -> bool:
+    import pandas as pd
+
+    X = pd.read_csv(csv_path)[list(compiled.feature_names_in_)]
+    same_proba = np.array_equal(model.predict_proba(X), compiled.predict_proba(X))
+    same_label = np.array_equal(model.predict(X), compiled.predict(X))
+    print(f"{len(X)} rows: predict_proba identical={same_proba}, predict identical={same_label}")
+    return same_proba and same_label
+
+
+if __name__ == "__main__":
+    import joblib
+
+    command = sys.argv[1] if len(sys.argv) > 1 else ""
+    joblib_path = sys.argv[2] if len(sys.argv) > 2 else DEFAULT_JOBLIB
+    npz_path = sys.argv[3] if len(sys.argv) > 3 else DEFAULT_NPZ
+
+    if command == "export":
+        export_forest(joblib.load(joblib_path), npz_path)
+        print(f"✅ Compiled {joblib_path} -> {npz_path}")
+    elif command == "verify":
+        csv_path = sys.argv[4] if len(sys.argv) > 4 else DEFAULT_CSV
+        ok = verify(joblib.load(joblib_path), CompiledForest.load(npz_path), csv_path)
+        sys.exit(0 if ok else 1)
+    else:
+        print(__doc__)
+        sys.exit(1)
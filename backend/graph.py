@@ -1,44 +1,113 @@
-from langgraph.graph import StateGraph, END
+"""
+The eligibility workflow graph, sequential (orchestrator loop) or parallel
+(eligibility and validation fanned out after extraction), see GRAPH_MODE.
+
+Importing this module only builds and compiles the graph. To redraw the
+diagram (PNG rendering goes through the mermaid.ink web service):
+
+    python graph.py                  # -> workflow_graph.png
+    python graph.py --mermaid out.mmd
+"""
+import argparse
+import os
+from langgraph.graph import StateGraph, START, END
+from langchain_core.runnables import RunnableLambda
 from nodes import *
-import PIL.Image
-from IPython.display import Image 
-import io
+from config import ROUTING_MODE, GRAPH_MODE, BACKEND_DIR
+from tracing import traced_node
+
+
+def as_node(name, impl):
+    # invoke() uses the sync __call__, ainvoke()/astream() await acall natively;
+    # both are timed into the request trace
+    call, acall = traced_node(name, impl)
+    return RunnableLambda(call, afunc=acall, name=name)
+
+
+def build_sequential() -> StateGraph:
+    graph = StateGraph(AppState)
+
+    graph.add_node("data_extractor", as_node("data_extractor", DataExtractor()))
+    graph.add_node("data_validator", as_node("data_validator", DataValidator()))
+    graph.add_node("eligibility_checker", as_node("eligibility_checker", EligibilityChecker()))
+    graph.add_node("response_generator", as_node("response_generator", ResponseGenerator()))
+    graph.add_node("orchestrator", as_node("orchestrator", Orchestrator(mode=ROUTING_MODE)))
+
+    # Conditional edges - the orchestrator writes the next node into state,
+    # either from the rule table (ROUTING_MODE=rules) or from the LLM
+    graph.add_conditional_edges(
+        "orchestrator", 
+        lambda state: state.get("next"),
+        {
+            "data_extractor": "data_extractor",
+            "data_validator": "data_validator",
+            "eligibility_checker": "eligibility_checker",
+            "response_generator": "response_generator"
+        } 
+        )
+
+    # Return edges
+    graph.add_edge("data_extractor", "orchestrator")
+    graph.add_edge("data_validator", "orchestrator")
+    graph.add_edge("eligibility_checker", "orchestrator")
+
+    graph.add_edge("response_generator", END)
+
+    graph.set_entry_point("orchestrator")
+    return graph
 
 
+def build_parallel() -> StateGraph:
+    # Eligibility and validation both only need extracted_data, so they run in
+    # the same step; the validator's LLM call overlaps the local model and is
+    # thrown away by the response generator when the applicant is not eligible
+    graph = StateGraph(AppState)
+
+    graph.add_node("data_extractor", as_node("data_extractor", DataExtractor()))
+    graph.add_node("eligibility_checker", as_node("eligibility_checker", EligibilityChecker()))
+    graph.add_node("data_validator", as_node("data_validator", DataValidator(speculative=True)))
+    graph.add_node("response_generator", as_node("response_generator", ResponseGenerator(speculative=True)))
+
+    graph.add_conditional_edges(START, route_entry, ["data_extractor", "response_generator"])
+    graph.add_edge("data_extractor", "eligibility_checker")
+    graph.add_edge("data_extractor", "data_validator")
+    # Join: waits for both branches
+    graph.add_edge(["eligibility_checker", "data_validator"], "response_generator")
+    graph.add_edge("response_generator", END)
+    return graph
+
+
+BUILDERS = {"sequential": build_sequential, "parallel": build_parallel}
+
 # build graph
-graph = StateGraph(AppState)
-
-graph.add_node("data_extractor", DataExtractor())
-graph.add_node("data_validator", DataValidator())
-graph.add_node("eligibility_checker", EligibilityChecker())
-graph.add_node("response_generator", ResponseGenerator())
-graph.add_node("orchestrator", Orchestrator())
-
-# Conditional edges
-graph.add_conditional_edges(
-    "orchestrator", 
-    lambda state: state.get("next"),
-    {
-        "data_extractor": "data_extractor",
-        "data_validator": "data_validator",
-        "eligibility_checker": "eligibility_checker",
-        "response_generator": "response_generator"
-    } 
-    )
-
-# Return edges
-graph.add_edge("data_extractor", "orchestrator")
-graph.add_edge("data_validator", "orchestrator")
-graph.add_edge("eligibility_checker", "orchestrator")
-
-graph.add_edge("response_generator", END)
-
-graph.set_entry_point("orchestrator")
+graph = BUILDERS[GRAPH_MODE]()
+
+
+def compile_graph(checkpointer=None):
+    # With a checkpointer every run is tied to a thread (application id) and
+    # starts from that application's stored state (see applications.py)
+    return graph.compile(checkpointer=checkpointer)
+
 
 # compile graph
-evaluater = graph.compile()
+evaluater = compile_graph()
+
+
+def render_graph(path: str, mermaid: bool = False) -> str:
+    drawable = evaluater.get_graph(xray=True)
+    if mermaid:
+        with open(path, "w") as f:
+            f.write(drawable.draw_mermaid())
+    else:
+        with open(path, "wb") as f:
+            f.write(drawable.draw_mermaid_png())
+    return path
+
 
-# save graph
-img = Image(evaluater.get_graph (xray=True). draw_mermaid_png())
-pimg = PIL.Image.open(io.BytesIO(img.data))
-pimg.save("workflow_graph.png")
\ No newline at end of file
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("output", nargs="?", help="Output file (default backend/workflow_graph.png)")
+    parser.add_argument("--mermaid", action="store_true", help="Write Mermaid source instead of a PNG (offline)")
+    args = parser.parse_args()
+    default = os.path.join(BACKEND_DIR, "workflow_graph.mmd" if args.mermaid else "workflow_graph.png")
+    print(f"✅ Graph saved at {render_graph(args.output or default, args.mermaid)}")
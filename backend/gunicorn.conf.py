@@ -0,0 +1,32 @@
+"""
+Production serving: gunicorn master + uvicorn worker processes.
+
+    cd backend && gunicorn -c gunicorn.conf.py main:app
+
+The app is imported once in the master, and when_ready loads the eligibility
+model the schema in models/ names before forking: the memory-mapped
+CompiledForest (.npz), whose pages all workers share through the page cache,
+or the pickled model, shared copy-on-write. Each worker then warms Ollama in
+its lifespan hook and reports on /ready.
+"""
+import gc
+import multiprocessing
+import os
+
+bind = f"{os.getenv('HOST', '127.0.0.1')}:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv("WORKERS", str(min(multiprocessing.cpu_count(), 4))))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+# Graph runs are bounded by REQUEST_TIMEOUT_S; leave room beyond it
+timeout = int(float(os.getenv("REQUEST_TIMEOUT_S", "180"))) + 30
+graceful_timeout = 30
+keepalive = 5
+
+
+def when_ready(server):
+    # Runs in the master after the app is imported, before any worker forks
+    from scoring import get_eligibility_model
+    model = get_eligibility_model()
+    # Keep the collector from touching (and so copying) the preloaded objects
+    gc.freeze()
+    server.log.info(f"Eligibility model loaded before fork ({type(model).__name__})")
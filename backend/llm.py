@@ -1,15 +1,27 @@
 import json
 import re
-from typing import Dict, Any
-import ollama
+from typing import Dict, Any, List
 from datetime import date
-
-MODEL_NAME = "qwen2.5:7b-instruct"
-
-def parse_applicant_info(extracted_text: str, return_raw: bool = False) -> Dict[str, Any]:
-    if not extracted_text.strip():
-        raise ValueError("No text provided for parsing.")
-
+# Every Ollama call goes through llm_client (cache, deadlines, retries, breaker)
+from llm_client import MODEL_NAME, LLMUnavailableError, chat, achat, warm_model  # noqa: F401
+# Each stage tries a small model first (see cascade.py). A stage is written
+# once, as a generator yielding its Call; run_stage / arun_stage make it a
+# sync or an async function
+from cascade import Call, arun_stage, run_stage
+from tracing import record_fallback
+from context import document_context, project_state
+from extractors import FIELDS, NUMERIC_FIELDS
+from validation import (
+    AGE_TOLERANCE_YEARS, age_on, check_age, check_income, deterministic_validation, final_decision,
+    flag_duplicates, passport_dob, to_number, salary_slip_text as salary_slip_text_of,
+)
+# Eligibility rules live in policies/ (see utils/policy.py)
+from utils.policy import get_policy
+
+
+def _parse_prompt(extracted_text: str, fields: List[str] = None) -> List[Dict[str, str]]:
+    # Only the fields the rule-based pass could not settle, when given
+    template = json.dumps({field: "" for field in fields or FIELDS}, indent=4)
     prompt = f"""
 You are an expert document parser. Extract structured applicant information
 from the following social support application text.
@@ -18,52 +30,71 @@ OCR Text:
 \"\"\"{extracted_text}\"\"\"
 
 Return a valid JSON with these fields:
-{{
-    "name": "",
-    "age": "",
-    "gender": "",
-    "marital_status": "",
-    "employment_status": "",
-    "employment_years": "",
-    "monthly_income": "",
-    "family_members": "",
-    "address": "",
-    "disability_status": "",
-    "other_support_received": "",
-    "assets": "",
-    "liabilities": ""
-}}
+{template}
 
 Only return JSON. Do not add any explanations.
 """
 
-    try:
-        response = ollama.chat(
-            model=MODEL_NAME,
-            messages=[
-                {"role": "system", "content": "You are a helpful assistant that extracts form data."},
-                {"role": "user", "content": prompt},
-            ],
-            stream=False
-        )
-
-        text_output = response["message"]["content"].strip()
-        match = re.search(r"\{.*\}", text_output, re.DOTALL)
-        if match:
-            parsed = json.loads(match.group(0))
-        else:
-            raise ValueError("LLM did not return valid JSON")
-
-        if return_raw:
-            return parsed, text_output
-        return parsed
+    return [
+        {"role": "system", "content": "You are a helpful assistant that extracts form data."},
+        {"role": "user", "content": prompt},
+    ]
+
+
+def _parse_output(text_output: str) -> Dict[str, Any]:
+    match = re.search(r"\{.*\}", text_output.strip(), re.DOTALL)
+    if not match:
+        raise ValueError("LLM did not return valid JSON")
+    return json.loads(match.group(0))
+
+
+def _extraction_check(extracted_text: str, fields: List[str] = None):
+    """Cascade check for extraction replies (see cascade.py)."""
+    requested = fields or FIELDS
+
+    def check(content: str) -> List[str]:
+        parsed = _parse_output(content)
+        if not isinstance(parsed, dict):
+            raise ValueError("LLM did not return a JSON object")
+        answered = [f for f in requested if parsed.get(f) not in (None, "")]
+        problems = [f"{f} is not a number" for f in answered if f in NUMERIC_FIELDS and to_number(parsed[f]) is None]
+        if len(answered) * 2 < len(requested):
+            problems.append(f"only {len(answered)} of {len(requested)} fields answered")
+        age = to_number(parsed.get("age")) if "age" in answered else None
+        if age is not None:
+            dob = passport_dob(extracted_text)
+            if not 0 < age < 120:
+                problems.append(f"age {age:g} out of range")
+            elif dob and abs(age_on(dob, date.today()) - age) > AGE_TOLERANCE_YEARS:
+                problems.append(f"age {age:g} contradicts the passport date of birth {dob.isoformat()}")
+        return problems
+
+    return check
+
+
+def _parse_steps(extracted_text: str, fields: List[str] = None):
+    """(parsed fields, raw reply); the regex parser when the LLM gives nothing usable."""
+    if not extracted_text.strip():
+        raise ValueError("No text provided for parsing.")
 
+    try:
+        text_output = (yield Call(_parse_prompt(extracted_text, fields), "extraction",
+                                  _extraction_check(extracted_text, fields))).strip()
+        return _parse_output(text_output), text_output
     except Exception as e:
         print(f"[WARN] LLM parsing failed: {e}")
-        parsed = fallback_parse(extracted_text)
-        if return_raw:
-            return parsed, ""
-        return parsed
+        record_fallback("extraction", e)
+        return fallback_parse(extracted_text), ""
+
+
+def parse_applicant_info(extracted_text: str, return_raw: bool = False, fields: List[str] = None) -> Dict[str, Any]:
+    parsed, text_output = run_stage(_parse_steps(extracted_text, fields))
+    return (parsed, text_output) if return_raw else parsed
+
+
+async def aparse_applicant_info(extracted_text: str, fields: List[str] = None) -> Dict[str, Any]:
+    parsed, _ = await arun_stage(_parse_steps(extracted_text, fields))
+    return parsed
 
 def fallback_parse(text: str) -> Dict[str, Any]:
     def extract(pattern):
@@ -87,78 +118,175 @@ def fallback_parse(text: str) -> Dict[str, Any]:
     }
 
 def check_eligibility(applicant_data: Dict[str, Any]) -> Dict[str, Any]:
-    income = applicant_data.get("monthly_income", 0)
-    family_members = applicant_data.get("family_members", 1)
-    assets = applicant_data.get("assets", 0)
-    liabilities = applicant_data.get("liabilities", 0)
-
-    eligible = income < 25000 and family_members >= 3 and (assets - liabilities) <= 50000
-    reason = "✅ Eligible for support" if eligible else "❌ Not eligible — check income/family/assets."
+    result = get_policy().check(applicant_data)
+    eligible = result["eligible"]
+    reason = "✅ Eligible for support" if eligible else f"❌ Not eligible — {'; '.join(result['failed'])}."
 
     return {"eligible": eligible, "reason": reason}
 
-def document_validater(state: Dict[str, Any]) -> Dict[str, Any]:
+# Structured output for the combined validation + decision call. Ollama
+# constrains generation to this schema, so the reply always parses.
+ASSESSMENT_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "age_validation": {"type": "string", "enum": ["success", "failed"]},
+        "income_validation": {"type": "string", "enum": ["success", "failed"]},
+        "overall_status": {"type": "string", "enum": ["success", "failed"]},
+        "final_status": {"type": "string", "enum": ["eligible", "not eligible"]},
+        "reason": {"type": "string"},
+    },
+    "required": ["age_validation", "income_validation", "overall_status", "final_status", "reason"],
+}
+
+
+def _assessment_prompt(state: Dict[str, Any]) -> List[Dict[str, str]]:
     application_data = state.get("extracted_data", {})
     uploaded_docs = state.get("applicant_info", {})
+    eligibility_json = json.dumps(state.get("eligibility", False))
 
     age = application_data.get("age", 0)
     income = application_data.get("monthly_income", 0)
 
-    salary_slip_text = uploaded_docs.get("salary", "")
-    passport_text = uploaded_docs.get("passport", "")
+    documents = document_context({"salary_slip": salary_slip_text_of(uploaded_docs),
+                                  "passport": uploaded_docs.get("passport", "")}, "validation")
+    salary_slip_text = documents.get("salary_slip", "")
+    passport_text = documents.get("passport", "")
     today = date.today()
 
     prompt = f"""
-You are a Data Validator AI.
-
-Validate the social support application.
+You are a Data Validator and Response Generator AI for a social support application.
 
 ### Inputs:
 Application data:
 Age: {age}
 Income: {income}
 
+eligibility = {eligibility_json}
+
 Uploaded documents:
 Salary Slip: {salary_slip_text}
 Passport: {passport_text}
 
-Validation Rules:
+### Validation Rules:
 1. Age: Calculate age from passport DOB and today's date {today}. Compare with application age.
 2. Income: Compare application income with salary slip income.
+3. overall_status is "success" only if both validations succeed.
 
-Output strictly as JSON:
-{{
-"age_validation": "success" | "failed",
-"income_validation": "success" | "failed",
-"overall_status": "success" | "failed",
-"reason": "<reason if failed>"
-}}
+### Decision Rules:
+- Applicant is eligible if eligibility is True AND overall_status is "success".
+- Otherwise, not eligible.
+- Provide a clear, short reason explaining the decision or the failed validation.
+
+Output strictly as JSON matching the schema.
 """
 
-    response = ollama.chat(
-        model=MODEL_NAME,
-        messages=[{"role": "user", "content": prompt}]
-    )
+    return [{"role": "user", "content": prompt}]
+
+
+def _assessment_check(state: Dict[str, Any]):
+    """Cascade check for validation replies: statuses must agree with each
+    other and with whichever of the rule checks the documents allow."""
+    application_data = state.get("extracted_data") or {}
+    uploaded_docs = state.get("applicant_info") or {}
+    today = date.today()
+    decidable = {
+        "age_validation": check_age(application_data.get("age"), uploaded_docs.get("passport", ""), today),
+        "income_validation": check_income(application_data.get("monthly_income"), salary_slip_text_of(uploaded_docs)),
+    }
+
+    def check(content: str) -> List[str]:
+        output = json.loads(content)
+        missing = [key for key in ASSESSMENT_SCHEMA["required"] if key not in output]
+        if missing:
+            raise ValueError(f"missing {missing}")
+        problems = [f"{key} contradicts the documents ({result['reason']})"
+                    for key, result in decidable.items() if result and output[key] != result["status"]]
+        both = output["age_validation"] == output["income_validation"] == "success"
+        if (output["overall_status"] == "success") != both:
+            problems.append("overall_status contradicts the age and income checks")
+        return problems
+
+    return check
+
+
+def _unverified(state: Dict[str, Any], error: Exception) -> Dict[str, Any]:
+    # No usable answer from the validator: the documents go to a caseworker
+    # instead of silently failing validation
+    record_fallback("validation", error)
+    validation = {
+        "age_validation": "unverified",
+        "income_validation": "unverified",
+        "overall_status": "review",
+        "reason": f"Automatic document validation unavailable ({type(error).__name__})",
+        "method": "unavailable",
+    }
+    return _decided(state, validation)
+
+
+def _decided(state: Dict[str, Any], validation: Dict[str, Any]) -> Dict[str, Any]:
+    # Cross-application matches apply whichever way the documents were checked
+    validation = flag_duplicates(validation, state.get("duplicate_matches"))
+    return {"validation_results": validation,
+            "final_response": final_decision(state.get("eligibility", False), validation)}
+
 
+def _assessment_output(state: Dict[str, Any], content: str) -> Dict[str, Any]:
     try:
-        validation_result = json.loads(response.get("content", "{}"))
+        output = json.loads(content)
+        validation = {
+            "age_validation": output["age_validation"],
+            "income_validation": output["income_validation"],
+            "overall_status": output["overall_status"],
+            "reason": output.get("reason", ""),
+            "method": "llm",
+        }
     except Exception as e:
         print(f"[WARN] Validation parsing failed: {e}")
-        validation_result = {
-            "age_validation": "failed",
-            "income_validation": "failed",
-            "overall_status": "failed",
-            "reason": "Failed to parse model output"
-        }
+        return _unverified(state, e)
 
-    return validation_result
+    # The decision rule is fixed; keep the model's wording only when it agrees
+    result = _decided(state, validation)
+    decision = result["final_response"]
+    if output.get("final_status") == decision["final_status"] and output.get("reason"):
+        decision["reason"] = output["reason"]
+    return result
 
-def response_generator_ollama(state: Dict[str, Any]) -> Dict[str, Any]:
-    eligibility = state.get("eligibility", False)
-    data_validation = state.get("validation_results", {})
 
-    eligibility_json = json.dumps(eligibility)
-    validation_json = json.dumps(data_validation)
+def _validation_steps(state: Dict[str, Any]):
+    validation = deterministic_validation(state)
+    if validation is not None:
+        return _decided(state, validation)
+    try:
+        content = yield Call(_assessment_prompt(state), "validation", _assessment_check(state),
+                             {"format": ASSESSMENT_SCHEMA})
+    except Exception as e:
+        print(f"[WARN] Validation call failed: {e}")
+        return _unverified(state, e)
+    return _assessment_output(state, content)
+
+
+def validate_and_decide(state: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Validate passport age and salary-slip income, then decide.
+    Uses plain rules when the documents are clear and one structured LLM
+    call otherwise. Returns {"validation_results": ..., "final_response": ...}.
+    """
+    return run_stage(_validation_steps(state))
+
+
+async def avalidate_and_decide(state: Dict[str, Any]) -> Dict[str, Any]:
+    return await arun_stage(_validation_steps(state))
+
+
+def _response_prompt(state: Dict[str, Any]) -> List[Dict[str, str]]:
+    inputs = project_state(state, "response")
+    eligibility_json = json.dumps(inputs["eligibility"])
+    validation_json = json.dumps(inputs["data_validation"])
+    followup = ""
+    if inputs.get("followup_query"):
+        followup = f"""applicant = {json.dumps(inputs["applicant"])}
+followup_query = {json.dumps(inputs["followup_query"])}
+"""
 
     prompt = f"""
 You are a Response Generator AI for a social support application.
@@ -166,13 +294,14 @@ You are a Response Generator AI for a social support application.
 ### Inputs:
 eligibility = {eligibility_json}
 data_validation = {validation_json}
-
+{followup}
 ### Rules:
 - Applicant is eligible if:
     1. eligibility is True AND
     2. data_validation["overall_status"] is "success"
 - Otherwise, not eligible.
 - Provide a clear reason explaining the decision.
+- If followup_query is given, answer it in the reason, using only the inputs above.
 
 ### Output strictly as JSON:
 {{
@@ -181,15 +310,43 @@ data_validation = {validation_json}
 }}
 """
 
-    response = ollama.chat(
-        model=MODEL_NAME,
-        messages=[{"role": "user", "content": prompt}]
-    )
+    return [{"role": "user", "content": prompt}]
+
+
+def _response_fallback(state: Dict[str, Any], error: Exception) -> Dict[str, Any]:
+    # The rule decision stands; only the free-text answer is missing
+    print(f"[WARN] Response generation failed: {error}")
+    record_fallback("response", error)
+    decision = final_decision(state.get("eligibility", False), state.get("validation_results"))
+    return {**decision, "reason": f"{decision['reason']} (The question could not be answered right now.)"}
+
+
+def _response_check(state: Dict[str, Any]):
+    """Cascade check for answers: a reason, and the status the decision rules give."""
+    expected = final_decision(state.get("eligibility", False), state.get("validation_results"))["final_status"]
 
+    def check(content: str) -> List[str]:
+        output = json.loads(content)
+        if not isinstance(output, dict) or not str(output.get("reason") or "").strip():
+            raise ValueError("no reason in the answer")
+        # The prompt only knows eligible / not eligible
+        if expected in ("eligible", "not eligible") and output.get("final_status") != expected:
+            return [f"final_status {output.get('final_status')!r}, the rules give {expected!r}"]
+        return []
+
+    return check
+
+
+def _response_steps(state: Dict[str, Any]):
     try:
-        final_response = json.loads(response.get("content", "{}"))
+        return json.loads((yield Call(_response_prompt(state), "response", _response_check(state))))
     except Exception as e:
-        print(f"[WARN] Response parsing failed: {e}")
-        final_response = {"final_status": "not eligible", "reason": "Failed to parse model output"}
+        return _response_fallback(state, e)
+
+
+def response_generator_ollama(state: Dict[str, Any]) -> Dict[str, Any]:
+    return run_stage(_response_steps(state))
+
 
-    return final_response
+async def aresponse_generator_ollama(state: Dict[str, Any]) -> Dict[str, Any]:
+    return await arun_stage(_response_steps(state))
@@ -0,0 +1,397 @@
+"""
+The one path from the backend to Ollama.
+
+chat() / achat() wrap a plain Ollama chat call with:
+- the content cache (utils/cache.py), so identical prompts never reach Ollama twice
+- coalescing: identical prompts already in flight share a single call
+- one limit of LLM_CONCURRENCY calls at Ollama, shared by sync and async callers
+- a deadline per call (LLM_DEADLINES_S by stage) covering the wait for a
+  slot, every attempt and the backoff between attempts; waiting for a slot
+  is not an Ollama failure, so it is never retried or counted by the breaker
+- bounded retries with full-jitter backoff for transient errors (timeouts,
+  connection errors, 429 and 5xx)
+- a circuit breaker: after LLM_BREAKER_FAILURES consecutive transient
+  failures, calls fail fast with LLMUnavailableError for LLM_BREAKER_RESET_S
+  so every stage goes straight to its rule/regex fallback; then one probe
+  call is let through to close it again
+"""
+import asyncio
+import collections
+import random
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Dict, List, Optional
+
+import httpx
+import ollama
+
+from config import (
+    OLLAMA_HOST, LLM_CONCURRENCY, OLLAMA_KEEP_ALIVE, LLM_DEADLINES_S, LLM_DEFAULT_DEADLINE_S,
+    LLM_ATTEMPT_TIMEOUT_S, LLM_RETRIES, LLM_RETRY_BACKOFF_S, LLM_BREAKER_FAILURES, LLM_BREAKER_RESET_S,
+)
+from utils.cache import get_cache, hash_key
+from tracing import metrics, record_llm
+
+MODEL_NAME = "qwen2.5:7b-instruct"
+
+# Ollama answered, but asked us to come back later
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+metrics.describe("social_support_llm_retries_total", "counter", "LLM attempts retried after a transient error")
+metrics.describe("social_support_llm_errors_total", "counter", "LLM calls that failed, by cause")
+metrics.describe("social_support_llm_coalesced_total", "counter", "LLM calls served by an identical call in flight")
+metrics.describe("social_support_llm_circuit_open", "gauge", "1 while the LLM circuit breaker is open")
+
+
+class LLMUnavailableError(Exception):
+    """No answer from the model: circuit open, deadline spent or retries exhausted."""
+
+
+def is_transient(error: Exception) -> bool:
+    if isinstance(error, ollama.ResponseError):
+        return error.status_code in RETRY_STATUS
+    return isinstance(error, (TimeoutError, httpx.TimeoutException, httpx.TransportError, ConnectionError))
+
+
+class CircuitBreaker:
+    """
+    closed -> open after `failures` consecutive transient failures,
+    open -> half_open (a single probe call) after `reset_s`,
+    half_open -> closed when the probe gets an answer, open again when not.
+    """
+
+    def __init__(self, failures: int = LLM_BREAKER_FAILURES, reset_s: float = LLM_BREAKER_RESET_S):
+        self.failures = failures
+        self.reset_s = reset_s
+        self.state = "closed"
+        self.consecutive = 0
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_s:
+                self._set("half_open")
+                return True
+            return self.state == "closed"
+
+    def success(self) -> None:
+        # Any answer from the server counts, even an error status
+        with self._lock:
+            self.consecutive = 0
+            self._set("closed")
+
+    def failure(self) -> None:
+        with self._lock:
+            self.consecutive += 1
+            if self.state == "half_open" or self.consecutive >= self.failures:
+                self.opened_at = time.monotonic()
+                self._set("open")
+
+    def _set(self, state: str) -> None:
+        if state != self.state:
+            print(f"⚡ LLM circuit {self.state} -> {state}")
+        self.state = state
+        metrics.set("social_support_llm_circuit_open", {}, float(state == "open"))
+
+
+breaker = CircuitBreaker()
+
+
+class Slots:
+    """
+    At most `limit` calls at Ollama, shared by threads (acquire) and event
+    loops (aacquire), granted first come, first served.
+    """
+
+    def __init__(self, limit: int = LLM_CONCURRENCY):
+        self.free = limit
+        self._waiters = collections.deque()
+        self._lock = threading.Lock()
+
+    def acquire(self, timeout: float) -> Optional[float]:
+        """Seconds spent waiting for a slot, or None when none came free in time."""
+        start = time.monotonic()
+        with self._lock:
+            if self.free and not self._waiters:
+                self.free -= 1
+                return 0.0
+            waiter = threading.Event()
+            self._waiters.append(waiter)
+        if waiter.wait(max(timeout, 0)) or not self._dequeue(waiter):
+            return time.monotonic() - start
+        return None
+
+    async def aacquire(self, timeout: float) -> Optional[float]:
+        start = time.monotonic()
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self.free and not self._waiters:
+                self.free -= 1
+                return 0.0
+            waiter = (loop, loop.create_future())
+            self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter[1], max(timeout, 0))
+            return time.monotonic() - start
+        except BaseException as e:
+            # Granted just as we gave up: a set result is ours to give back,
+            # a grant still on its way is given back by _hand_over
+            if not self._dequeue(waiter) and waiter[1].done() and not waiter[1].cancelled():
+                self.release()
+            if isinstance(e, asyncio.TimeoutError):
+                return None
+            raise
+
+    def release(self) -> None:
+        with self._lock:
+            while self._waiters:
+                if self._grant(self._waiters.popleft()):
+                    return
+            self.free += 1
+
+    def _dequeue(self, waiter) -> bool:
+        with self._lock:
+            try:
+                self._waiters.remove(waiter)
+                return True
+            except ValueError:
+                return False
+
+    def _grant(self, waiter) -> bool:
+        if isinstance(waiter, threading.Event):
+            waiter.set()
+            return True
+        loop, future = waiter
+        try:
+            loop.call_soon_threadsafe(self._hand_over, future)
+            return True
+        except RuntimeError:  # its loop is closed
+            return False
+
+    def _hand_over(self, future: asyncio.Future) -> None:
+        if future.cancelled():
+            self.release()
+        else:
+            future.set_result(None)
+
+
+_slots = Slots()
+
+# Shared clients. The async client is created lazily so it binds to the event
+# loop that serves requests. Async attempts are bounded with wait_for; sync
+# attempts run on _sync_pool and are given up with future.result(timeout) at
+# the same min(attempt timeout, remaining deadline). An abandoned sync attempt
+# keeps its slot until Ollama answers or the client's own timeout stops it.
+_client = ollama.Client(host=OLLAMA_HOST, timeout=LLM_ATTEMPT_TIMEOUT_S)
+# Every submitted attempt holds a slot, so these threads never queue
+_sync_pool = ThreadPoolExecutor(max_workers=LLM_CONCURRENCY, thread_name_prefix="llm")
+_async_client = None
+
+# Calls in flight by prompt key, for coalescing
+_inflight: Dict[str, Future] = {}
+_inflight_lock = threading.Lock()
+_async_inflight: Dict[tuple, asyncio.Task] = {}
+
+
+def get_async_client() -> ollama.AsyncClient:
+    global _async_client
+    if _async_client is None:
+        _async_client = ollama.AsyncClient(host=OLLAMA_HOST)
+    return _async_client
+
+
+def deadline_for(stage: str, timeout: Optional[float] = None) -> float:
+    return timeout if timeout is not None else LLM_DEADLINES_S.get(stage, LLM_DEFAULT_DEADLINE_S)
+
+
+def _before_attempt(stage: str, end: float) -> float:
+    """Seconds left before the deadline; raises when the call must not be made."""
+    if not breaker.allow():
+        metrics.inc("social_support_llm_errors_total", {"stage": stage, "cause": "circuit_open"})
+        raise LLMUnavailableError("LLM circuit open")
+    return _remaining(stage, end)
+
+
+def _remaining(stage: str, end: float) -> float:
+    remaining = end - time.monotonic()
+    if remaining <= 0:
+        metrics.inc("social_support_llm_errors_total", {"stage": stage, "cause": "deadline"})
+        raise LLMUnavailableError("LLM deadline exceeded")
+    return remaining
+
+
+def _no_slot(stage: str) -> LLMUnavailableError:
+    # Local queueing, not an Ollama failure: no retry, no breaker
+    metrics.inc("social_support_llm_errors_total", {"stage": stage, "cause": "queue"})
+    return LLMUnavailableError(f"LLM deadline spent waiting for one of {LLM_CONCURRENCY} slots")
+
+
+def _squeezed(error: Exception, waited: float, attempt_timeout: float) -> bool:
+    """A timeout only because waiting for the slot left the attempt short of its full time."""
+    return isinstance(error, TimeoutError) and waited > 0 and attempt_timeout < LLM_ATTEMPT_TIMEOUT_S
+
+
+def _attempt_timeout(stage: str, end: float) -> float:
+    """Seconds the attempt that now holds a slot may take; releases it when none are left."""
+    try:
+        return min(LLM_ATTEMPT_TIMEOUT_S, _remaining(stage, end))
+    except LLMUnavailableError:
+        _slots.release()
+        raise
+
+
+def _retry_delay(stage: str, error: Exception, attempt: int, end: float) -> float:
+    """Backoff before the next attempt after `error`; raises when the call should give up."""
+    if not is_transient(error):
+        breaker.success()
+        metrics.inc("social_support_llm_errors_total", {"stage": stage, "cause": "error"})
+        raise error
+    breaker.failure()
+    delay = random.uniform(0, LLM_RETRY_BACKOFF_S * 2 ** attempt)
+    if attempt >= LLM_RETRIES or time.monotonic() + delay >= end:
+        cause = "timeout" if isinstance(error, (TimeoutError, httpx.TimeoutException)) else "transient"
+        metrics.inc("social_support_llm_errors_total", {"stage": stage, "cause": cause})
+        raise LLMUnavailableError(f"{type(error).__name__}: {error}") from error
+    metrics.inc("social_support_llm_retries_total", {"stage": stage})
+    print(f"[WARN] {stage} LLM attempt {attempt + 1} failed ({type(error).__name__}), retrying in {delay:.2f}s")
+    return delay
+
+
+def _cache_lookup(model: str, messages: List[Dict[str, str]], kwargs: dict):
+    # Identical prompt + model + options -> identical key, for the cache and coalescing
+    key = hash_key(model, messages, kwargs)
+    cache = get_cache()
+    return cache, key, (cache.get("llm", key) if cache is not None else None)
+
+
+def _call(model: str, messages: List[Dict[str, str]], stage: str, end: float, kwargs: dict) -> str:
+    for attempt in range(LLM_RETRIES + 1):
+        waited = _slots.acquire(_before_attempt(stage, end))
+        if waited is None:
+            raise _no_slot(stage)
+        attempt_timeout = _attempt_timeout(stage, end)
+        start = time.perf_counter()
+        pending = _sync_pool.submit(_client.chat, model=model, messages=messages, stream=False,
+                                    keep_alive=OLLAMA_KEEP_ALIVE, **kwargs)
+        # The slot is free again once Ollama answers, even after we gave up on it
+        pending.add_done_callback(lambda _: _slots.release())
+        try:
+            try:
+                response = pending.result(timeout=attempt_timeout)
+            except FutureTimeoutError:
+                raise TimeoutError(f"no answer within {attempt_timeout:.1f}s")
+        except Exception as e:
+            if _squeezed(e, waited, attempt_timeout):
+                raise _no_slot(stage) from e
+            time.sleep(_retry_delay(stage, e, attempt, end))
+            continue
+        breaker.success()
+        record_llm(stage, model, time.perf_counter() - start, response)
+        return response["message"]["content"]
+
+
+def chat(messages: List[Dict[str, str]], model: str = MODEL_NAME, stage: str = "llm",
+         timeout: Optional[float] = None, **kwargs) -> str:
+    start = time.perf_counter()
+    deadline_s = deadline_for(stage, timeout)
+    cache, key, content = _cache_lookup(model, messages, kwargs)
+    if content is not None:
+        record_llm(stage, model, time.perf_counter() - start, cache_hit=True)
+        return content
+
+    with _inflight_lock:
+        future = _inflight.get(key)
+        leader = future is None
+        if leader:
+            future = _inflight[key] = Future()
+    if not leader:
+        metrics.inc("social_support_llm_coalesced_total", {"stage": stage})
+        try:
+            return future.result(timeout=deadline_s)
+        except FutureTimeoutError:
+            raise LLMUnavailableError("LLM deadline exceeded waiting for an identical call")
+
+    try:
+        content = _call(model, messages, stage, time.monotonic() + deadline_s, kwargs)
+        if cache is not None:
+            cache.set("llm", key, content)
+        future.set_result(content)
+        return content
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    finally:
+        with _inflight_lock:
+            _inflight.pop(key, None)
+
+
+async def _acall(model: str, messages: List[Dict[str, str]], stage: str, end: float, kwargs: dict,
+                 cache, key: str) -> str:
+    for attempt in range(LLM_RETRIES + 1):
+        # At most LLM_CONCURRENCY calls hit Ollama at once; the rest wait here
+        # instead of piling up on the model server
+        waited = await _slots.aacquire(_before_attempt(stage, end))
+        if waited is None:
+            raise _no_slot(stage)
+        attempt_timeout = _attempt_timeout(stage, end)
+        start = time.perf_counter()
+        try:
+            try:
+                response = await asyncio.wait_for(
+                    get_async_client().chat(model=model, messages=messages, stream=False,
+                                            keep_alive=OLLAMA_KEEP_ALIVE, **kwargs),
+                    timeout=attempt_timeout)
+            finally:
+                # Cancelling the request closes its connection, so Ollama stops too
+                _slots.release()
+        except Exception as e:
+            if _squeezed(e, waited, attempt_timeout):
+                raise _no_slot(stage) from e
+            await asyncio.sleep(_retry_delay(stage, e, attempt, end))
+            continue
+        breaker.success()
+        record_llm(stage, model, time.perf_counter() - start, response)
+        content = response["message"]["content"]
+        if cache is not None:
+            cache.set("llm", key, content)
+        return content
+
+
+def _forget(inflight_key: tuple):
+    def done(task: asyncio.Task) -> None:
+        _async_inflight.pop(inflight_key, None)
+        if not task.cancelled():
+            task.exception()  # mark retrieved, even when every caller has gone
+    return done
+
+
+async def achat(messages: List[Dict[str, str]], model: str = MODEL_NAME, stage: str = "llm",
+                timeout: Optional[float] = None, **kwargs) -> str:
+    start = time.perf_counter()
+    deadline_s = deadline_for(stage, timeout)
+    cache, key, content = _cache_lookup(model, messages, kwargs)
+    if content is not None:
+        record_llm(stage, model, time.perf_counter() - start, cache_hit=True)
+        return content
+
+    inflight_key = (id(asyncio.get_running_loop()), key)
+    task = _async_inflight.get(inflight_key)
+    if task is None:
+        # Its own task, so a caller that disconnects doesn't cancel it for the others
+        task = asyncio.ensure_future(_acall(model, messages, stage, time.monotonic() + deadline_s, kwargs, cache, key))
+        _async_inflight[inflight_key] = task
+        task.add_done_callback(_forget(inflight_key))
+    else:
+        metrics.inc("social_support_llm_coalesced_total", {"stage": stage})
+    return await asyncio.shield(task)
+
+
+async def warm_model(model: str = MODEL_NAME) -> float:
+    """Have Ollama load `model` and keep it resident; returns the seconds it took."""
+    start = time.perf_counter()
+    # A chat with no messages only loads the model (no deadline, loading can be slow)
+    await get_async_client().chat(model=model, messages=[], keep_alive=OLLAMA_KEEP_ALIVE)
+    return time.perf_counter() - start
@@ -1,26 +1,278 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, File, Form, HTTPException, Request, Response, UploadFile
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
-from typing import Dict
+from typing import Any, Dict, List, Optional
+from contextlib import asynccontextmanager
+import asyncio
+import json
+import os
 import uvicorn
-from graph import evaluater
+import time
+from applications import applications
+from scoring import score_records, get_eligibility_model
+from concurrency import AdmissionQueue, QueueFullError, run_until_disconnect
+from config import (
+    MAX_INFLIGHT_REQUESTS, MAX_QUEUED_REQUESTS, REQUEST_TIMEOUT_S,
+    OLLAMA_WARMUP, HOST, PORT, WORKERS, RELOAD,
+)
+from cascade import cascade_stats, warm_models
+from utils.cache import get_cache
+from tracing import start_trace, get_trace, metrics, node_span
+from utils.frontent_utils import document_key, texts_from_uploads
+from duplicates import upload_image_hashes
+from utils import ocr_utils
 
-app = FastAPI()
+
+# What /ready reports; filled in by the startup hook
+readiness = {"model": False, "ollama": not OLLAMA_WARMUP, "ollama_error": None, "ollama_warmup_ms": None}
+
+# Seconds between attempts while Ollama is still coming up
+OLLAMA_WARMUP_RETRY_S = 5
+
+
+def warm_up() -> None:
+    """Load what the first request would otherwise pay for."""
+    get_eligibility_model()  # already in memory when gunicorn preloaded it before fork
+    get_cache()
+    ocr_utils.preload()
+    readiness["model"] = True
+
+
+async def warm_ollama() -> None:
+    while True:
+        try:
+            timings = await warm_models()
+            readiness.update(ollama=True, ollama_error=None, ollama_warmup_ms=round(sum(timings.values()) * 1000, 1))
+            for model, seconds in timings.items():
+                print(f"🚀 Ollama model {model} loaded in {seconds * 1000:.0f} ms")
+            return
+        except Exception as e:
+            readiness["ollama_error"] = f"{type(e).__name__}: {e}"
+            print(f"Ollama warm-up failed, retrying in {OLLAMA_WARMUP_RETRY_S}s: {e}")
+            await asyncio.sleep(OLLAMA_WARMUP_RETRY_S)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    start = time.perf_counter()
+    await asyncio.to_thread(warm_up)
+    await applications.open()
+    print(f"🚀 Backend warmed up in {(time.perf_counter() - start) * 1000:.0f} ms (pid {os.getpid()})")
+    # Serve right away; /ready turns 200 once Ollama has the model loaded
+    ollama_task = asyncio.create_task(warm_ollama()) if OLLAMA_WARMUP else None
+    yield
+    if ollama_task is not None:
+        ollama_task.cancel()
+    await applications.close()
+
+
+app = FastAPI(lifespan=lifespan)
+
+admission = AdmissionQueue(MAX_INFLIGHT_REQUESTS, MAX_QUEUED_REQUESTS)
 
 
 class InputData(BaseModel):
     data: Dict[str, str]
     followup_query: str
+    # Continue a stored application: only new or replaced documents in `data`
+    application_id: Optional[str] = None
+
+
+class BatchInput(BaseModel):
+    records: List[Dict[str, Any]]
+
+
+async def run_pipeline(input_data: InputData) -> tuple:
+    async with admission.slot():
+        async with applications.turn(input_data.application_id, input_data.data,
+                                     input_data.followup_query) as (application_id, graph, state, run):
+            return application_id, await graph.ainvoke(state, **run)
+
 
 @app.post("/check_eligibility")
-def process_data(input_data: InputData):
-    applicant_info = input_data.data
+async def process_data(input_data: InputData, request: Request, response: Response):
+    with start_trace("check_eligibility") as trace:
+        response.headers["X-Request-ID"] = trace.request_id
+        try:
+            application_id, result = await asyncio.wait_for(
+                run_until_disconnect(request, run_pipeline(input_data)),
+                timeout=REQUEST_TIMEOUT_S,
+            )
+        except QueueFullError as e:
+            raise HTTPException(status_code=429, detail=f"Server busy ({e}), retry later",
+                                headers={"Retry-After": "5"})
+        except asyncio.TimeoutError:
+            raise HTTPException(status_code=504, detail=f"Evaluation exceeded {REQUEST_TIMEOUT_S:.0f}s")
+
+    if application_id:
+        response.headers["X-Application-ID"] = application_id
+    print(trace.summary())
+    print(f"⏱ hops={result.get('hops', 0)} llm_routing_calls={result.get('llm_routing_calls', 0)} "
+          f"routing_ms={result.get('routing_ms', 0.0):.1f}")
+
+    return result.get("final_response")
+
+
+# Nodes whose output is worth showing to the caseworker, in pipeline order
+STREAMED_NODES = ("data_extractor", "eligibility_checker", "data_validator", "response_generator")
+
+
+def ocr_uploads(files: dict, request_id: str) -> tuple:
+    """(texts by document, pHash of the image uploads by document)."""
+    with node_span("ocr"):
+        return texts_from_uploads(files, request_id=request_id), upload_image_hashes(files, document_key)
+
+
+async def stream_pipeline(applicant_info: dict, followup_query: str, files: dict = None,
+                          application_id: str = None):
+    """NDJSON events, one per finished node, then "done" and the request trace.
+    Raw uploads in `files` are OCRed here first, under the same slot and deadline."""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + REQUEST_TIMEOUT_S
+    start = time.perf_counter()
+
+    def event(name, **payload):
+        payload = {"event": name, "elapsed_ms": round((time.perf_counter() - start) * 1000, 1), **payload}
+        return json.dumps(payload, default=str) + "\n"
+
+    with start_trace("check_eligibility_stream") as trace:
+        try:
+            async with admission.slot():
+                image_hashes = None
+                if files:
+                    ocr = asyncio.to_thread(ocr_uploads, files, trace.request_id)
+                    texts, image_hashes = await asyncio.wait_for(ocr, deadline - loop.time())
+                    applicant_info = {**applicant_info, **texts}
+                    yield event("ocr", data={"documents": sorted(applicant_info)})
+                turn = applications.turn(application_id, applicant_info, followup_query, image_hashes)
+                async with turn as (application_id, graph, state, run):
+                    updates = graph.astream(state, stream_mode="updates", **run)
+                    final_response = None
+                    while True:
+                        try:
+                            chunk = await asyncio.wait_for(updates.__anext__(), timeout=deadline - loop.time())
+                        except StopAsyncIteration:
+                            break
+                        for node, update in chunk.items():
+                            if node in STREAMED_NODES:
+                                final_response = (update or {}).get("final_response", final_response)
+                                yield event(node, data=update)
+                yield event("done", request_id=trace.request_id, application_id=application_id,
+                            final_response=final_response)
+        except QueueFullError as e:
+            yield event("error", status=429, detail=f"Server busy ({e}), retry later")
+        except asyncio.TimeoutError:
+            yield event("error", status=504, detail=f"Evaluation exceeded {REQUEST_TIMEOUT_S:.0f}s")
+
+    print(trace.summary())
+    yield event("trace", trace=trace.to_dict())
+
+
+def check_admission():
+    # Reject before the 200 goes out; a client disconnect cancels the generator
+    try:
+        admission.check()
+    except QueueFullError as e:
+        raise HTTPException(status_code=429, detail=f"Server busy ({e}), retry later",
+                            headers={"Retry-After": "5"})
+
+
+@app.post("/check_eligibility/stream")
+async def process_data_stream(input_data: InputData):
+    check_admission()
+    return StreamingResponse(stream_pipeline(input_data.data, input_data.followup_query,
+                                             application_id=input_data.application_id),
+                             media_type="application/x-ndjson")
+
+
+@app.post("/check_eligibility/upload")
+async def process_upload_stream(files: List[UploadFile] = File(...), followup_query: str = Form(""),
+                                application_id: Optional[str] = Form(None)):
+    """Raw documents as multipart; OCR runs here instead of in the UI process.
+    Streams the same NDJSON events as /check_eligibility/stream, plus "ocr".
+    With an application_id, only the replaced documents need to be sent."""
+    check_admission()
+    documents = {file.filename: await file.read() for file in files}
+    return StreamingResponse(stream_pipeline({}, followup_query, documents, application_id),
+                             media_type="application/x-ndjson")
+
+
+@app.post("/check_eligibility_batch")
+async def process_batch(batch: BatchInput):
+    # Already-extracted records: no LLM, one vectorised model call.
+    # Runs in a thread so a large batch does not stall the event loop.
+    start = time.perf_counter()
+    results = await asyncio.to_thread(score_records, batch.records)
+    total_ms = (time.perf_counter() - start) * 1000
+    fallback = sum(r["source"] == "rules" for r in results)
+    print(f"⏱ batch of {len(results)} scored in {total_ms:.1f} ms ({fallback} by rules)")
+    return {"results": results, "model_scored": len(results) - fallback, "rule_scored": fallback}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/trace/{request_id}")
+async def request_trace(request_id: str):
+    trace = get_trace(request_id)
+    if trace is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired request id")
+    return trace.to_dict()
+
+
+@app.get("/applications/{application_id}")
+async def application_state(application_id: str):
+    summary = await applications.summary(application_id) if applications.enabled else None
+    if summary is None:
+        raise HTTPException(status_code=404, detail="Unknown application id")
+    return summary
+
+
+@app.delete("/applications/{application_id}")
+async def delete_application(application_id: str):
+    if not applications.enabled:
+        raise HTTPException(status_code=404, detail="Applications are not stored")
+    await applications.delete(application_id)
+    return {"deleted": application_id}
+
+
+@app.get("/health")
+async def health():
+    # Liveness: the worker's event loop is answering
+    return {"status": "ok", "pid": os.getpid()}
+
+
+@app.get("/ready")
+async def ready():
+    # Readiness: model loaded and Ollama warm; 503 until then
+    is_ready = readiness["model"] and readiness["ollama"]
+    return JSONResponse({"ready": is_ready, "pid": os.getpid(), **readiness}, status_code=200 if is_ready else 503)
+
+
+@app.get("/queue")
+async def queue_status():
+    return admission.stats()
+
+
+@app.get("/cascade")
+async def cascade_status():
+    # Per LLM stage: escalation rate past the small model, latency, who answered
+    return cascade_stats()
 
-    result = evaluater.invoke({"applicant_info": applicant_info})
-    print(result)
 
+@app.get("/cache")
+async def cache_status():
+    cache = get_cache()
+    return cache.stats() if cache is not None else {"enabled": False}
 
-    response = result.get("final_response")
-    return response
 
 if __name__ == "__main__":
-    uvicorn.run("main:app", host="127.0.0.1", port=8000, reload=True)
+    if WORKERS > 1:
+        # Spawned workers load the model themselves; the memory-mapped
+        # compiled forest is still shared through the page cache. For a
+        # preforked copy-on-write model use gunicorn -c gunicorn.conf.py.
+        uvicorn.run("main:app", host=HOST, port=PORT, workers=WORKERS)
+    else:
+        uvicorn.run("main:app", host=HOST, port=PORT, reload=RELOAD)
@@ -1,120 +1,228 @@
 from state import AppState
-from llm import parse_applicant_info, document_validater, response_generator_ollama, check_eligibility
+from llm import (
+    parse_applicant_info, validate_and_decide, response_generator_ollama,
+    aparse_applicant_info, avalidate_and_decide, aresponse_generator_ollama, Call, run_stage, arun_stage,
+)
+from validation import final_decision
+import asyncio
 import json
-import ollama
-import os
-import joblib
-import pandas as pd
-import re
-
-# Load eligibility model once
-model_path = os.path.join("../models", "eligibility_model.joblib")
-eligibility_model = joblib.load(model_path)
+import time
+from config import ROUTING_MODE, MAX_HOPS, EXTRACTION_MODE
+from context import extraction_text, project_state
+from extractors import FIELDS, affected_fields, extract_fields, merge_llm_fields, statement_income
+from scoring import ELIGIBILITY_FIELDS, score_records
+from tracing import record_event, record_fallback
+from duplicates import STRONG_MATCHES, get_index
 
+NODE_NAMES = ("data_extractor", "data_validator", "eligibility_checker", "response_generator")
 
 
 class DataExtractor:
-    def __call__(self, state: AppState) -> dict:
-        application = state.get("applicant_info", {}).get("application_form", "")
-        if not application.strip():
-            uploaded = state.get("applicant_info", {})
-            application = " ".join([
-                uploaded.get("bank_statement", ""),
-                uploaded.get("salary", ""),
-                uploaded.get("passport", "")
-            ])
+    def __init__(self, mode: str = EXTRACTION_MODE):
+        self.mode = mode
+
+    def application_text(self, state: AppState) -> str:
+        # Cleaned OCR text, cut to the extraction prompt budget
+        return extraction_text(state.get("applicant_info", {}))
+
+    def plan(self, state: AppState):
+        """(rule/stored first pass, text for the LLM or "" when it isn't needed)."""
+        first = self.first_pass(state)
+        application = self.application_text(state) if first["needs_llm"] else ""
+        return first, application if application.strip() else ""
+
+    def first_pass(self, state: AppState) -> dict:
+        if self.mode != "rules":
+            first = {"values": {}, "confidence": {}, "documents": {}, "needs_llm": list(FIELDS)}
+        else:
+            first = extract_fields(state.get("applicant_info", {}))
+            record_event("data_extractor", f"rules read {first['documents']}, "
+                                           f"LLM needed for {first['needs_llm'] or 'nothing'}")
+        return self.reuse_stored(state, first)
+
+    def reuse_stored(self, state: AppState, first: dict) -> dict:
+        # Resubmission of a stored application: fields the replaced documents
+        # cannot supply keep their stored value instead of going to the LLM
+        previous, changed = state.get("extracted_data"), state.get("changed_documents")
+        if not previous or not changed:
+            return first
+        affected = affected_fields(state.get("applicant_info", {}), changed)
+        kept = [f for f in first["needs_llm"] if f not in affected and previous.get(f) not in (None, "")]
+        record_event("data_extractor", f"resubmitted {changed}: re-extracting {sorted(affected)}, "
+                                       f"stored value kept for {kept or 'nothing'}")
+        values = {**(first["values"] or {f: "" for f in FIELDS}), **{f: previous[f] for f in kept}}
+        return {**first, "values": values, "needs_llm": [f for f in first["needs_llm"] if f not in kept], "kept": kept}
+
+    def duplicate_matches(self, state: AppState, extracted_data: dict) -> list:
+        index = get_index()
+        if index is None:
+            return []
+        # Lookup only: the application is indexed once its turn has finished
+        # (duplicates.record_application), and only under a durable id
+        matches = index.check(state.get("application_id"), state.get("applicant_info", {}), extracted_data,
+                              state.get("image_hashes"))
+        strong = sorted({m["application_id"] for m in matches if m["match"] in STRONG_MATCHES})
+        if matches:
+            record_event("data_extractor", f"{len(matches)} cross-application match(es)"
+                         + (f", documents or passport shared with {strong}" if strong else ""))
+        return matches
 
-        print("Application Data\n\n--------------", application)
+    @staticmethod
+    def merge(first: dict, llm_values: dict) -> dict:
+        return merge_llm_fields(first, llm_values) if first["values"] else llm_values
+
+    def finish(self, state: AppState, first: dict, llm_values: dict, extracted_data: dict, matches: list) -> dict:
+        income = statement_income(state.get("applicant_info", {}))
+        if income:
+            record_event("data_extractor", f"bank statement: {income['transactions']} transactions")
+        update = {
+            "extracted_data": extracted_data,
+            "income_features": income,
+            "duplicate_matches": matches,
+            "extraction": {
+                "documents": first["documents"],
+                "confidence": first["confidence"],
+                "llm_fields": (first["needs_llm"] if llm_values else []) + [
+                    f for f in first.get("kept", []) if f in (state.get("extraction") or {}).get("llm_fields", [])],
+            },
+        }
+        previous = state.get("extracted_data")
+        if previous is not None:
+            # Re-extraction: validation and the decision are redone, the
+            # eligibility score only if one of its inputs changed
+            changed_fields = sorted(f for f in FIELDS if extracted_data.get(f) != previous.get(f))
+            update["extraction"]["changed_fields"] = changed_fields
+            update.update(changed_documents=[], validation_results=None, final_response=None)
+            if set(changed_fields) & set(ELIGIBILITY_FIELDS) or income != state.get("income_features"):
+                update["eligibility"] = None
+        return update
 
-        extracted_data = {}
-        if application.strip():
-            try:
-                print("Extracting relevant info...")
-                extracted_data = parse_applicant_info(extracted_text=application)
-            except Exception as e:
-                print("Data extraction failed:", e)
+    # parse_applicant_info falls back to the regex parser itself, so only the
+    # LLM call and the duplicate lookup differ between the two paths
+    def __call__(self, state: AppState) -> dict:
+        first, application = self.plan(state)
+        llm_values = {}
+        if application:
+            llm_values = parse_applicant_info(extracted_text=application, fields=first["needs_llm"])
+        extracted_data = self.merge(first, llm_values)
+        return self.finish(state, first, llm_values, extracted_data, self.duplicate_matches(state, extracted_data))
 
-        print("Extracted Data:", extracted_data)
-        return {"extracted_data": extracted_data}
+    async def acall(self, state: AppState) -> dict:
+        first, application = self.plan(state)
+        llm_values = {}
+        if application:
+            llm_values = await aparse_applicant_info(extracted_text=application, fields=first["needs_llm"])
+        extracted_data = self.merge(first, llm_values)
+        # MinHash and SQLite (busy timeout) stay off the event loop
+        matches = await asyncio.to_thread(self.duplicate_matches, state, extracted_data)
+        return self.finish(state, first, llm_values, extracted_data, matches)
 
 
 class DataValidator:
+    # Validation and the final decision come out of one stage, so the
+    # response generator has nothing left to ask the LLM for
+    def __init__(self, speculative: bool = False):
+        # Speculative: runs alongside the eligibility model, so it decides as
+        # if eligible; ResponseGenerator(speculative=True) overrules it when not
+        self.speculative = speculative
+
+    def inputs(self, state: AppState) -> dict:
+        return {**state, "eligibility": True} if self.speculative else state
+
     def __call__(self, state: AppState) -> dict:
-        print("Validating data...")
-        validation_results = document_validater(state)
-        return {"validation_results": validation_results}
+        return validate_and_decide(self.inputs(state))
+
+    async def acall(self, state: AppState) -> dict:
+        return await avalidate_and_decide(self.inputs(state))
 
 
 class EligibilityChecker:
     def __call__(self, state: AppState) -> dict:
-        applicant_info = state.get("extracted_data", {})
+        if state.get("eligibility") is not None:
+            # Stored application whose model inputs did not change
+            return {}
+        # Recurring non-salary credits from the bank statement count as income
+        income = state.get("income_features") or {}
+        record = {**(state.get("extracted_data") or {}), "other_income": income.get("other_income", 0)}
+        result = score_records([record])[0]
+        record_event("eligibility_checker", f"{result['eligible']} (scored by {result['source']})")
+        return {"eligibility": result["eligible"]}
 
-        # Convert monthly_income to number
-        raw_income = applicant_info.get("monthly_income", 0)
-        if isinstance(raw_income, str):
-            numbers = re.findall(r"[\d,]+", raw_income)
-            income = int(numbers[0].replace(",", "")) if numbers else 0
-        else:
-            income = raw_income
+    async def acall(self, state: AppState) -> dict:
+        # Local model only, cheap enough to run on the event loop
+        return self(state)
 
-        # Family members
-        family_members = applicant_info.get("family_members", 1)
-        try:
-            family_size = int(family_members)
-        except Exception:
-            family_size = 1
-
-        # Assets
-        raw_assets = applicant_info.get("assets", 0)
-        if isinstance(raw_assets, str):
-            numbers = re.findall(r"[\d,]+", raw_assets)
-            assets = int(numbers[0].replace(",", "")) if numbers else 0
-        else:
-            assets = raw_assets
 
-        # Liabilities
-        raw_liabilities = applicant_info.get("liabilities", 0)
-        if isinstance(raw_liabilities, str):
-            numbers = re.findall(r"[\d,]+", raw_liabilities)
-            liabilities = int(numbers[0].replace(",", "")) if numbers else 0
-        else:
-            liabilities = raw_liabilities
+class ResponseGenerator:
+    def __init__(self, speculative: bool = False):
+        # Joins a speculative DataValidator: its result only counts when eligible
+        self.speculative = speculative
 
-        df = pd.DataFrame([{
-            "income": income,
-            "family_size": family_size,
-            "employment_years": applicant_info.get("employment_years", 0),
-            "assets": assets,
-            "age": applicant_info.get("age", 0)
-        }])
+    def join(self, state: AppState):
+        """(state to decide on, update) with a speculative validation dropped for ineligible applicants."""
+        if self.speculative and state.get("eligibility") is not True and state.get("validation_results") is not None:
+            record_event("response_generator", "not eligible: speculative validation result discarded")
+            # Same state as the sequential graph, where validation never ran
+            return {**state, "validation_results": None, "final_response": None}, {"validation_results": None}
+        return state, {}
 
-        print("Eligibility Input DataFrame:\n", df)
+    def decided(self, state: AppState):
+        # Follow-up questions still go to the LLM; otherwise the decision
+        # rules are fixed and need no model call
+        if state.get("followup_query"):
+            return None
+        if state.get("final_response"):
+            return state["final_response"]
+        return final_decision(state.get("eligibility", False), state.get("validation_results", {}))
 
-        try:
-            prediction = eligibility_model.predict(df)[0]
-            eligibility = True if prediction == 0 else False
-        except Exception as e:
-            print("Eligibility model failed:", e)
-            eligibility_result = check_eligibility({
-                "monthly_income": income,
-                "family_members": family_size,
-                "assets": assets,
-                "liabilities": liabilities
-            })
-            eligibility = eligibility_result.get("eligible", False)
+    def __call__(self, state: AppState) -> dict:
+        state, update = self.join(state)
+        return {**update, "final_response": self.decided(state) or response_generator_ollama(state)}
 
-        return {"eligibility": eligibility}
+    async def acall(self, state: AppState) -> dict:
+        state, update = self.join(state)
+        return {**update, "final_response": self.decided(state) or await aresponse_generator_ollama(state)}
 
 
-class ResponseGenerator:
-    def __call__(self, state: AppState) -> dict:
-        final_response = response_generator_ollama(state)
-        return {"final_response": final_response}
+def route_by_rules(state: AppState):
+    """
+    Deterministic version of the orchestrator prompt rules.
+    Returns the next node name, or None when the state is ambiguous
+    (e.g. a follow-up question) and the LLM should decide.
+    """
+    if state.get("extracted_data") is None or state.get("changed_documents"):
+        # New or replaced documents first, even when the turn also asks a question
+        return "data_extractor"
+    if state.get("followup_query"):
+        # A question about an application already decided needs only an answer
+        return "response_generator" if state.get("final_response") else None
+    if state.get("eligibility") is None:
+        return "eligibility_checker"
+    if state.get("eligibility") is True and state.get("validation_results") is None:
+        return "data_validator"
+    return "response_generator"
+
+
+def route_entry(state: AppState) -> str:
+    """Entry of the parallel graph: extract, or answer straight from a stored decision."""
+    if state.get("extracted_data") is None or state.get("changed_documents"):
+        return "data_extractor"
+    return "response_generator"
+
+
+def routing_check(content: str) -> list:
+    """Cascade check for routing replies: a known next node."""
+    next_node = json.loads(content).get("next_node")
+    return [] if next_node in NODE_NAMES else [f"unknown node {next_node!r}"]
 
 
 class Orchestrator:
-    def __call__(self, state: AppState) -> dict:
-        state_json = json.dumps(state, indent=2)
+    def __init__(self, mode: str = ROUTING_MODE):
+        self.mode = mode
+
+    def routing_prompt(self, state: AppState) -> list:
+        # Only routing-relevant facts; the raw documents never go to the router
+        state_json = json.dumps(project_state(state, "orchestrator"), indent=2)
         prompt = f"""
         You are an Orchestrator AI for validating a social support application.
 
@@ -122,7 +230,7 @@ class Orchestrator:
         {state_json}
 
         Rules:
-        1. Start with 'data_extractor' when new application_info is received.
+        1. Start with 'data_extractor' when new application_info is received or changed_documents is set.
         2. After extraction, go to 'eligibility_checker'.
         3. If eligible=True, go to 'data_validator'. then go to `response_generator`
         4. If eligible=False, or `validation_results` available go to 'response_generator'.
@@ -134,15 +242,61 @@ class Orchestrator:
         "reason": "<short reason>"
         }}
         """
+        return [{"role": "user", "content": prompt}]
+
+    def fallback_decision(self, state: AppState, error: Exception) -> dict:
+        record_fallback("orchestrator", error)
+        return {"next_node": route_by_rules({**state, "followup_query": ""}), "reason": "fallback due to parse error"}
+
+    def routing_steps(self, state: AppState):
         try:
-            response = ollama.chat(model="qwen2.5:7b-instruct", messages=[{"role": "user", "content": prompt}])
-            decision = json.loads(response.get("content", "{}"))
+            return json.loads((yield Call(self.routing_prompt(state), "orchestrator", routing_check)))
         except Exception as e:
-            print("Orchestrator failed:", e)
-            decision = {"next_node": "data_extractor", "reason": "fallback due to parse error"}
+            return self.fallback_decision(state, e)
+
+    def ask_llm(self, state: AppState) -> dict:
+        return run_stage(self.routing_steps(state))
+
+    async def aask_llm(self, state: AppState) -> dict:
+        return await arun_stage(self.routing_steps(state))
+
+    def rule_decision(self, state: AppState):
+        if state.get("hops", 0) + 1 > MAX_HOPS:
+            return {"next_node": "response_generator", "reason": f"hop limit {MAX_HOPS} reached"}
+        next_node = route_by_rules(state) if self.mode == "rules" else None
+        if next_node is not None:
+            return {"next_node": next_node, "reason": "rule-based routing"}
+        return None
+
+    def __call__(self, state: AppState) -> dict:
+        start = time.perf_counter()
+        decision = self.rule_decision(state)
+        llm_call = decision is None
+        if llm_call:
+            decision = self.ask_llm(state)
+        return self.finish(state, decision, llm_call, start)
+
+    async def acall(self, state: AppState) -> dict:
+        start = time.perf_counter()
+        decision = self.rule_decision(state)
+        llm_call = decision is None
+        if llm_call:
+            decision = await self.aask_llm(state)
+        return self.finish(state, decision, llm_call, start)
+
+    def finish(self, state: AppState, decision: dict, llm_call: bool, start: float) -> dict:
+        hops = state.get("hops", 0) + 1
+        llm_calls = state.get("llm_routing_calls", 0) + int(llm_call)
+
+        if decision.get("next_node") not in NODE_NAMES:
+            decision = {"next_node": "response_generator", "reason": f"unknown node {decision.get('next_node')!r}"}
 
-        print(f"🧭 Orchestrator Decision → {decision.get('next_node')} ({decision.get('reason')})")
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        record_event("orchestrator", f"→ {decision['next_node']} ({decision.get('reason')})",
+                     hop=hops, routing_ms=round(elapsed_ms, 1))
         return {
-            **state,
-            "next": decision.get("next_node", "data_extractor")
+            "next": decision["next_node"],
+            "hops": hops,
+            "llm_routing_calls": llm_calls,
+            "routing_ms": state.get("routing_ms", 0.0) + elapsed_ms,
         }
@@ -0,0 +1,200 @@
+"""
+Vectorised eligibility scoring for one or many extracted applicant records.
+
+    python scoring.py caseload.csv scored.csv
+"""
+import json
+import os
+import sys
+import threading
+import warnings
+import numpy as np
+import pandas as pd
+from config import ELIGIBILITY_PREDICTOR, ELIGIBILITY_MODEL_VERSION, MODELS_DIR
+from forest import CompiledForest
+from tracing import record_fallback
+from utils.policy import get_policy
+
+# Column order the model was trained with (training.py)
+MODEL_FEATURES = ["income", "family_size", "employment_years", "assets", "age"]
+
+model_path = os.path.join(MODELS_DIR, "eligibility_model.joblib")
+compiled_model_path = os.path.join(MODELS_DIR, "eligibility_model.npz")
+# Schema of the promoted model, written by training.py --promote
+current_schema_path = os.path.join(MODELS_DIR, "eligibility_model.json")
+
+# The unversioned model from utils/data_prep.py was trained on
+# data/applicants.csv, where 1 = eligible; trained models state it in their schema
+LEGACY_ELIGIBLE_CLASS = 1
+
+_model = None
+_model_lock = threading.Lock()
+
+
+class ModelSchemaError(Exception):
+    """The model on disk does not match the features the backend computes."""
+
+
+def load_model_schema(version: str = ELIGIBILITY_MODEL_VERSION):
+    """The schema of the model to load, or None for the unversioned legacy model."""
+    if version:
+        path = os.path.join(MODELS_DIR, f"eligibility_model-{version}.json")
+        if not os.path.exists(path):
+            raise ModelSchemaError(f"ELIGIBILITY_MODEL_VERSION={version}: {path} does not exist")
+    elif os.path.exists(current_schema_path):
+        path = current_schema_path
+    else:
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def check_model(model, schema) -> None:
+    """Raise ModelSchemaError unless model and schema agree with MODEL_FEATURES."""
+    name = f"model {schema['version']}" if schema else "legacy model"
+    if schema is not None:
+        if schema.get("features") != MODEL_FEATURES:
+            raise ModelSchemaError(f"{name} was trained on {schema.get('features')}, "
+                                   f"the backend computes {MODEL_FEATURES}")
+        if schema.get("eligible_class") not in schema.get("classes", []):
+            raise ModelSchemaError(f"{name}: eligible_class {schema.get('eligible_class')} "
+                                   f"is not one of its classes {schema.get('classes')}")
+    names = getattr(model, "feature_names_in_", None)
+    if names is not None and list(names) != MODEL_FEATURES:
+        raise ModelSchemaError(f"{name} expects columns {list(names)}, the backend computes {MODEL_FEATURES}")
+    if getattr(model, "n_features_in_", len(MODEL_FEATURES)) != len(MODEL_FEATURES):
+        raise ModelSchemaError(f"{name} expects {model.n_features_in_} features, not {len(MODEL_FEATURES)}")
+    classes = [int(c) for c in getattr(model, "classes_", [])]
+    if schema is not None and classes and classes != schema.get("classes"):
+        raise ModelSchemaError(f"{name}: classes {classes} differ from the schema's {schema.get('classes')}")
+
+
+def load_eligibility_model():
+    """
+    The versioned model described by its schema, or the legacy unversioned
+    files. Raises ModelSchemaError on any mismatch, so a wrong model stops
+    the API at startup instead of every row quietly going to the rules.
+    """
+    schema = load_model_schema()
+    if schema is None:
+        joblib_path, npz_path = model_path, compiled_model_path
+        print(f"[WARN] No model schema in {MODELS_DIR}, loading the unversioned model (see training.py)")
+    else:
+        artifacts = schema["artifacts"]
+        joblib_path = os.path.join(MODELS_DIR, artifacts["joblib"])
+        npz_path = os.path.join(MODELS_DIR, artifacts["compiled"]) if artifacts.get("compiled") else None
+
+    if ELIGIBILITY_PREDICTOR == "compiled" and npz_path and os.path.exists(npz_path):
+        model = CompiledForest.load(npz_path)
+    else:
+        # joblib/sklearn only load when the pickled model is actually needed
+        import joblib
+        model = joblib.load(joblib_path)
+
+    check_model(model, schema)
+    model.eligible_class_ = LEGACY_ELIGIBLE_CLASS if schema is None else schema["eligible_class"]
+    if schema is not None:
+        print(f"🧮 Eligibility model {schema['version']} ({schema['model']}, {type(model).__name__})")
+    return model
+
+
+def get_eligibility_model():
+    """Load the model once, on first use or from the API's startup hook."""
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                _model = load_eligibility_model()
+    return _model
+
+# Extracted fields the score depends on (the rule fallback also uses liabilities;
+# other_income comes from the bank statement, see EligibilityChecker)
+ELIGIBILITY_FIELDS = ["monthly_income", "family_members", "employment_years", "assets", "age", "liabilities"]
+
+
+def _amount(values: pd.Series, default: float) -> pd.Series:
+    """First number in each value ("AED 7,300" -> 7300); missing -> default."""
+    numeric = pd.to_numeric(values, errors="coerce")
+    text = values.where(numeric.isna()).astype("string")
+    parsed = pd.to_numeric(text.str.extract(r"(\d[\d,]*)", expand=False).str.replace(",", "", regex=False),
+                           errors="coerce")
+    return numeric.fillna(parsed).fillna(default).astype(float)
+
+
+# Stored caseloads (e.g. data/applicants.csv) use the model column names
+_ALIASES = {"monthly_income": "income", "family_members": "family_size"}
+
+
+def _column(frame: pd.DataFrame, name: str, default) -> pd.Series:
+    for column in (name, _ALIASES.get(name)):
+        if column in frame:
+            # Keys missing from some records behave like dict.get(name, default)
+            return frame[column].astype(object).where(frame[column].notna(), default)
+    return pd.Series(default, index=frame.index, dtype=object)
+
+
+def coerce_features(records) -> pd.DataFrame:
+    """
+    Turn extracted applicant records (list of dicts or a DataFrame with the
+    LLM field names, optionally other_income) into numeric model features
+    plus liabilities.
+    Rows where employment_years or age are not numeric come back as NaN.
+    """
+    frame = records if isinstance(records, pd.DataFrame) else pd.DataFrame.from_records(records)
+    frame = frame.reset_index(drop=True)
+
+    family = pd.to_numeric(_column(frame, "family_members", 1), errors="coerce")
+    family = family.where(family == family.round()).fillna(1)
+
+    return pd.DataFrame({
+        # Salary plus recurring other income (bank statement credits)
+        "income": _amount(_column(frame, "monthly_income", 0), 0) + _amount(_column(frame, "other_income", 0), 0),
+        "family_size": family.astype(float),
+        "employment_years": pd.to_numeric(_column(frame, "employment_years", 0).replace("", 0), errors="coerce"),
+        "assets": _amount(_column(frame, "assets", 0), 0),
+        "age": pd.to_numeric(_column(frame, "age", 0).replace("", 0), errors="coerce"),
+        "liabilities": _amount(_column(frame, "liabilities", 0), 0),
+    })
+
+
+def score_records(records, model=None) -> list:
+    """
+    Score many applicants with one model call over a NumPy matrix.
+    Rows the model cannot score go to the eligibility policy instead.
+    Returns [{"eligible": bool, "source": "model" | "rules"}, ...] in input order.
+    """
+    model = get_eligibility_model() if model is None else model
+    features = coerce_features(records)
+    X = features[MODEL_FEATURES].to_numpy(dtype=np.float64)
+    ok = np.isfinite(X).all(axis=1)
+
+    eligible = np.zeros(len(features), dtype=bool)
+    if ok.any():
+        try:
+            with warnings.catch_warnings():
+                # Model was fitted on a DataFrame; plain arrays are fine here
+                warnings.simplefilter("ignore", UserWarning)
+                prediction = model.predict(X[ok])
+            eligible[ok] = prediction == getattr(model, "eligible_class_", LEGACY_ELIGIBLE_CLASS)
+        except Exception as e:
+            print("Eligibility model failed:", e)
+            ok[:] = False
+
+    source = np.where(ok, "model", "rules")
+    if not ok.all():
+        record_fallback("eligibility", f"{int((~ok).sum())} row(s) scored by rules")
+        # The eligibility policy (policies/), over all of those rows at once
+        rules = features[~ok]
+        eligible[~ok] = get_policy().evaluate({c: rules[c].to_numpy(dtype=np.float64) for c in rules})
+
+    return [{"eligible": bool(e), "source": str(s)} for e, s in zip(eligible, source)]
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print(__doc__)
+        sys.exit(1)
+    caseload = pd.read_csv(sys.argv[1], dtype=object)
+    results = pd.DataFrame(score_records(caseload))
+    pd.concat([caseload, results], axis=1).to_csv(sys.argv[2], index=False)
+    print(f"Scored {len(results)} applicants ({(results['source'] == 'rules').sum()} by rules) -> {sys.argv[2]}")
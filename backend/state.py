@@ -4,6 +4,23 @@ class AppState(TypedDict):
     applicant_info: str
     followup_query: str
     extracted_data: dict
+    # Per-field confidence and which fields the LLM filled (see extractors.py)
+    extraction: dict
+    # Figures from the bank statement transactions (see utils/bank_statement.py)
+    income_features: dict
+    # Documents replaced since the stored evaluation (see applications.py)
+    changed_documents: list
+    # Stored application id (or batch applicant id), and the pHash of each image
+    # upload; duplicates.py indexes the application under that id
+    application_id: str
+    image_hashes: dict
+    # Other applications sharing documents or identity fields (see duplicates.py)
+    duplicate_matches: list
     eligibility: bool
     validation_results: dict
-    final_response: str
\ No newline at end of file
+    final_response: str
+    # Routing bookkeeping (see Orchestrator)
+    next: str
+    hops: int
+    llm_routing_calls: int
+    routing_ms: float
@@ -0,0 +1,227 @@
+"""
+Lightweight tracing and metrics for the eligibility pipeline.
+
+Every graph node and LLM call records a span on the current request's trace
+(a contextvar, so it follows the request through LangGraph's threads and
+tasks) and updates process-wide metrics rendered in Prometheus text format.
+"""
+import contextvars
+import threading
+import time
+import uuid
+from collections import OrderedDict, defaultdict
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+
+# Upper bounds (seconds) for latency histograms
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+# Completed traces kept in memory for GET /trace/{request_id}
+MAX_TRACES = 500
+
+_current = contextvars.ContextVar("trace", default=None)
+
+
+class Trace:
+    def __init__(self, request_id: Optional[str] = None):
+        self.request_id = request_id or uuid.uuid4().hex
+        self.started = time.time()
+        self.spans = []
+        self.total_ms = None
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def add(self, span: Dict[str, Any]) -> None:
+        span["offset_ms"] = round((time.perf_counter() - self._start) * 1000 - span.get("ms", 0), 1)
+        with self._lock:
+            self.spans.append(span)
+
+    def finish(self) -> None:
+        self.total_ms = round((time.perf_counter() - self._start) * 1000, 1)
+
+    def to_dict(self) -> Dict[str, Any]:
+        llm = [s for s in self.spans if s["kind"] == "llm"]
+        return {
+            "request_id": self.request_id,
+            "started": self.started,
+            "total_ms": self.total_ms,
+            "llm_calls": sum(1 for s in llm if not s.get("cache_hit")),
+            "llm_cache_hits": sum(1 for s in llm if s.get("cache_hit")),
+            "prompt_tokens": sum(s.get("prompt_tokens", 0) for s in llm),
+            "completion_tokens": sum(s.get("completion_tokens", 0) for s in llm),
+            "fallbacks": [s["stage"] for s in self.spans if s["kind"] == "fallback"],
+            "escalations": [s["stage"] for s in self.spans if s["kind"] == "escalation"],
+            "spans": list(self.spans),
+        }
+
+    def summary(self) -> str:
+        stages = " ".join(f"{s['stage']}={s['ms']:.0f}ms" for s in self.spans if s["kind"] == "node")
+        d = self.to_dict()
+        return (f"⏱ [{self.request_id[:8]}] total={self.total_ms:.0f}ms llm_calls={d['llm_calls']} "
+                f"cache_hits={d['llm_cache_hits']} tokens={d['prompt_tokens']}+{d['completion_tokens']} {stages}")
+
+
+class Metrics:
+    """Minimal Prometheus-style counters, gauges and histograms keyed by label tuples."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = defaultdict(float)
+        self.histograms = {}
+        self.help = {}
+
+    def describe(self, name: str, kind: str, text: str) -> None:
+        self.help[name] = (kind, text)
+
+    def inc(self, name: str, labels: Dict[str, str], value: float = 1.0) -> None:
+        with self._lock:
+            self.counters[(name, tuple(sorted(labels.items())))] += value
+
+    def set(self, name: str, labels: Dict[str, str], value: float) -> None:
+        # Gauges live with the counters, only the HELP/TYPE differs
+        with self._lock:
+            self.counters[(name, tuple(sorted(labels.items())))] = value
+
+    def observe(self, name: str, labels: Dict[str, str], seconds: float) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            hist = self.histograms.setdefault(key, {"buckets": [0] * len(BUCKETS), "sum": 0.0, "count": 0})
+            for i, bound in enumerate(BUCKETS):
+                if seconds <= bound:
+                    hist["buckets"][i] += 1
+            hist["sum"] += seconds
+            hist["count"] += 1
+
+    def render(self) -> str:
+        def fmt(labels, extra=()):
+            items = list(labels) + list(extra)
+            if not items:
+                return ""
+            return "{" + ",".join(f'{k}="{v}"' for k, v in items) + "}"
+
+        lines = []
+        with self._lock:
+            names = sorted({k[0] for k in self.counters} | {k[0] for k in self.histograms} | set(self.help))
+            for name in names:
+                kind, text = self.help.get(name, ("untyped", ""))
+                lines.append(f"# HELP {name} {text}")
+                lines.append(f"# TYPE {name} {kind}")
+                for (metric, labels), value in sorted(self.counters.items()):
+                    if metric == name:
+                        lines.append(f"{name}{fmt(labels)} {value:g}")
+                for (metric, labels), hist in sorted(self.histograms.items()):
+                    if metric != name:
+                        continue
+                    for bound, count in zip(BUCKETS, hist["buckets"]):
+                        lines.append(f"{name}_bucket{fmt(labels, [('le', bound)])} {count}")
+                    lines.append(f"{name}_bucket{fmt(labels, [('le', '+Inf')])} {hist['count']}")
+                    lines.append(f"{name}_sum{fmt(labels)} {hist['sum']:.6f}")
+                    lines.append(f"{name}_count{fmt(labels)} {hist['count']}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+metrics.describe("social_support_request_seconds", "histogram", "End-to-end request latency")
+metrics.describe("social_support_stage_seconds", "histogram", "Wall time per graph node")
+metrics.describe("social_support_llm_seconds", "histogram", "Wall time per LLM call, cache hits excluded")
+metrics.describe("social_support_llm_eval_seconds_total", "counter", "Generation time reported by Ollama")
+metrics.describe("social_support_llm_prompt_tokens_total", "counter", "Prompt tokens sent to Ollama")
+metrics.describe("social_support_llm_completion_tokens_total", "counter", "Tokens generated by Ollama")
+metrics.describe("social_support_llm_cache_total", "counter", "LLM cache lookups by result")
+metrics.describe("social_support_fallback_total", "counter", "Rule/regex fallbacks used instead of a model result")
+
+_traces = OrderedDict()
+_traces_lock = threading.Lock()
+
+
+@contextmanager
+def start_trace(endpoint: str, request_id: Optional[str] = None):
+    """Open a trace for one request; it is kept for /trace lookups once finished."""
+    trace = Trace(request_id)
+    token = _current.set(trace)
+    status = "ok"
+    try:
+        yield trace
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        _current.reset(token)
+        trace.finish()
+        metrics.observe("social_support_request_seconds", {"endpoint": endpoint, "status": status},
+                        trace.total_ms / 1000)
+        with _traces_lock:
+            _traces[trace.request_id] = trace
+            while len(_traces) > MAX_TRACES:
+                _traces.popitem(last=False)
+
+
+def current_trace() -> Optional[Trace]:
+    return _current.get()
+
+
+def get_trace(request_id: str) -> Optional[Trace]:
+    with _traces_lock:
+        return _traces.get(request_id)
+
+
+def record(span: Dict[str, Any]) -> None:
+    trace = _current.get()
+    if trace is not None:
+        trace.add(span)
+
+
+@contextmanager
+def node_span(stage: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        metrics.observe("social_support_stage_seconds", {"stage": stage}, seconds)
+        record({"kind": "node", "stage": stage, "ms": round(seconds * 1000, 1)})
+
+
+def traced_node(stage: str, impl):
+    """Wrap a node object's __call__ / acall with a timing span."""
+    def call(state):
+        with node_span(stage):
+            return impl(state)
+
+    async def acall(state):
+        with node_span(stage):
+            return await impl.acall(state)
+
+    return call, acall
+
+
+def record_llm(stage: str, model: str, seconds: float, response=None, cache_hit: bool = False) -> None:
+    labels = {"stage": stage, "model": model}
+    metrics.inc("social_support_llm_cache_total", {**labels, "result": "hit" if cache_hit else "miss"})
+    span = {"kind": "llm", "stage": stage, "model": model, "ms": round(seconds * 1000, 1), "cache_hit": cache_hit}
+    if response is not None:
+        prompt_tokens = response.get("prompt_eval_count") or 0
+        completion_tokens = response.get("eval_count") or 0
+        eval_seconds = (response.get("eval_duration") or 0) / 1e9
+        metrics.observe("social_support_llm_seconds", labels, seconds)
+        metrics.inc("social_support_llm_prompt_tokens_total", labels, prompt_tokens)
+        metrics.inc("social_support_llm_completion_tokens_total", labels, completion_tokens)
+        metrics.inc("social_support_llm_eval_seconds_total", labels, eval_seconds)
+        span.update(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens,
+                    eval_ms=round(eval_seconds * 1000, 1))
+    record(span)
+
+
+def record_event(stage: str, message: str, **fields) -> None:
+    """A pipeline step (routing decision, extraction plan) for /trace; printed only outside a request."""
+    trace = _current.get()
+    if trace is None:
+        # CLI runs (graph.py, benchmarks) have no trace to look at
+        print(f"{stage}: {message}")
+        return
+    trace.add({"kind": "event", "stage": stage, "ms": 0.0, "message": message, **fields})
+
+
+def record_fallback(stage: str, reason: str = "") -> None:
+    metrics.inc("social_support_fallback_total", {"stage": stage})
+    record({"kind": "fallback", "stage": stage, "ms": 0.0, "reason": str(reason)[:200]})
@@ -0,0 +1,162 @@
+"""
+Deterministic document checks used before falling back to the LLM validator.
+
+Age is checked against the date of birth printed on the passport and income
+against the figures on the salary slip. Each check returns None when the
+documents don't contain enough to decide, so the caller knows to ask the LLM.
+"""
+import re
+from datetime import date
+from typing import Any, Dict, Optional
+
+MONTHS = {m: i for i, m in enumerate(
+    ["JAN", "FEB", "MAR", "APR", "MAY", "JUN", "JUL", "AUG", "SEP", "OCT", "NOV", "DEC"], start=1)}
+
+_DOB_LABEL = re.compile(r"(date\s*of\s*birth|birth\s*date|d\.?o\.?b\.?)", re.IGNORECASE)
+_DATE_PATTERNS = [
+    (re.compile(r"(\d{4})[-/.](\d{1,2})[-/.](\d{1,2})"), ("y", "m", "d")),
+    (re.compile(r"(\d{1,2})[-/. ](\d{1,2})[-/. ](\d{4})"), ("d", "m", "y")),
+    (re.compile(r"(\d{1,2})[ \-]?([A-Za-z]{3})[A-Za-z]*[ \-,]*(\d{4})"), ("d", "mon", "y")),
+]
+_SALARY_LABEL = re.compile(
+    r"(net\s*(salary|pay)|gross\s*(salary|pay)|total\s*(salary|earnings|pay)|basic\s*salary)"
+    r"[^\d\n]{0,30}([\d,]+(?:\.\d+)?)",
+    re.IGNORECASE,
+)
+
+# Allowed gaps between the application and the documents
+AGE_TOLERANCE_YEARS = 1
+INCOME_TOLERANCE = 0.05
+
+
+def to_number(value) -> Optional[float]:
+    """First number in a value ("AED 7,300" -> 7300.0), or None."""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    match = re.search(r"\d[\d,]*(?:\.\d+)?", str(value or ""))
+    return float(match.group(0).replace(",", "")) if match else None
+
+
+def _parse_date(text: str) -> Optional[date]:
+    for pattern, order in _DATE_PATTERNS:
+        match = pattern.search(text)
+        if not match:
+            continue
+        parts = dict(zip(order, match.groups()))
+        try:
+            month = MONTHS.get(parts["mon"][:3].upper()) if "mon" in parts else int(parts["m"])
+            return date(int(parts["y"]), month, int(parts["d"]))
+        except (TypeError, ValueError):
+            continue
+    return None
+
+
+def passport_dob(passport_text: str) -> Optional[date]:
+    """Date following a 'Date of Birth' / 'DOB' label in the passport OCR text."""
+    for label in _DOB_LABEL.finditer(passport_text or ""):
+        dob = _parse_date(passport_text[label.end():label.end() + 40])
+        if dob:
+            return dob
+    return None
+
+
+def age_on(dob: date, today: date) -> int:
+    return today.year - dob.year - ((today.month, today.day) < (dob.month, dob.day))
+
+
+def salary_figures(salary_text: str) -> list:
+    """Labelled salary amounts (net, gross, total, basic) found on the slip."""
+    return [float(m.group(5).replace(",", "")) for m in _SALARY_LABEL.finditer(salary_text or "")]
+
+
+def check_age(application_age, passport_text: str, today: date) -> Optional[Dict[str, Any]]:
+    age = to_number(application_age)
+    dob = passport_dob(passport_text)
+    if age is None or dob is None:
+        return None
+    actual = age_on(dob, today)
+    ok = abs(actual - age) <= AGE_TOLERANCE_YEARS
+    reason = f"application age {age:.0f} vs passport DOB {dob.isoformat()} (age {actual})"
+    return {"status": "success" if ok else "failed", "reason": reason}
+
+
+def check_income(application_income, salary_text: str) -> Optional[Dict[str, Any]]:
+    income = to_number(application_income)
+    figures = salary_figures(salary_text)
+    if income is None or not figures:
+        return None
+    ok = any(abs(income - figure) <= INCOME_TOLERANCE * max(figure, 1) for figure in figures)
+    shown = ", ".join(f"{f:,.0f}" for f in figures)
+    reason = f"application income {income:,.0f} vs salary slip {shown}"
+    return {"status": "success" if ok else "failed", "reason": reason}
+
+
+def deterministic_validation(state: Dict[str, Any], today: Optional[date] = None) -> Optional[Dict[str, Any]]:
+    """
+    Validation result in the same shape the LLM validator returns, or None
+    when either check can't be decided from the documents.
+    """
+    application_data = state.get("extracted_data", {}) or {}
+    uploaded_docs = state.get("applicant_info", {}) or {}
+    today = today or date.today()
+
+    age = check_age(application_data.get("age"), uploaded_docs.get("passport", ""), today)
+    income = check_income(application_data.get("monthly_income"), salary_slip_text(uploaded_docs))
+    if age is None or income is None:
+        return None
+
+    overall = "success" if age["status"] == income["status"] == "success" else "failed"
+    failed = [c["reason"] for c in (age, income) if c["status"] == "failed"]
+    return {
+        "age_validation": age["status"],
+        "income_validation": income["status"],
+        "overall_status": overall,
+        "reason": "; ".join(failed) or f"{age['reason']}; {income['reason']}",
+        "method": "deterministic",
+    }
+
+
+def salary_slip_text(uploaded_docs: Dict[str, Any]) -> str:
+    # The front end stores the slip as "salary_slip"; older payloads used "salary"
+    return uploaded_docs.get("salary_slip") or uploaded_docs.get("salary", "")
+
+
+def flag_duplicates(validation: Dict[str, Any], matches: list) -> Dict[str, Any]:
+    """
+    Validation with the cross-application check (see duplicates.py) added: a
+    passport number, document or image shared with another application sends
+    a passing result to review. Name-only matches are common and not flagged.
+    """
+    from duplicates import STRONG_MATCHES
+
+    strong = [m for m in matches or [] if m["match"] in STRONG_MATCHES]
+    validation = {**validation, "duplicate_validation": "failed" if strong else "success"}
+    if strong and validation.get("overall_status") == "success":
+        shared = sorted({f"{m['match']} with application {m['application_id']}" for m in strong})
+        validation.update(overall_status="review", reason="; ".join(shared[:3]) + (
+            f" (+{len(shared) - 3} more)" if len(shared) > 3 else ""))
+    return validation
+
+
+def final_decision(eligibility: bool, validation: Dict[str, Any], reason: str = "") -> Dict[str, Any]:
+    """Response generator rules: eligible only if the model says so and validation passed."""
+    validation = validation or {}
+    if not eligibility:
+        return {"final_status": "not eligible",
+                "reason": reason or "Income, family size or assets do not meet the support criteria."}
+    if validation.get("overall_status") == "review":
+        # Validation could not run (model unavailable), or the documents also
+        # appear in another application; neither is a failed check
+        detail = validation.get("reason", "unknown reason")
+        if validation.get("duplicate_validation") == "failed":
+            return {"final_status": "needs review",
+                    "reason": reason or f"Meets the support criteria, but documents or identity details match "
+                                        f"another application ({detail}); a caseworker needs to check them."}
+        return {"final_status": "needs review",
+                "reason": reason or f"Meets the support criteria, but the documents could not be validated "
+                                    f"automatically ({detail}); a caseworker needs to check them."}
+    if validation.get("overall_status") != "success":
+        return {"final_status": "not eligible",
+                "reason": reason or f"Document validation failed: {validation.get('reason', 'unknown reason')}"}
+    return {"final_status": "eligible",
+            "reason": reason or "Meets the support criteria and the documents match the application."}
@@ -0,0 +1,92 @@
+"""
+Model cascade vs the large model alone, against the mock Ollama server.
+
+The mock answers the small model in a fraction of the large model's time and
+gets a share of its replies wrong (unparseable, inconsistent, or plausibly
+wrong). Extraction and validation prompts for synthetic applicants are run
+one at a time, as on a single Ollama slot, first with only the large model
+and then with the cascade. Per stage it reports the escalation rate, the
+mean time per call (= model time, so 1 / throughput) and how often the
+answer matched the large model's.
+
+    python benchmarks/cascade_benchmark.py [--calls 200] [--mistake-rate 0.15]
+"""
+import argparse
+import os
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, os.path.join(ROOT_DIR, "backend"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# Every call must reach the mock, not the LLM cache
+os.environ["CACHE_ENABLED"] = "0"
+# Synthetic applicants stay out of the real duplicate index
+os.environ["DUPLICATE_DB"] = ""
+
+import numpy as np  # noqa: E402
+from mock_ollama import serve  # noqa: E402
+
+SMALL, LARGE = "qwen2.5:1.5b-instruct", "qwen2.5:7b-instruct"
+
+
+def applicants(count: int) -> list:
+    from utils.data_prep import applicant_profile, document_texts, generate_applicants
+
+    rng = np.random.default_rng(0)
+    frame = generate_applicants(count)
+    return [document_texts(applicant_profile(frame.iloc[i], i, rng), rng=rng) for i in range(count)]
+
+
+def run(stage: str, models: list, documents: list) -> tuple:
+    """(answers, mean seconds per call) for one stage with the given cascade."""
+    import llm
+    from config import LLM_CASCADES
+    from extractors import extract_fields
+
+    LLM_CASCADES[stage] = models
+    answers, start = [], time.perf_counter()
+    for docs in documents:
+        if stage == "extraction":
+            answers.append(llm.parse_applicant_info(docs["application_form"] + "\n" + docs["passport"]))
+        else:
+            # No passport: the rule checks can't decide, so validation asks the model
+            state = {"extracted_data": extract_fields({"application_form": docs["application_form"]})["values"],
+                     "eligibility": True,
+                     "applicant_info": {"salary_slip": docs["salary_slip"]}}
+            answers.append(llm.validate_and_decide(state)["validation_results"])
+    return answers, (time.perf_counter() - start) / len(documents)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=200, help="Applicants per stage")
+    parser.add_argument("--large-ms", type=float, default=40, help="Large model latency per call")
+    parser.add_argument("--small-ms", type=float, default=10, help="Small model latency per call")
+    parser.add_argument("--mistake-rate", type=float, default=0.15, help="Share of wrong small-model replies")
+    args = parser.parse_args()
+
+    server, _ = serve(port=0, background=True, model_latency_ms={SMALL: args.small_ms, LARGE: args.large_ms},
+                      mistake_rate={SMALL: args.mistake_rate})
+    os.environ["OLLAMA_HOST"] = f"http://127.0.0.1:{server.server_port}"
+    from cascade import cascade_stats
+
+    documents = applicants(args.calls)
+    print(f"small {args.small_ms:g} ms, large {args.large_ms:g} ms, small model wrong {args.mistake_rate:.0%}\n")
+    print(f"{'stage':<12}{'escalated':>11}{'ms/call':>9}{'large only':>12}{'speed-up':>10}{'agreement':>11}")
+    for stage in ("extraction", "validation"):
+        baseline, large_s = run(stage, [LARGE], documents)
+        answers, cascade_s = run(stage, [SMALL, LARGE], documents)
+        agreement = np.mean([a == b for a, b in zip(answers, baseline)])
+        # The large-model-only calls count in the stage totals too, never escalated
+        stats = cascade_stats()[stage]
+        rate = stats["escalation_rate"] * stats["calls"] / len(documents)
+        print(f"{stage:<12}{rate:>11.0%}{cascade_s * 1000:>9.1f}{large_s * 1000:>12.1f}"
+              f"{large_s / cascade_s:>9.1f}x{agreement:>11.1%}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Duplicate index lookups as the archive grows.
+
+Fills a fresh index (see backend/duplicates.py) with random applications of
+one text document and one image hash each, and at every size in --sizes
+times lookups of new documents (all misses) and of near-copies of indexed
+ones (all hits) against a brute-force scan of every stored signature.
+
+    python benchmarks/duplicate_benchmark.py [--sizes 10000,100000,1000000]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, os.path.join(ROOT_DIR, "backend"))
+
+import numpy as np  # noqa: E402
+from duplicates import IMAGE_HASH_BITS, DuplicateIndex, minhash  # noqa: E402
+
+VOCABULARY = np.array([f"w{i}" for i in range(20_000)])
+
+
+def random_document(rng: np.random.Generator, words: int = 60) -> str:
+    return " ".join(rng.choice(VOCABULARY, words))
+
+
+def near_copy(text: str, rng: np.random.Generator) -> str:
+    # One word changed, as an OCR misread would
+    words = text.split()
+    words[int(rng.integers(len(words)))] = "misread"
+    return " ".join(words)
+
+
+def fill(index: DuplicateIndex, start: int, stop: int, rng: np.random.Generator, texts: dict) -> None:
+    for i in range(start, stop):
+        text = random_document(rng)
+        if i % 100 == 0:
+            texts[f"app{i}"] = text
+        image = int.from_bytes(rng.bytes(IMAGE_HASH_BITS // 8), "big")
+        index.add(f"app{i}", {"salary_slip": minhash(text)}, {"passport": image}, {"passport_no": f"P{i:08d}"})
+
+
+def brute_force(index: DuplicateIndex, signature: np.ndarray) -> int:
+    """Matches found by comparing against every stored signature."""
+    found = 0
+    for (stored,) in index._conn().execute("SELECT signature FROM documents WHERE kind = 'text'"):
+        found += (np.frombuffer(stored, dtype=np.uint32) == signature).mean() >= 0.85
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10000,100000", help="Comma-separated archive sizes (applications)")
+    parser.add_argument("--lookups", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    index = DuplicateIndex(os.path.join(tempfile.mkdtemp(), "duplicates.sqlite"))
+    texts, size = {}, 0
+    print(f"{'applications':>12}{'fill s':>9}{'miss p50 ms':>13}{'hit p50 ms':>12}{'hits found':>12}{'scan ms':>10}")
+    for target in sorted(int(s) for s in args.sizes.split(",")):
+        start = time.perf_counter()
+        fill(index, size, target, rng, texts)
+        fill_s, size = time.perf_counter() - start, target
+
+        timings = {"miss": [], "hit": []}
+        found = 0
+        known = list(texts.items())
+        for i in range(args.lookups):
+            for kind in timings:
+                if kind == "miss":
+                    text = random_document(rng)
+                else:
+                    _, original = known[int(rng.integers(len(known)))]
+                    text = near_copy(original, rng)
+                signature = minhash(text)
+                start = time.perf_counter()
+                matches = index.find("probe", {"salary_slip": signature}, {}, {})
+                timings[kind].append(time.perf_counter() - start)
+                found += kind == "hit" and any(m["match"] == "document_text" for m in matches)
+
+        start = time.perf_counter()
+        brute_force(index, signature)
+        scan_ms = (time.perf_counter() - start) * 1000
+        print(f"{size:>12,}{fill_s:>9.1f}{np.median(timings['miss']) * 1000:>13.3f}"
+              f"{np.median(timings['hit']) * 1000:>12.3f}{found:>7}/{args.lookups:<4}{scan_ms:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+sklearn RandomForest vs the compiled NumPy forest: exactness and latency.
+
+    python benchmarks/forest_benchmark.py [--batch-rows 10000] [--single-runs 2000]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import warnings
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_DIR, "backend"))
+
+import joblib  # noqa: E402
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+from forest import CompiledForest, export_forest  # noqa: E402
+
+
+def per_call_us(func, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    timings = np.array(timings) * 1e6
+    return np.percentile(timings, 50), np.percentile(timings, 99)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=os.path.join(ROOT_DIR, "models", "eligibility_model.joblib"))
+    parser.add_argument("--csv", default=os.path.join(ROOT_DIR, "data", "applicants.csv"))
+    parser.add_argument("--batch-rows", type=int, default=10000)
+    parser.add_argument("--single-runs", type=int, default=2000)
+    args = parser.parse_args()
+    warnings.simplefilter("ignore", UserWarning)
+
+    model = joblib.load(args.model)
+    npz_path = os.path.join(tempfile.mkdtemp(), "eligibility_model.npz")
+    export_forest(model, npz_path)
+    compiled = CompiledForest.load(npz_path)
+
+    frame = pd.read_csv(args.csv)[list(compiled.feature_names_in_)]
+    X = frame.to_numpy(dtype=np.float64)
+    same_proba = np.array_equal(model.predict_proba(X), compiled.predict_proba(X))
+    same_label = np.array_equal(model.predict(X), compiled.predict(X))
+    print(f"Exact match on {len(X)} rows: predict_proba={same_proba} predict={same_label}")
+
+    row = X[:1]
+    single_df = frame.iloc[:1]
+    print(f"\nSingle row ({args.single_runs} calls)        p50 us    p99 us")
+    for name, func in [
+        ("sklearn predict(DataFrame)", lambda: model.predict(single_df)),
+        ("sklearn predict(ndarray)", lambda: model.predict(row)),
+        ("compiled predict", lambda: compiled.predict(row)),
+    ]:
+        p50, p99 = per_call_us(func, args.single_runs)
+        print(f"  {name:<28} {p50:9.1f} {p99:9.1f}")
+
+    big = np.resize(X, (args.batch_rows, X.shape[1]))
+    print(f"\nBatch of {args.batch_rows} rows                  ms")
+    for name, func in [
+        ("sklearn predict", lambda: model.predict(big)),
+        ("compiled predict", lambda: compiled.predict(big)),
+    ]:
+        p50, _ = per_call_us(func, 5)
+        print(f"  {name:<28} {p50 / 1000:9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+"""
+Load driver for the eligibility pipeline. Reports p50/p95/p99 latency and
+applications per second for three paths:
+
+  graph  full LangGraph run, in-process against the mock Ollama server
+         (started automatically) or over HTTP with --url
+  ocr    OCR of each applicant's rendered documents (needs --manifest)
+  model  eligibility model scoring, single rows and one big batch
+
+    python utils/data_prep.py --skip-model --documents 50 --scanned
+    python benchmarks/load_test.py graph --requests 200 --concurrency 16 --latency-ms 300
+    python benchmarks/load_test.py graph --requests 200 --graph-mode parallel
+    python benchmarks/load_test.py graph --requests 200 --error-rate 0.2 --hang-rate 0.05
+    python benchmarks/load_test.py graph --url http://127.0.0.1:8000 --requests 200
+    python benchmarks/load_test.py ocr --manifest data/synthetic/manifest.jsonl
+    python benchmarks/load_test.py model --requests 2000
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BACKEND_DIR = os.path.join(ROOT_DIR, "backend")
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np  # noqa: E402
+
+
+def report(name: str, latencies: list, wall_s: float, errors: int = 0) -> dict:
+    lat = np.array(latencies) * 1000 if latencies else np.zeros(1)
+    result = {
+        "path": name,
+        "completed": len(latencies),
+        "errors": errors,
+        "wall_s": round(wall_s, 3),
+        "apps_per_s": round(len(latencies) / wall_s, 2) if wall_s else 0.0,
+        "mean_ms": round(float(lat.mean()), 1),
+        "p50_ms": round(float(np.percentile(lat, 50)), 1),
+        "p95_ms": round(float(np.percentile(lat, 95)), 1),
+        "p99_ms": round(float(np.percentile(lat, 99)), 1),
+    }
+    print(f"{name:<8} n={result['completed']:<6} err={errors:<4} {result['apps_per_s']:>8.2f} apps/s   "
+          f"p50={result['p50_ms']:>9.1f}ms  p95={result['p95_ms']:>9.1f}ms  p99={result['p99_ms']:>9.1f}ms")
+    return result
+
+
+def load_manifest(path: str) -> list:
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def synthetic_payloads(n: int) -> list:
+    """Document texts for n applicants without rendering any files."""
+    from utils.data_prep import generate_applicants, applicant_profile, document_texts
+    rng = np.random.default_rng(7)
+    df = generate_applicants(max(n, 1))
+    return [document_texts(applicant_profile(row, i, rng), rng=rng) for i, row in df.head(n).iterrows()]
+
+
+async def run_concurrent(make_call, payloads: list, concurrency: int):
+    slots = asyncio.Semaphore(concurrency)
+    latencies, errors = [], 0
+
+    async def one(payload):
+        nonlocal errors
+        async with slots:
+            start = time.perf_counter()
+            try:
+                await make_call(payload)
+                latencies.append(time.perf_counter() - start)
+            except Exception as e:
+                errors += 1
+                if errors <= 3:
+                    print(f"  request failed: {e!r}")
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(p) for p in payloads))
+    return latencies, errors, time.perf_counter() - start
+
+
+# ---- graph ----
+
+def bench_graph(args) -> dict:
+    payloads = [m["texts"] for m in load_manifest(args.manifest)] if args.manifest else synthetic_payloads(args.requests)
+    payloads = (payloads * (args.requests // max(len(payloads), 1) + 1))[:args.requests]
+
+    if args.url:
+        import httpx
+
+        async def main():
+            async with httpx.AsyncClient(base_url=args.url, timeout=None) as client:
+                async def call(texts):
+                    r = await client.post("/check_eligibility", json={"data": texts, "followup_query": ""})
+                    r.raise_for_status()
+                return await run_concurrent(call, payloads, args.concurrency)
+
+        latencies, errors, wall = asyncio.run(main())
+        return report("graph", latencies, wall, errors)
+
+    if not args.ollama:
+        from mock_ollama import serve
+        server, _ = serve(port=0, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                          ms_per_1k_chars=args.ms_per_1k_chars, background=True,
+                          error_rate=args.error_rate, hang_rate=args.hang_rate)
+        args.ollama = f"http://127.0.0.1:{server.server_port}"
+    os.environ["OLLAMA_HOST"] = args.ollama
+    # Measure the pipeline itself, not replays from the content cache
+    os.environ.setdefault("CACHE_ENABLED", "0")
+    os.environ.setdefault("LLM_CONCURRENCY", str(args.concurrency))
+    # Synthetic runs stay out of the real duplicate index (data/duplicates.sqlite)
+    os.environ["DUPLICATE_DB"] = ""
+    if args.graph_mode:
+        os.environ["GRAPH_MODE"] = args.graph_mode
+
+    sys.path.insert(0, BACKEND_DIR)
+    os.chdir(BACKEND_DIR)
+    from graph import evaluater
+
+    async def call(texts):
+        await evaluater.ainvoke({"applicant_info": texts, "followup_query": ""})
+
+    latencies, errors, wall = asyncio.run(run_concurrent(call, payloads, args.concurrency))
+    return report("graph", latencies, wall, errors)
+
+
+# ---- ocr ----
+
+def bench_ocr(args) -> dict:
+    if not args.manifest:
+        sys.exit("ocr path needs --manifest (render documents with utils/data_prep.py --documents N)")
+    os.environ.setdefault("CACHE_ENABLED", "0")
+    from utils.ocr_utils import extract_texts, get_ocr_pool, OCR_WORKERS
+
+    workers = args.workers or OCR_WORKERS
+    manifest = load_manifest(args.manifest)[:args.requests]
+    base = os.path.dirname(os.path.abspath(args.manifest))
+    if workers > 1:
+        get_ocr_pool(workers)
+
+    latencies = []
+    start = time.perf_counter()
+    for record in manifest:
+        paths = [os.path.join(base, p) for p in record["paths"].values()]
+        t = time.perf_counter()
+        extract_texts(paths, workers=workers)
+        latencies.append(time.perf_counter() - t)
+    return report("ocr", latencies, time.perf_counter() - start)
+
+
+# ---- model ----
+
+def bench_model(args) -> dict:
+    sys.path.insert(0, BACKEND_DIR)
+    os.chdir(BACKEND_DIR)
+    import pandas as pd
+    from scoring import score_records
+
+    caseload = pd.read_csv(os.path.join(ROOT_DIR, "data", "applicants.csv"))
+    records = caseload.rename(columns={"income": "monthly_income", "family_size": "family_members"})
+    records = records.to_dict("records")
+
+    latencies = []
+    start = time.perf_counter()
+    for i in range(args.requests):
+        t = time.perf_counter()
+        score_records([records[i % len(records)]])
+        latencies.append(time.perf_counter() - t)
+    single = report("model", latencies, time.perf_counter() - start)
+
+    batch = (records * (args.batch_rows // len(records) + 1))[:args.batch_rows]
+    t = time.perf_counter()
+    score_records(batch)
+    batch_s = time.perf_counter() - t
+    print(f"{'batch':<8} n={len(batch):<6} {len(batch) / batch_s:>14.0f} apps/s   total={batch_s * 1000:.1f}ms")
+    return {**single, "batch_rows": len(batch), "batch_apps_per_s": round(len(batch) / batch_s, 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", choices=["graph", "ocr", "model"])
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--manifest", help="manifest.jsonl written by utils/data_prep.py --documents")
+    parser.add_argument("--url", help="Benchmark a running backend over HTTP instead of in-process")
+    parser.add_argument("--ollama", help="Use this Ollama server instead of starting the mock")
+    parser.add_argument("--latency-ms", type=float, default=300, help="Mock Ollama base latency")
+    parser.add_argument("--jitter-ms", type=float, default=50)
+    parser.add_argument("--ms-per-1k-chars", type=float, default=20)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Mock Ollama: share of calls failing with 503")
+    parser.add_argument("--hang-rate", type=float, default=0.0, help="Mock Ollama: share of calls that hang")
+    parser.add_argument("--graph-mode", choices=["sequential", "parallel"], help="In-process graph shape (GRAPH_MODE)")
+    parser.add_argument("--workers", type=int, default=0, help="OCR worker processes")
+    parser.add_argument("--batch-rows", type=int, default=100000)
+    parser.add_argument("--json", help="Also write the summary to this file")
+    args = parser.parse_args()
+    # Some paths chdir into backend/, so pin file arguments first
+    args.manifest = os.path.abspath(args.manifest) if args.manifest else None
+    args.json = os.path.abspath(args.json) if args.json else None
+
+    result = {"graph": bench_graph, "ocr": bench_ocr, "model": bench_model}[args.path](args)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
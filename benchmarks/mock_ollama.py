@@ -0,0 +1,261 @@
+"""
+Stand-in Ollama HTTP server for offline benchmarks.
+
+Answers /api/chat, /api/generate, /api/tags and /api/ps with canned JSON after
+a configurable delay, and reports token counts and durations the way Ollama
+does, so the backend's tracing and cache behave as in production.
+
+    python benchmarks/mock_ollama.py --port 11435 --latency-ms 800 --jitter-ms 200
+    python benchmarks/mock_ollama.py --error-rate 0.2 --hang-rate 0.05   # a struggling server
+    python benchmarks/mock_ollama.py --model-latency qwen2.5:1.5b-instruct=150 \
+        --mistake-rate qwen2.5:1.5b-instruct=0.15                       # a small, less reliable model
+    OLLAMA_HOST=http://127.0.0.1:11435 python backend/main.py
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Canned replies per pipeline stage; --responses can override any of them
+CANNED = {
+    "extraction": {
+        "name": "Saif Alkaabi", "age": "35", "gender": "Male", "marital_status": "Married",
+        "employment_status": "Employed", "employment_years": "6", "monthly_income": "7300",
+        "family_members": "5", "address": "Abu Dhabi", "disability_status": "None",
+        "other_support_received": "None", "assets": "25000", "liabilities": "15000",
+    },
+    "validation": {
+        "age_validation": "success", "income_validation": "success", "overall_status": "success",
+        "final_status": "eligible", "reason": "Documents match the application.",
+    },
+    "orchestrator": {"next_node": "response_generator", "reason": "mock"},
+    "response": {"final_status": "eligible", "reason": "Meets the criteria."},
+}
+
+# Prompt markers used to tell stages apart
+STAGE_MARKERS = [
+    ("Orchestrator", "orchestrator"),
+    ("Data Validator", "validation"),
+    ("Response Generator", "response"),
+    ("document parser", "extraction"),
+]
+
+
+def detect_stage(prompt: str) -> str:
+    for marker, stage in STAGE_MARKERS:
+        if marker in prompt:
+            return stage
+    return "extraction"
+
+
+def echo_fields(prompt: str, reply: dict) -> dict:
+    """Copy labelled values that appear in the prompt, so extractions vary per applicant."""
+    labels = {
+        "age": r"Age[:\-]?\s*(\d+)",
+        "monthly_income": r"Monthly Income.*?[:\-]?\s*([\d,]+)",
+        "family_members": r"Family Members[:\-]?\s*(\d+)",
+        "assets": r"Total Assets.*?[:\-]?\s*([\d,]+)",
+        "liabilities": r"Total Liabilities.*?[:\-]?\s*([\d,]+)",
+        "employment_years": r"Years of Employment[:\-]?\s*(\d+)",
+        "name": r"Name[:\-]?\s*([A-Za-z ]+)",
+    }
+    reply = dict(reply)
+    for field, pattern in labels.items():
+        match = re.search(pattern, prompt)
+        if match:
+            reply[field] = match.group(1).strip()
+    return reply
+
+
+class MockOllama:
+    def __init__(self, latency_ms: float, jitter_ms: float, ms_per_1k_chars: float, responses: dict,
+                 error_rate: float = 0.0, hang_rate: float = 0.0, hang_s: float = 120.0,
+                 model_latency_ms: dict = None, mistake_rate: dict = None):
+        self.latency_ms = latency_ms
+        # Per-model base latency and share of wrong replies, e.g. for a cascade
+        self.model_latency_ms = model_latency_ms or {}
+        self.mistake_rate = mistake_rate or {}
+        self.rng = random.Random(0)
+        self.jitter_ms = jitter_ms
+        self.ms_per_1k_chars = ms_per_1k_chars
+        self.responses = {**CANNED, **responses}
+        # Injected faults: a share of calls answers 503, another share hangs
+        self.error_rate = error_rate
+        self.hang_rate = hang_rate
+        self.hang_s = hang_s
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def fault(self):
+        roll = random.random()
+        if roll < self.error_rate:
+            return "error"
+        if roll < self.error_rate + self.hang_rate:
+            time.sleep(self.hang_s)
+        return None
+
+    def answer(self, prompt: str, model: str) -> dict:
+        with self.lock:
+            self.calls += 1
+        stage = detect_stage(prompt)
+        reply = self.responses[stage]
+        if stage == "extraction":
+            reply = echo_fields(prompt, reply)
+        with self.lock:
+            mistake = self.rng.random() < self.mistake_rate.get(model, 0.0)
+            if mistake:
+                reply = make_mistake(stage, reply, self.rng)
+        content = reply if isinstance(reply, str) else json.dumps(reply)
+
+        # Prompt-length dependent delay, like prefill on a real model
+        delay_ms = (self.model_latency_ms.get(model, self.latency_ms) + random.uniform(-self.jitter_ms, self.jitter_ms)
+                    + self.ms_per_1k_chars * len(prompt) / 1000)
+        delay_s = max(delay_ms, 0) / 1000
+        time.sleep(delay_s)
+
+        prompt_tokens = max(len(prompt) // 4, 1)
+        completion_tokens = max(len(content) // 4, 1)
+        return {
+            "model": model,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "done": True,
+            "done_reason": "stop",
+            "total_duration": int(delay_s * 1e9),
+            "load_duration": 0,
+            "prompt_eval_count": prompt_tokens,
+            "prompt_eval_duration": int(delay_s * 0.3 * 1e9),
+            "eval_count": completion_tokens,
+            "eval_duration": int(delay_s * 0.7 * 1e9),
+        }, content
+
+
+def make_mistake(stage: str, reply: dict, rng: random.Random):
+    """A wrong reply of the kind a small model gives: unparseable, inconsistent or just wrong."""
+    kind = rng.choice(("unparseable", "inconsistent", "wrong"))
+    if kind == "unparseable":
+        return "Sure! Here is the information you asked for: " + json.dumps(reply)[:40]
+    reply = dict(reply)
+    if stage == "extraction":
+        if kind == "inconsistent":
+            reply["age"] = str(int(reply.get("age") or 30) + 9)
+        else:
+            reply["name"] = (reply.get("name") or "x")[::-1].title()
+    elif stage == "validation":
+        key = "overall_status" if kind == "inconsistent" else "income_validation"
+        reply[key] = "failed" if reply.get(key) == "success" else "success"
+    elif stage == "response":
+        reply["final_status"] = "not eligible" if reply.get("final_status") == "eligible" else "eligible"
+    else:
+        reply["next_node"] = "data_checker"
+    return reply
+
+
+def make_handler(mock: MockOllama):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # Headers and body go out as separate writes; without TCP_NODELAY each
+        # reply waits ~40 ms on the client's delayed ACK
+        disable_nagle_algorithm = True
+
+        def log_message(self, *args):
+            pass
+
+        def _send(self, payload: dict, status: int = 200):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _body(self) -> dict:
+            length = int(self.headers.get("Content-Length") or 0)
+            return json.loads(self.rfile.read(length) or b"{}")
+
+        def do_GET(self):
+            if self.path in ("/api/tags", "/api/ps"):
+                self._send({"models": [{"name": "qwen2.5:7b-instruct", "model": "qwen2.5:7b-instruct"}]})
+            elif self.path == "/":
+                self._send({"status": "Ollama is running"})
+            else:
+                self._send({"error": "not found"}, 404)
+
+        def do_POST(self):
+            body = self._body()
+            model = body.get("model", "qwen2.5:7b-instruct")
+            if self.path == "/api/chat":
+                prompt = "\n".join(m.get("content", "") for m in body.get("messages", []))
+                if not prompt:  # keep-alive / load request
+                    return self._send({"model": model, "done": True, "message": {"role": "assistant", "content": ""}})
+                if mock.fault() == "error":
+                    return self._send({"error": "server busy"}, 503)
+                meta, content = mock.answer(prompt, model)
+                self._send({**meta, "message": {"role": "assistant", "content": content}})
+            elif self.path == "/api/generate":
+                prompt = body.get("prompt", "")
+                if not prompt:
+                    return self._send({"model": model, "done": True, "response": ""})
+                if mock.fault() == "error":
+                    return self._send({"error": "server busy"}, 503)
+                meta, content = mock.answer(prompt, model)
+                self._send({**meta, "response": content})
+            else:
+                self._send({"error": "not found"}, 404)
+
+    return Handler
+
+
+def serve(host: str = "127.0.0.1", port: int = 11435, latency_ms: float = 500, jitter_ms: float = 0,
+          ms_per_1k_chars: float = 0, responses: dict = None, background: bool = False,
+          error_rate: float = 0.0, hang_rate: float = 0.0, hang_s: float = 120.0,
+          model_latency_ms: dict = None, mistake_rate: dict = None):
+    """Start the server; with background=True return (server, mock) running in a daemon thread."""
+    mock = MockOllama(latency_ms, jitter_ms, ms_per_1k_chars, responses or {}, error_rate, hang_rate, hang_s,
+                      model_latency_ms, mistake_rate)
+    server = ThreadingHTTPServer((host, port), make_handler(mock))
+    server.daemon_threads = True
+    if background:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server, mock
+    print(f"Mock Ollama on http://{host}:{server.server_port} "
+          f"(latency {latency_ms}±{jitter_ms} ms, +{ms_per_1k_chars} ms/1k prompt chars)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return server, mock
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--latency-ms", type=float, default=500)
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    parser.add_argument("--ms-per-1k-chars", type=float, default=0, help="Extra delay per 1000 prompt characters")
+    parser.add_argument("--responses", help="JSON file overriding canned replies per stage")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of calls answered with 503")
+    parser.add_argument("--hang-rate", type=float, default=0.0, help="Share of calls that hang for --hang-s")
+    parser.add_argument("--hang-s", type=float, default=120.0)
+    parser.add_argument("--model-latency", action="append", default=[], metavar="MODEL=MS",
+                        help="Base latency for one model (repeatable)")
+    parser.add_argument("--mistake-rate", action="append", default=[], metavar="MODEL=RATE",
+                        help="Share of wrong replies from one model (repeatable)")
+    args = parser.parse_args()
+
+    responses = {}
+    if args.responses:
+        with open(args.responses) as f:
+            responses = json.load(f)
+    per_model = lambda pairs: {m: float(v) for m, _, v in (p.rpartition("=") for p in pairs)}
+    serve(args.host, args.port, args.latency_ms, args.jitter_ms, args.ms_per_1k_chars, responses,
+          error_rate=args.error_rate, hang_rate=args.hang_rate, hang_s=args.hang_s,
+          model_latency_ms=per_model(args.model_latency), mistake_rate=per_model(args.mistake_rate))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Serial vs parallel OCR wall time on the sample documents in data/.
+
+    python benchmarks/ocr_benchmark.py [--workers N] [--dpi DPI] [--repeat R]
+
+With a generated manifest (utils/data_prep.py --scanned --photos), compares
+OCR with and without image preprocessing instead: time and how many fields
+the rule parsers read back correctly.
+
+    python benchmarks/ocr_benchmark.py --manifest data/synthetic/manifest.jsonl --limit 50
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+# Measure OCR itself, not the content cache
+os.environ["CACHE_ENABLED"] = "0"
+
+from utils.ocr_utils import extract_texts, get_ocr_pool, OCR_DPI, OCR_WORKERS  # noqa: E402
+
+sys.path.insert(0, os.path.join(ROOT_DIR, "backend"))
+
+
+def sample_documents():
+    data_dir = os.path.join(ROOT_DIR, "data")
+    files = []
+    for pattern in ("*.pdf", "*.jpg", "*.jpeg", "*.png"):
+        files.extend(glob.glob(os.path.join(data_dir, pattern)))
+    return sorted(files)
+
+
+def time_run(files, workers, dpi, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        texts = extract_texts(files, workers=workers, dpi=dpi)
+        timings.append(time.perf_counter() - start)
+    return min(timings), texts
+
+
+def field_matches(field, got, expected):
+    if field == "name":
+        return " ".join(str(got).lower().split()) == str(expected).lower()
+    if field == "gender":
+        return str(got)[:1].lower() == str(expected)[:1].lower()
+    if field == "age":
+        return abs(int(got) - int(expected)) <= 1  # birthday since the manifest was generated
+    if isinstance(expected, (int, float)):
+        return abs(float(got) - expected) < 1
+    return str(got).strip().lower() == str(expected).strip().lower()
+
+
+def compare_preprocessing(manifest, workers, dpi, limit):
+    from extractors import PARSERS
+
+    base = os.path.dirname(manifest)
+    with open(manifest) as f:
+        records = [json.loads(line) for line in f][:limit]
+    files, doc_types, truth = [], {}, {}
+    for record in records:
+        for doc_type, rel_path in record["paths"].items():
+            path = os.path.join(base, rel_path)
+            files.append(path)
+            doc_types[path] = doc_type
+            truth[path] = record
+
+    print(f"Documents: {len(files)} from {len(records)} applicants | workers={workers} | dpi={dpi}")
+    get_ocr_pool(workers)
+    for preprocess in (False, True):
+        start = time.perf_counter()
+        texts = extract_texts(files, workers=workers, dpi=dpi, doc_types=doc_types, preprocess=preprocess)
+        seconds = time.perf_counter() - start
+        per_type = {}
+        for path in files:
+            doc_type = doc_types[path]
+            record = truth[path]
+            # Fields the parsers get right from the text the document was rendered from
+            source = PARSERS[doc_type](record["texts"][doc_type])
+            expected = {k: record[k] for k, (v, _) in source.items() if k in record and field_matches(k, v, record[k])}
+            fields = PARSERS[doc_type](texts[path])
+            correct = sum(k in fields and field_matches(k, fields[k][0], v) for k, v in expected.items())
+            stats = per_type.setdefault(doc_type, [0, 0])
+            stats[0] += correct
+            stats[1] += len(expected)
+        label = "preprocessed" if preprocess else "raw"
+        print(f"\n{label:<13}: {seconds:8.3f} s")
+        for doc_type, (correct, total) in sorted(per_type.items()):
+            print(f"  {doc_type:<17} {correct:>5}/{total:<5} fields correct ({correct / max(total, 1):.0%})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=max(OCR_WORKERS, 2))
+    parser.add_argument("--dpi", type=int, default=OCR_DPI)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--manifest", help="Compare raw vs preprocessed OCR on these documents")
+    parser.add_argument("--limit", type=int, default=50, help="Applicants to take from the manifest")
+    args = parser.parse_args()
+
+    if args.manifest:
+        compare_preprocessing(args.manifest, args.workers, args.dpi, args.limit)
+        return
+
+    files = sample_documents()
+    print(f"Documents: {len(files)} | workers={args.workers} | dpi={args.dpi} | best of {args.repeat}")
+    for f in files:
+        print(f"  - {os.path.relpath(f, ROOT_DIR)}")
+
+    # Start the pool outside the timed region, it is long-lived in the app
+    get_ocr_pool(args.workers)
+
+    serial_s, serial_texts = time_run(files, 1, args.dpi, args.repeat)
+    parallel_s, parallel_texts = time_run(files, args.workers, args.dpi, args.repeat)
+
+    print(f"\nserial   : {serial_s:8.3f} s")
+    print(f"parallel : {parallel_s:8.3f} s")
+    print(f"speedup  : {serial_s / parallel_s:8.2f}x")
+
+    mismatched = [f for f in files if serial_texts[f] != parallel_texts[f]]
+    if mismatched:
+        print(f"WARNING: text differs between runs for {len(mismatched)} file(s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Policy what-if runs over a large caseload.
+
+Builds --rows synthetic applicants in memory (the data/applicants.csv
+distributions plus liabilities) and times the support policy (see
+utils/policy.py): applicant by applicant, with the hard-coded rule the
+fallback used to call and with Policy.check (both measured on a sample and
+scaled up), as one vectorised evaluation, a sweep of --points income thresholds, and a 2-D
+grid of income threshold x minimum family size.
+
+    python benchmarks/policy_benchmark.py [--rows 5000000] [--points 50]
+"""
+import argparse
+import os
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+import numpy as np  # noqa: E402
+from utils.policy import Policy  # noqa: E402
+
+
+def caseload(rows: int, seed: int = 0) -> dict:
+    rng = np.random.default_rng(seed)
+    return {
+        "income": rng.integers(2000, 30000, rows).astype(np.float64),
+        "family_size": rng.integers(1, 8, rows).astype(np.float64),
+        "assets": rng.integers(0, 100000, rows).astype(np.float64),
+        "liabilities": rng.integers(0, 20000, rows).astype(np.float64),
+    }
+
+
+def hard_coded(applicant_data: dict) -> bool:
+    # The rule llm.check_eligibility applied before policies/
+    income = applicant_data.get("monthly_income", 0)
+    family_members = applicant_data.get("family_members", 1)
+    net_assets = applicant_data.get("assets", 0) - applicant_data.get("liabilities", 0)
+    return income < 25000 and family_members >= 3 and net_assets <= 50000
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=5_000_000)
+    parser.add_argument("--points", type=int, default=50, help="Income thresholds in the sweep")
+    parser.add_argument("--sample", type=int, default=20_000, help="Applicants checked one at a time")
+    args = parser.parse_args()
+
+    policy = Policy.load("support")
+    columns = caseload(args.rows)
+    thresholds = np.linspace(5000, 30000, args.points)
+    families = [2, 3, 4, 5, 6]
+
+    sample = [{k: float(v[i]) for k, v in columns.items()} for i in range(args.sample)]
+    _, loop_s = timed(lambda: [policy.check(r) for r in sample])
+    renamed = [{"monthly_income": r["income"], "family_members": r["family_size"], "assets": r["assets"],
+                "liabilities": r["liabilities"]} for r in sample]
+    _, rule_s = timed(lambda: [hard_coded(r) for r in renamed])
+    mask, eval_s = timed(lambda: policy.evaluate(columns))
+    fast, fast_s = timed(lambda: policy.sweep(columns, {"max_income": thresholds}))
+    slow_policy = Policy.load("support")
+    slow_policy._threshold_sweep = lambda *a: None  # force the general path
+    slow, slow_s = timed(lambda: slow_policy.sweep(columns, {"max_income": thresholds}))
+    grid, grid_s = timed(lambda: policy.sweep(columns, {"max_income": thresholds, "min_family": families}))
+    assert (fast["eligible"].to_numpy() == slow["eligible"].to_numpy()).all()
+
+    print(f"{args.rows:,} applicants, {int(mask.sum()):,} eligible under the current support policy\n")
+    print(f"{'run':<42}{'evaluations':>12}{'seconds':>10}")
+    print(f"{'one at a time, hard-coded rule (scaled)':<42}{1:>12}{rule_s / args.sample * args.rows:>10.1f}")
+    print(f"{'one at a time, Policy.check (scaled)':<42}{1:>12}{loop_s / args.sample * args.rows:>10.1f}")
+    print(f"{'vectorised evaluate':<42}{1:>12}{eval_s:>10.2f}")
+    print(f"{'income sweep, general path':<42}{args.points:>12}{slow_s:>10.2f}")
+    print(f"{'income sweep, sorted threshold path':<42}{args.points:>12}{fast_s:>10.2f}")
+    print(f"{'income x family grid':<42}{len(grid):>12}{grid_s:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
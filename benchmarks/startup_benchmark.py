@@ -0,0 +1,99 @@
+"""
+Backend cold-start benchmark.
+
+Starts fresh interpreters and measures how long `import main` takes and how
+long the FastAPI lifespan warm-up (model, cache, OCR libraries) takes after
+it, i.e. what every uvicorn worker and reload restart pays before serving.
+
+    python benchmarks/startup_benchmark.py --runs 5
+    python benchmarks/startup_benchmark.py --top 15            # slowest imports
+    python benchmarks/startup_benchmark.py --max-import-ms 2500  # exit 1 on regression
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BACKEND_DIR = os.path.join(ROOT_DIR, "backend")
+
+# Runs inside the child interpreter, from backend/
+PROBE = """
+import asyncio, json, time
+start = time.perf_counter()
+import main
+imported = time.perf_counter()
+
+async def lifespan():
+    async with main.app.router.lifespan_context(main.app):
+        pass
+
+asyncio.run(lifespan())
+ready = time.perf_counter()
+print("STARTUP " + json.dumps({"import_ms": (imported - start) * 1000, "warmup_ms": (ready - imported) * 1000}))
+"""
+
+
+def run_once(python: str, importtime: bool = False) -> tuple:
+    cmd = [python, "-X", "importtime", "-c", PROBE] if importtime else [python, "-c", PROBE]
+    env = {**os.environ, "PYTHONWARNINGS": "ignore", "DUPLICATE_DB": ""}
+    proc = subprocess.run(cmd, cwd=BACKEND_DIR, env=env, capture_output=True, text=True)
+    match = re.search(r"^STARTUP (.*)$", proc.stdout, re.MULTILINE)
+    if proc.returncode != 0 or not match:
+        sys.exit(f"Backend failed to start:\n{proc.stderr[-2000:]}")
+    return json.loads(match.group(1)), proc.stderr
+
+
+def slowest_imports(stderr: str, top: int) -> list:
+    """Top-level modules (as imported by main) by cumulative import time."""
+    rows = []
+    for line in stderr.splitlines():
+        match = re.match(r"import time:\s+\d+ \|\s+(\d+) \| ( *)(\S+)", line)
+        if match and len(match.group(2)) <= 2:
+            rows.append((int(match.group(1)) / 1000, match.group(3)))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=0, help="Also list the N slowest imports")
+    parser.add_argument("--max-import-ms", type=float, help="Fail if the median import time exceeds this")
+    parser.add_argument("--max-total-ms", type=float, help="Fail if the median import + warm-up exceeds this")
+    parser.add_argument("--json", help="Also write the summary to this file")
+    args = parser.parse_args()
+
+    runs = [run_once(sys.executable)[0] for _ in range(args.runs)]
+    summary = {"runs": args.runs}
+    for key in ("import_ms", "warmup_ms"):
+        values = [r[key] for r in runs]
+        summary[key] = {"median": round(statistics.median(values), 1), "max": round(max(values), 1)}
+        print(f"{key:<10} median={summary[key]['median']:>8.1f}ms  max={summary[key]['max']:>8.1f}ms")
+    total = statistics.median(r["import_ms"] + r["warmup_ms"] for r in runs)
+    summary["total_ms_median"] = round(total, 1)
+    print(f"{'total':<10} median={total:>8.1f}ms")
+
+    if args.top:
+        _, stderr = run_once(sys.executable, importtime=True)
+        print("\nSlowest imports during import + warm-up (cumulative):")
+        for ms, module in slowest_imports(stderr, args.top):
+            print(f"  {ms:>8.1f}ms  {module}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(summary, f, indent=2)
+
+    failed = []
+    if args.max_import_ms and summary["import_ms"]["median"] > args.max_import_ms:
+        failed.append(f"import {summary['import_ms']['median']}ms > {args.max_import_ms}ms")
+    if args.max_total_ms and total > args.max_total_ms:
+        failed.append(f"total {total:.1f}ms > {args.max_total_ms}ms")
+    if failed:
+        sys.exit("Startup regression: " + "; ".join(failed))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Long bank statements: full page text vs the streamed transaction digest.
+
+Renders one synthetic 12-month statement PDF of --pages pages (60
+transactions a page: a monthly salary, a monthly rent income and card
+payments) and reads it both ways, reporting time, peak Python memory, the
+size of what ends up in application state and the income features.
+
+    python benchmarks/statement_benchmark.py [--pages 300] [--scanned]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, os.path.join(ROOT_DIR, "backend"))
+
+import numpy as np  # noqa: E402
+from utils.bank_statement import statement_digest, statement_features  # noqa: E402
+from utils.data_prep import render_pdf  # noqa: E402
+from utils.ocr_utils import _join_pages, iter_pdf_pages  # noqa: E402
+from context import clean_ocr_text, estimate_tokens  # noqa: E402
+
+
+def statement_text(pages: int, rng: np.random.Generator, rows_per_page: int = 60) -> str:
+    lines = ["BANK STATEMENT", "Account Holder: Test Applicant",
+             "Date        Description                  Debit      Credit     Balance"]
+    rows = pages * rows_per_page - len(lines)
+    days = np.sort(rng.integers(0, 365, rows))
+    start = np.datetime64("2025-01-01")
+    balance, month = 20_000.0, -1
+    for day in days:
+        date = start + day
+        if date.astype("datetime64[M]") != month:
+            month = date.astype("datetime64[M]")
+            for description, amount in (("SALARY TRANSFER", 12_500.0), ("RENT RECEIVED VILLA 7", 3_000.0)):
+                balance += amount
+                lines.append(f"{date.item():%d/%m/%Y}  {description:<28}{'':>10} {amount:>10,.2f} {balance:>11,.2f}")
+        amount = float(rng.integers(10, 400))
+        balance -= amount
+        lines.append(f"{date.item():%d/%m/%Y}  {'CARD PAYMENT':<28}{amount:>10,.2f} {'':>10} {balance:>11,.2f}")
+    return "\n".join(lines)
+
+
+def measure(func):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=300)
+    parser.add_argument("--scanned", action="store_true", help="Image-only pages (needs tesseract)")
+    args = parser.parse_args()
+
+    text = statement_text(args.pages, np.random.default_rng(0))
+    path = os.path.join(tempfile.mkdtemp(), "bank_statement.pdf")
+    render_pdf(text, path, scanned=args.scanned)
+    with open(path, "rb") as f:
+        data = f.read()
+    del text
+    pages = sum(1 for _ in iter_pdf_pages(data))
+    print(f"{pages} pages, {len(data) / 1e6:.1f} MB PDF\n")
+
+    full, full_s, full_peak = measure(lambda: _join_pages(path, list(iter_pdf_pages(data))))
+    features_full, parse_s, parse_peak = measure(lambda: statement_features(full))
+    digest, digest_s, digest_peak = measure(lambda: statement_digest(iter_pdf_pages(data)))
+
+    print(f"{'':28}{'seconds':>10}{'peak MB':>10}{'state chars':>13}{'est. tokens':>13}")
+    print(f"{'full text (previous)':28}{full_s:>10.2f}{full_peak / 1e6:>10.1f}{len(full):>13,}"
+          f"{estimate_tokens(clean_ocr_text(full)):>13,}")
+    print(f"{'  + parse that text':28}{parse_s:>10.2f}{parse_peak / 1e6:>10.1f}")
+    print(f"{'streamed digest':28}{digest_s:>10.2f}{digest_peak / 1e6:>10.1f}{len(digest):>13,}"
+          f"{estimate_tokens(digest):>13,}")
+    print(f"\nSame features both ways: {statement_features(digest) == features_full}")
+    print(digest)
+
+
+if __name__ == "__main__":
+    main()
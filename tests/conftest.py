@@ -0,0 +1,13 @@
+"""
+Test setup: backend modules import each other flat (from config import ...),
+as when run from backend/, and utils/ as a package from the repository root.
+"""
+import os
+import sys
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT_DIR, os.path.join(ROOT_DIR, "backend")]
+
+# Nothing shared with a real run: no on-disk LLM/OCR cache, no duplicate index
+os.environ.setdefault("CACHE_ENABLED", "0")
+os.environ.setdefault("DUPLICATE_DB", "")
@@ -0,0 +1,68 @@
+from applications import TURN_RESET, plan_turn
+from extractors import extract_fields
+from nodes import DataExtractor
+from utils.data_prep import passport_mrz
+
+PASSPORT = "PASSPORT\n" + "\n".join(passport_mrz("Alkaabi", "Saif", "P1234567", "800115", "M", "300101"))
+SLIP = "SALARY SLIP\nEmployee Name: Saif Alkaabi\nNet Salary: 7,300"
+DOCS = {"passport": PASSPORT, "salary_slip": SLIP}
+
+
+def test_first_turn_is_new_and_drops_empty_documents():
+    update, kind = plan_turn({}, {**DOCS, "bank_statement": ""}, "")
+    assert kind == "new"
+    assert update["applicant_info"] == DOCS
+    assert {k: update[k] for k in TURN_RESET} == TURN_RESET
+
+
+def test_same_documents_are_a_followup_or_unchanged():
+    previous = {"applicant_info": DOCS, "next": "FINISH", "hops": 4}
+    update, kind = plan_turn(previous, dict(DOCS), "Why was I declined?")
+    assert kind == "followup"
+    assert "applicant_info" not in update and update["hops"] == 0
+    assert plan_turn(previous, {**DOCS, "bank_statement": ""}, "")[1] == "unchanged"
+
+
+def test_changed_document_is_a_resubmission_over_the_stored_set():
+    previous = {"applicant_info": DOCS}
+    update, kind = plan_turn(previous, {"salary_slip": SLIP.replace("7,300", "9,100")}, "")
+    assert kind == "resubmission"
+    assert update["changed_documents"] == ["salary_slip"]
+    assert update["applicant_info"]["passport"] == PASSPORT
+    assert "9,100" in update["applicant_info"]["salary_slip"]
+
+
+def stored_state():
+    # A finished first turn: the LLM supplied what the passport and slip don't
+    first = extract_fields(DOCS)["values"]
+    extracted = {**first, "employment_years": 12, "family_members": 5, "assets": 25000, "liabilities": 15000}
+    return {"applicant_info": DOCS, "extracted_data": extracted, "eligibility": {"eligible": True},
+            "income_features": None, "extraction": {"llm_fields": ["employment_years"]}}
+
+
+def test_resubmitted_slip_keeps_stored_fields_and_resets_eligibility():
+    state = stored_state()
+    update, _ = plan_turn(state, {"salary_slip": SLIP.replace("7,300", "9,100")}, "")
+    state.update(update)
+
+    extractor = DataExtractor(mode="rules")
+    first, application = extractor.plan(state)
+    assert application == ""  # nothing left for the LLM
+    assert sorted(first["kept"]) == ["assets", "employment_years", "family_members", "liabilities"]
+
+    result = extractor(state)
+    assert result["extracted_data"]["monthly_income"] == 9100
+    assert result["extracted_data"]["family_members"] == 5
+    assert result["extraction"]["changed_fields"] == ["monthly_income"]
+    assert result["extraction"]["llm_fields"] == ["employment_years"]
+    assert result["eligibility"] is None and result["changed_documents"] == []
+
+
+def test_resubmission_without_new_values_keeps_the_eligibility_score():
+    state = stored_state()
+    update, _ = plan_turn(state, {"salary_slip": SLIP + "\nMonth: October 2026"}, "")
+    state.update(update)
+
+    result = DataExtractor(mode="rules")(state)
+    assert result["extraction"]["changed_fields"] == []
+    assert "eligibility" not in result
@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils import bank_statement
+from utils.bank_statement import StatementParser, income_features, parse_statement, statement_digest, statement_features
+
+HEADER = ["BANK STATEMENT", "Account Holder: Saif Alkaabi"]
+# (date, description, amount, balance); the rent is a debit, the rest credits
+ROWS = [
+    ("01/07/2025", "OPENING BALANCE", None, "5,000.00"),
+    ("02/07/2025", "SALARY TRANSFER ACME", "8,000.00", "13,000.00"),
+    ("05/07/2025", "RENT PAYMENT", "3,000.00", "10,000.00"),
+    ("10/07/2025", "RENTAL INCOME FLAT 12", "1,200.00", "11,200.00"),
+    ("02/08/2025", "SALARY TRANSFER ACME", "8,000.00", "19,200.00"),
+    ("05/08/2025", "RENT PAYMENT", "3,000.00", "16,200.00"),
+    ("10/08/2025", "RENTAL INCOME FLAT 12", "1,200.00", "17,400.00"),
+    ("02/09/2025", "SALARY TRANSFER ACME", "8,000.00", "25,400.00"),
+    ("05/09/2025", "RENT PAYMENT", "3,000.00", "22,400.00"),
+    ("10/09/2025", "RENTAL INCOME FLAT 12", "1,200.00", "23,600.00"),
+    ("30/09/2025", "GIFT FROM BROTHER", "500.00", "24,100.00"),
+]
+
+
+def line_layout():
+    return [*HEADER, *(f"{d}  {text}  {a or ''}  {b}" for d, text, a, b in ROWS)]
+
+
+def cell_layout():
+    # PyMuPDF on a table PDF: one cell per line
+    return [*HEADER, *(cell for row in ROWS for cell in row if cell)]
+
+
+def test_both_layouts_give_the_same_transactions():
+    lines, cells = parse_statement(["\n".join(line_layout())]), parse_statement(["\n".join(cell_layout())])
+    assert lines.header == HEADER
+    frame = lines.frame()
+    pd.testing.assert_frame_equal(frame, cells.frame())
+    assert len(frame) == len(ROWS) and np.isnan(frame["amount"][0])
+    assert frame["amount"].tolist()[1:4] == [8000.0, -3000.0, 1200.0]
+    assert frame["description"].cat.categories.tolist()[:2] == ["OPENING BALANCE", "SALARY TRANSFER ACME"]
+
+
+def test_pages_and_flushes_do_not_change_the_result(monkeypatch):
+    whole = parse_statement(["\n".join(line_layout())]).frame()
+    monkeypatch.setattr(bank_statement, "FLUSH_ROWS", 3)
+    parser = StatementParser()
+    for start in range(0, len(line_layout()), 4):
+        parser.feed(line_layout()[start:start + 4])
+    assert parser.rows == len(ROWS) - 1  # the last row closes in frame()
+    pd.testing.assert_frame_equal(parser.frame(), whole)
+
+
+def test_income_features():
+    features = income_features(parse_statement(["\n".join(line_layout())]).frame())
+    assert features["transactions"] == 10
+    assert features["months"] == 3
+    assert (features["salary_monthly"], features["salary_months"], features["salary_regularity"]) == (8000, 3, 1.0)
+    # Rent from the flat comes every month, the gift once
+    assert features["other_income"] == 1200
+    assert features["credits_monthly"] == round((3 * 8000 + 3 * 1200 + 500) / 3, 2)
+    assert features["debits_monthly"] == 3000
+
+    # Each balance holds from its day until the next one
+    days = pd.date_range("2025-07-01", "2025-09-30")
+    held = pd.Series({pd.Timestamp(pd.to_datetime(d, dayfirst=True)): float(b.replace(",", ""))
+                      for d, _, _, b in ROWS}).reindex(days).ffill()
+    assert features["average_balance"] == pytest.approx(held.mean(), abs=0.01)
+
+
+def test_irregular_salary_scores_lower():
+    rows = [line for line in line_layout() if not line.startswith("02/08/2025")]
+    features = income_features(parse_statement(["\n".join(rows)]).frame())
+    assert features["salary_months"] == 2
+    assert features["salary_regularity"] == pytest.approx(2 / 3, abs=0.01)
+
+
+def test_digest_reads_back_as_the_same_features():
+    text = "\n".join(line_layout())
+    digest = statement_digest([text])
+    assert digest.startswith(bank_statement.DIGEST_MARKER) and "Account Holder: Saif Alkaabi" in digest
+    assert statement_features(digest) == statement_features(text)
+    assert statement_digest(["\n".join(HEADER)]) is None
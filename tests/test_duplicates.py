@@ -0,0 +1,95 @@
+import io
+
+import pytest
+
+from duplicates import IMAGE_MAX_DISTANCE, DuplicateIndex, image_hash, normalise_name
+from utils.data_prep import passport_mrz
+
+
+def documents(name, surname, passport_no, income, seed):
+    form = "\n".join([
+        "SOCIAL SUPPORT APPLICATION FORM",
+        f"Name: {name} {surname}",
+        f"Address: Villa {seed}, Street {seed * 7}, Al Nahda, Sharjah",
+        f"Monthly Income (AED): {income:,}",
+        f"Total Assets (AED): {seed * 1000:,}",
+    ])
+    statement = ["BANK STATEMENT", f"Account Holder: {name} {surname}"]
+    balance = 5000.0
+    for day in range(1, 29):
+        amount = 40.0 + (day * seed) % 300
+        balance -= amount
+        statement.append(f"{day:02d}/08/2025  POS PURCHASE STORE {day * seed % 97}  {amount:,.2f}  {balance:,.2f}")
+    passport = "PASSPORT\n" + "\n".join(passport_mrz(surname, name, passport_no, "800115", "M", "300101"))
+    return {"application_form": form, "bank_statement": "\n".join(statement), "passport": passport}
+
+
+SAIF = documents("Saif", "Alkaabi", "P1234567", 7300, 3)
+MARYAM = documents("Maryam", "Alhashimi", "P7654321", 9100, 5)
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = DuplicateIndex(str(tmp_path / "duplicates.sqlite"))
+    index.record("saif", SAIF, {"name": "Saif Alkaabi"})
+    return index
+
+
+def matches_of(found):
+    return {(m["application_id"], m["match"], m.get("document")) for m in found}
+
+
+def test_names_normalise_across_order_case_and_accents():
+    assert normalise_name("Al-Kaabi, Saif") == normalise_name("SAIF ALKAABI") == normalise_name("Saïf Alkaabi")
+
+
+def test_same_documents_under_another_application_match(index):
+    found = index.check("copy", SAIF, {"name": "SAIF AL-KAABI"})
+    assert matches_of(found) >= {
+        ("saif", "passport_no", None), ("saif", "name", None),
+        ("saif", "document_text", "application_form"), ("saif", "document_text", "bank_statement"),
+    }
+    # An application never matches itself
+    assert index.check("saif", SAIF, {"name": "Saif Alkaabi"}) == []
+
+
+def test_edited_copy_still_matches(index):
+    edited = dict(SAIF)
+    lines = SAIF["bank_statement"].splitlines()
+    lines[10] = lines[10].replace("POS PURCHASE", "ATM WITHDRAWAL")
+    edited["bank_statement"] = "\n".join(lines)
+    found = index.check(None, {"bank_statement": edited["bank_statement"]}, {})
+    assert [m["match"] for m in found] == ["document_text"]
+    assert 0.85 <= found[0]["similarity"] < 1
+
+
+def test_other_applicant_on_the_same_templates_does_not_match(index):
+    assert index.check("maryam", MARYAM, {"name": "Maryam Alhashimi"}) == []
+
+
+def test_forget_and_rerecord(index):
+    index.record("saif", {"bank_statement": SAIF["bank_statement"]}, {"name": "Saif Alkaabi"})
+    found = index.check("copy", SAIF, {})
+    assert ("saif", "document_text", "bank_statement") in matches_of(found)
+    index.forget("saif")
+    assert index.check("copy", SAIF, {"name": "Saif Alkaabi"}) == []
+
+
+def test_rescaled_upload_keeps_its_image_hash(tmp_path):
+    Image = pytest.importorskip("PIL.Image")
+    from utils.data_prep import render_image
+
+    def encoded(img, fmt, **kwargs):
+        buffer = io.BytesIO()
+        img.save(buffer, format=fmt, **kwargs)
+        return buffer.getvalue()
+
+    original, other = tmp_path / "saif.png", tmp_path / "maryam.png"
+    render_image(SAIF["application_form"], str(original))
+    render_image(MARYAM["application_form"], str(other))
+    with Image.open(original) as img:
+        copy = encoded(img.resize((img.width // 2, img.height // 2)).convert("RGB"), "JPEG", quality=70)
+    first = image_hash(original.read_bytes())
+    assert (first ^ image_hash(copy)).bit_count() <= IMAGE_MAX_DISTANCE
+    assert (first ^ image_hash(other.read_bytes())).bit_count() > IMAGE_MAX_DISTANCE
+    assert image_hash(b"not an image") is None
@@ -0,0 +1,70 @@
+from datetime import date
+
+import pytest
+
+from extractors import classify_document, extract_fields, mrz_check_digit, parse_form, parse_mrz, parse_passport
+from utils.data_prep import _mrz_check_digit, passport_mrz
+
+TODAY = date(2026, 10, 17)
+
+FORM = """SOCIAL SUPPORT APPLICATION FORM
+Full Name: Saif Alkaabi
+Age: 46
+Gender: Male
+Years of Employment: 12
+Monthly Income (AED): 7,300
+Family Size: 5
+Total Assets (AED): 25,000
+Total Liabilities (AED): 15,000
+"""
+
+
+@pytest.mark.parametrize("value, digit", [("L898902C3", "6"), ("740812", "2"), ("120415", "9"), ("<<<<<<<<<", "0")])
+def test_check_digits_match_the_icao_specimen(value, digit):
+    # ICAO 9303 part 4 specimen passport
+    assert mrz_check_digit(value) == digit
+    assert _mrz_check_digit(value) == digit
+
+
+def test_generated_mrz_parses_and_validates():
+    lines = passport_mrz("Alkaabi", "Saif Abdul", "P1234567", "800115", "M", "300101")
+    assert [len(line) for line in lines] == [44, 44]
+    mrz = parse_mrz("PASSPORT\n" + "\n".join(lines), TODAY)
+    assert mrz["valid"]
+    assert (mrz["surname"], mrz["given_names"], mrz["passport_no"]) == ("Alkaabi", "Saif Abdul", "P1234567")
+    assert (mrz["dob"], mrz["sex"]) == (date(1980, 1, 15), "Male")
+
+
+def test_wrong_check_digit_lowers_confidence():
+    line1, line2 = passport_mrz("Alkaabi", "Saif", "P1234567", "800115", "M", "300101")
+    tampered = line2[:13] + "810115" + line2[19:]  # date of birth changed, check digit not
+    assert parse_mrz(f"{line1}\n{tampered}", TODAY)["valid"] is False
+    assert parse_passport(f"{line1}\n{tampered}", TODAY)["age"][1] == 0.5
+    assert parse_passport(f"{line1}\n{line2}", TODAY)["age"] == (46, 0.99)
+
+
+def test_form_fields_and_ranges():
+    fields = parse_form(FORM)
+    assert fields["monthly_income"] == (7300, 0.95)
+    assert fields["family_members"] == (5, 0.95)
+    assert fields["liabilities"] == (15000, 0.95)
+    assert fields["gender"] == ("Male", 0.95)
+    # Out of range numbers are kept with a confidence low enough to ask the LLM
+    assert parse_form("Age: 400")["age"] == (400, 0.3)
+
+
+def test_documents_are_classified_by_content_before_slot():
+    assert classify_document("passport", FORM) == "application_form"
+    assert classify_document("salary", "Employee: x") == "salary_slip"
+    assert classify_document("other", "no markers here") == "unknown"
+
+
+def test_extract_fields_leaves_only_unsettled_fields_to_the_llm():
+    result = extract_fields({"application_form": FORM})
+    assert result["documents"] == {"application_form": "application_form"}
+    assert result["values"]["monthly_income"] == 7300
+    assert result["needs_llm"] == []
+
+    partial = extract_fields({"application_form": FORM.replace("Total Assets (AED): 25,000\n", "")})
+    assert partial["needs_llm"] == ["assets"]
+    assert partial["values"]["assets"] == ""
@@ -0,0 +1,55 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from forest import DEFAULT_CSV, DEFAULT_NPZ, CompiledForest, export_forest
+from scoring import MODEL_FEATURES
+
+ensemble = pytest.importorskip("sklearn.ensemble")
+
+
+@pytest.fixture(scope="module")
+def caseload():
+    frame = pd.read_csv(DEFAULT_CSV)
+    rng = np.random.default_rng(0)
+    # Unseen rows too, including values between and beyond the training data
+    unseen = pd.DataFrame({f: rng.uniform(frame[f].min() * 0.5, frame[f].max() * 1.5, 300) for f in MODEL_FEATURES})
+    return frame, pd.concat([frame[MODEL_FEATURES], unseen], ignore_index=True)
+
+
+@pytest.fixture(scope="module")
+def forest(caseload):
+    frame, _ = caseload
+    model = ensemble.RandomForestClassifier(n_estimators=25, min_samples_leaf=2, random_state=0)
+    return model.fit(frame[MODEL_FEATURES], frame["eligible"])
+
+
+@pytest.mark.parametrize("mmap", [True, False])
+def test_compiled_forest_matches_sklearn_exactly(forest, caseload, tmp_path, mmap):
+    _, X = caseload
+    path = str(tmp_path / "forest.npz")
+    export_forest(forest, path)
+    compiled = CompiledForest.load(path, mmap=mmap)
+
+    assert np.array_equal(compiled.predict_proba(X), forest.predict_proba(X))
+    assert np.array_equal(compiled.predict(X), forest.predict(X))
+    assert list(compiled.classes_) == list(forest.classes_)
+    assert list(compiled.feature_names_in_) == MODEL_FEATURES
+
+
+def test_single_row_and_ndarray_input(forest, caseload, tmp_path):
+    _, X = caseload
+    path = str(tmp_path / "forest.npz")
+    export_forest(forest, path)
+    compiled = CompiledForest.load(path)
+    row = X.iloc[[7]]
+    assert np.array_equal(compiled.predict_proba(row.to_numpy()), forest.predict_proba(row))
+
+
+def test_shipped_npz_has_the_model_features():
+    assert os.path.exists(DEFAULT_NPZ)
+    compiled = CompiledForest.load(DEFAULT_NPZ)
+    assert list(compiled.feature_names_in_) == MODEL_FEATURES
+    assert list(compiled.classes_) == [0, 1]
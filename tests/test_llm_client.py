@@ -0,0 +1,161 @@
+import asyncio
+import threading
+import time
+
+import httpx
+import ollama
+import pytest
+
+import llm_client
+from llm_client import CircuitBreaker, LLMUnavailableError, Slots, is_transient
+
+
+class FakeOllama:
+    """Answers with the next scripted reply; an exception in the script is raised instead."""
+
+    def __init__(self, *replies):
+        self.replies = list(replies)
+        self.calls = 0
+
+    def reply(self):
+        self.calls += 1
+        reply = self.replies.pop(0) if len(self.replies) > 1 else self.replies[0]
+        if isinstance(reply, Exception):
+            raise reply
+        return {"message": {"content": reply}}
+
+    def chat(self, **kwargs):
+        return self.reply()
+
+
+class FakeAsyncOllama(FakeOllama):
+    async def chat(self, **kwargs):
+        return self.reply()
+
+
+@pytest.fixture
+def breaker(monkeypatch):
+    # A fresh breaker, no backoff and a fresh slot limit for every test
+    fresh = CircuitBreaker(failures=3, reset_s=30)
+    monkeypatch.setattr(llm_client, "breaker", fresh)
+    monkeypatch.setattr(llm_client, "LLM_RETRY_BACKOFF_S", 0.0)
+    monkeypatch.setattr(llm_client, "_slots", Slots(2))
+    return fresh
+
+
+def ask(text):
+    return [{"role": "user", "content": text}]
+
+
+def test_breaker_opens_probes_and_closes():
+    breaker = CircuitBreaker(failures=2, reset_s=0.05)
+    breaker.failure()
+    assert breaker.allow()
+    breaker.failure()
+    assert breaker.state == "open" and not breaker.allow()
+    time.sleep(0.06)
+    assert breaker.allow() and breaker.state == "half_open"
+    assert not breaker.allow()  # a single probe
+    breaker.failure()
+    assert breaker.state == "open"
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.success()
+    assert breaker.state == "closed" and breaker.consecutive == 0
+
+
+@pytest.mark.parametrize("error, transient", [
+    (ollama.ResponseError("busy", 503), True),
+    (ollama.ResponseError("rate limited", 429), True),
+    (ollama.ResponseError("model not found", 404), False),
+    (TimeoutError(), True),
+    (httpx.ConnectError("refused"), True),
+    (ConnectionResetError(), True),
+    (ValueError("bad options"), False),
+])
+def test_transient_errors(error, transient):
+    assert is_transient(error) is transient
+
+
+def test_transient_error_is_retried(breaker, monkeypatch):
+    fake = FakeOllama(ollama.ResponseError("busy", 503), "answer")
+    monkeypatch.setattr(llm_client, "_client", fake)
+    assert llm_client.chat(ask("retried"), stage="test", timeout=5) == "answer"
+    assert fake.calls == 2
+    assert breaker.state == "closed" and breaker.consecutive == 0
+
+
+def test_client_error_is_raised_without_retry(breaker, monkeypatch):
+    fake = FakeOllama(ollama.ResponseError("model not found", 404))
+    monkeypatch.setattr(llm_client, "_client", fake)
+    with pytest.raises(ollama.ResponseError):
+        llm_client.chat(ask("not retried"), stage="test", timeout=5)
+    # Ollama answered, so the breaker counts it as up
+    assert fake.calls == 1 and breaker.consecutive == 0
+
+
+def test_exhausted_retries_open_the_breaker(breaker, monkeypatch):
+    fake = FakeOllama(ConnectionError("refused"))
+    monkeypatch.setattr(llm_client, "_client", fake)
+    with pytest.raises(LLMUnavailableError):
+        llm_client.chat(ask("down"), stage="test", timeout=5)
+    assert fake.calls == llm_client.LLM_RETRIES + 1 == breaker.failures
+    assert breaker.state == "open"
+
+    # Open: the next call fails fast without reaching Ollama
+    with pytest.raises(LLMUnavailableError, match="circuit open"):
+        llm_client.chat(ask("still down"), stage="test", timeout=5)
+    assert fake.calls == llm_client.LLM_RETRIES + 1
+
+
+def test_async_path_retries_the_same_way(breaker, monkeypatch):
+    fake = FakeAsyncOllama(httpx.ReadTimeout("slow"), "answer")
+    monkeypatch.setattr(llm_client, "get_async_client", lambda: fake)
+    assert asyncio.run(llm_client.achat(ask("async retried"), stage="test", timeout=5)) == "answer"
+    assert fake.calls == 2 and breaker.state == "closed"
+    assert llm_client._slots.free == 2
+
+
+def test_slot_wait_timeout_is_not_a_failure(breaker, monkeypatch):
+    monkeypatch.setattr(llm_client, "_slots", Slots(0))
+    monkeypatch.setattr(llm_client, "_client", FakeOllama("never asked"))
+    with pytest.raises(LLMUnavailableError, match="slots"):
+        llm_client.chat(ask("queued"), stage="test", timeout=0.05)
+    assert breaker.consecutive == 0
+
+
+def test_slots_time_out_and_are_not_leaked():
+    slots = Slots(1)
+    assert slots.acquire(1) == 0.0
+    assert slots.acquire(0.02) is None
+    slots.release()
+    assert slots.acquire(0.02) == 0.0
+    slots.release()
+    assert slots.free == 1 and not slots._waiters
+
+
+def test_slots_are_shared_first_come_first_served_by_threads_and_loops():
+    slots = Slots(1)
+    order = []
+    assert slots.acquire(1) == 0.0
+
+    def thread_waiter():
+        assert slots.acquire(2) is not None
+        order.append("thread")
+        slots.release()
+
+    async def loop_waiter():
+        await asyncio.sleep(0.05)  # queued after the thread
+        assert await slots.aacquire(2) is not None
+        order.append("loop")
+        slots.release()
+
+    thread = threading.Thread(target=thread_waiter)
+    thread.start()
+    time.sleep(0.02)
+    releaser = threading.Timer(0.1, slots.release)
+    releaser.start()
+    asyncio.run(loop_waiter())
+    thread.join()
+    assert order == ["thread", "loop"]
+    assert slots.free == 1 and not slots._waiters
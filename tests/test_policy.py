@@ -0,0 +1,82 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.policy import Policy, PolicyError
+
+
+@pytest.fixture(scope="module")
+def policy():
+    return Policy.load("support")
+
+
+@pytest.fixture(scope="module")
+def columns():
+    # Coarse values, so plenty of rows sit exactly on the thresholds; a few unreadable incomes
+    rng = np.random.default_rng(7)
+    rows = 5000
+    income = rng.integers(0, 60, rows).astype(np.float64) * 500
+    income[rng.choice(rows, 50, replace=False)] = np.nan
+    return {
+        "income": income,
+        "family_size": rng.integers(1, 8, rows).astype(np.float64),
+        "assets": rng.integers(0, 20, rows).astype(np.float64) * 5000,
+        "liabilities": rng.integers(0, 5, rows).astype(np.float64) * 5000,
+    }
+
+
+def general(policy):
+    slow = Policy(policy.spec)
+    slow._threshold_sweep = lambda *a: None  # force the general path
+    return slow
+
+
+def test_single_row_check_agrees_with_evaluate(policy, columns):
+    mask = policy.evaluate(columns)
+    assert 0 < mask.sum() < len(mask)
+    for i in range(0, len(mask), 7):
+        row = {k: v[i] for k, v in columns.items()}
+        assert policy.check(row)["eligible"] == mask[i]
+    # Extracted field names and text amounts read the same
+    extracted = {"monthly_income": "AED 24,500", "family_members": "3", "assets": 60000, "liabilities": 10000}
+    assert policy.check(extracted)["eligible"]
+    assert policy.check({**extracted, "other_income": 500})["failed"] == ["income < 25000"]
+
+
+def test_unknown_parameter_raises(policy, columns):
+    with pytest.raises(PolicyError):
+        policy.sweep(columns, {"max_incme": [1000]})
+
+
+@pytest.mark.parametrize("param, values", [
+    ("max_income", np.arange(0, 32000, 500)),
+    ("min_family", [1, 2, 3, 4, 5, 8]),
+    ("max_net_assets", np.arange(-20000, 100001, 5000)),
+])
+def test_threshold_fast_path_matches_the_general_path(policy, columns, param, values):
+    grid = {param: [float(v) for v in values]}
+    assert policy._threshold_sweep(columns, grid, policy.resolve(), policy.benefit(columns), {}) is not None
+    fast = policy.sweep(columns, {param: values})
+    pd.testing.assert_frame_equal(fast, general(policy).sweep(columns, {param: values}), check_dtype=False)
+
+    for _, point in fast.iloc[::5].iterrows():
+        mask = policy.evaluate(columns, {param: point[param]})
+        assert point["eligible"] == mask.sum()
+        assert point["monthly_cost"] == pytest.approx(policy.benefit(columns)[mask].sum())
+
+
+def test_current_parameters_are_the_baseline(policy, columns):
+    frame = policy.sweep(columns, {"max_income": [policy.params["max_income"]]})
+    assert frame.attrs["eligible"] == policy.evaluate(columns).sum() == frame["eligible"][0]
+    assert (frame["eligible_change"][0], frame["gained"][0], frame["lost"][0], frame["cost_change"][0]) == (0, 0, 0, 0)
+
+
+def test_grid_points_match_evaluate(policy, columns):
+    grid = policy.sweep(columns, {"max_income": [10000, 25000], "min_family": [2, 4],
+                                  "benefit_per_member": [500, 800]})
+    assert len(grid) == 8
+    for _, point in grid.iterrows():
+        params = {k: point[k] for k in ("max_income", "min_family", "benefit_per_member")}
+        mask = policy.evaluate(columns, params)
+        assert point["eligible"] == mask.sum()
+        assert point["monthly_cost"] == pytest.approx(policy.benefit(columns, params)[mask].sum())
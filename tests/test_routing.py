@@ -0,0 +1,43 @@
+from config import MAX_HOPS
+from nodes import Orchestrator, route_by_rules
+
+EXTRACTED = {"applicant_info": {"application_form": "..."}, "extracted_data": {"monthly_income": 4000}}
+
+
+def test_new_application_starts_with_extraction():
+    assert route_by_rules({"applicant_info": {"application_form": "..."}}) == "data_extractor"
+
+
+def test_rules_follow_the_workflow():
+    assert route_by_rules(EXTRACTED) == "eligibility_checker"
+    assert route_by_rules({**EXTRACTED, "eligibility": True}) == "data_validator"
+    assert route_by_rules({**EXTRACTED, "eligibility": True, "validation_results": {}}) == "response_generator"
+    assert route_by_rules({**EXTRACTED, "eligibility": False}) == "response_generator"
+
+
+def test_changed_documents_are_extracted_before_a_followup_is_answered():
+    state = {**EXTRACTED, "eligibility": True, "final_response": {"final_status": "eligible"},
+             "followup_query": "Why?", "changed_documents": ["salary_slip"]}
+    assert route_by_rules(state) == "data_extractor"
+
+
+def test_followup_goes_to_the_llm_until_there_is_a_decision():
+    decided = {**EXTRACTED, "eligibility": True, "final_response": {"final_status": "eligible"}}
+    assert route_by_rules({**decided, "followup_query": "Why?"}) == "response_generator"
+    assert route_by_rules({**EXTRACTED, "followup_query": "Why?"}) is None
+
+
+def test_orchestrator_counts_hops_without_llm_calls():
+    orchestrator = Orchestrator(mode="rules")
+    update = orchestrator({**EXTRACTED, "hops": 2, "llm_routing_calls": 0, "routing_ms": 0.0})
+    assert update["next"] == "eligibility_checker"
+    assert update["hops"] == 3
+    assert update["llm_routing_calls"] == 0
+
+
+def test_hop_limit_ends_at_the_response_generator():
+    decision = Orchestrator(mode="rules").rule_decision({**EXTRACTED, "hops": MAX_HOPS})
+    assert decision["next_node"] == "response_generator"
+    assert "hop limit" in decision["reason"]
+    assert Orchestrator(mode="rules").rule_decision({**EXTRACTED, "hops": MAX_HOPS - 1})["next_node"] == \
+        "eligibility_checker"
@@ -0,0 +1,71 @@
+import json
+import os
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import scoring
+from scoring import MODEL_FEATURES, ModelSchemaError, check_model, load_model_schema
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def schema():
+    with open(scoring.current_schema_path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def model(features=MODEL_FEATURES, classes=(0, 1)):
+    return SimpleNamespace(feature_names_in_=np.asarray(features), n_features_in_=len(features),
+                           classes_=np.asarray(classes))
+
+
+def test_matching_model_and_schema_pass(schema):
+    check_model(model(), schema)
+    check_model(model(), None)  # legacy: nothing to compare the classes with
+
+
+@pytest.mark.parametrize("change", [
+    {"features": ["income", "family_size", "assets", "employment_years", "age"]},
+    {"eligible_class": 2},
+    {"classes": [1, 2], "eligible_class": 1},
+])
+def test_schema_mismatch_raises(schema, change):
+    with pytest.raises(ModelSchemaError):
+        check_model(model(), {**schema, **change})
+
+
+@pytest.mark.parametrize("wrong", [
+    model(features=MODEL_FEATURES[::-1]),
+    SimpleNamespace(n_features_in_=4),
+    model(classes=(1, 2)),
+])
+def test_model_mismatch_raises(schema, wrong):
+    with pytest.raises(ModelSchemaError):
+        check_model(wrong, schema)
+
+
+def test_missing_version_raises():
+    with pytest.raises(ModelSchemaError, match="does not exist"):
+        load_model_schema("no-such-version")
+
+
+def test_wrong_schema_on_disk_stops_the_load(schema, tmp_path, monkeypatch):
+    path = tmp_path / "eligibility_model.json"
+    path.write_text(json.dumps({**schema, "classes": [0, 2], "eligible_class": 2}), encoding="utf-8")
+    monkeypatch.setattr(scoring, "current_schema_path", str(path))
+    with pytest.raises(ModelSchemaError, match="classes"):
+        scoring.load_eligibility_model()
+
+
+def test_shipped_model_scores_the_training_caseload():
+    shipped = scoring.load_eligibility_model()
+    assert shipped.eligible_class_ == 1
+    caseload = pd.read_csv(os.path.join(ROOT_DIR, "data", "applicants.csv"))
+    results = scoring.score_records(caseload.drop(columns="eligible"), model=shipped)
+    assert {r["source"] for r in results} == {"model"}
+    # In-sample, see training_set_metrics in the schema
+    assert [r["eligible"] for r in results] == caseload["eligible"].astype(bool).tolist()
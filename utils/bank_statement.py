@@ -0,0 +1,294 @@
+# utils/bank_statement.py
+"""
+Streaming bank statement parser.
+
+Statement lines are fed page by page into StatementParser, which keeps only
+typed columns per transaction (date, amount, balance, description code), so a
+statement of hundreds of pages is never held as text. Two layouts are read:
+one transaction per line ("05/08/2025  SALARY TRANSFER  6,500.00  11,500.00")
+and PyMuPDF's one-cell-per-line output of table PDFs (date, description,
+amount and balance on consecutive lines).
+
+income_features() turns the transactions into a few figures with vectorised
+pandas operations, and statement_digest() writes them, with the statement
+header, as the short text that stands in for the statement everywhere else
+(OCR cache, application state, prompts).
+"""
+import math
+import re
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+# First line of a digest; statement_features() reads the figures back from it
+DIGEST_MARKER = "BANK STATEMENT DIGEST"
+
+# Header lines kept from the first page (account holder, period, ...)
+MAX_HEADER_LINES = 12
+
+# Rows parsed before the buffered date strings are converted to datetime64
+FLUSH_ROWS = 4096
+
+_DATE = re.compile(
+    r"^\s*(\d{1,2}[/.-]\d{1,2}[/.-]\d{2,4}|\d{4}-\d{2}-\d{2}|\d{1,2}[ -][A-Za-z]{3,9}[ -]\d{2,4})\b")
+# Overdrawn balances carry a minus sign
+_MONEY = re.compile(r"(?<![\w.])-?\d{1,3}(?:,\d{3})*\.\d{2}")
+_BALANCE_ONLY = re.compile(r"opening\s*balance|closing\s*balance|balance\s*(?:brought|carried)\s*forward",
+                           re.IGNORECASE)
+_SALARY = re.compile(r"salary|payroll|wages", re.IGNORECASE)
+# Credits when the balance column can't tell (no balance or it doesn't add up)
+_CREDIT_WORDS = re.compile(r"salary|payroll|wages|credit|deposit|refund|income|received|transfer\s*in",
+                           re.IGNORECASE)
+_KEY_NOISE = re.compile(r"[^a-z ]+")
+
+# Digest label -> feature, in the order they are written
+DIGEST_FIELDS = [
+    ("Transactions", "transactions"),
+    ("Months covered", "months"),
+    ("Salary credit per month (AED)", "salary_monthly"),
+    ("Months with a salary credit", "salary_months"),
+    ("Salary regularity", "salary_regularity"),
+    ("Recurring other credits per month (AED)", "other_income"),
+    ("Average balance (AED)", "average_balance"),
+    ("Credits per month (AED)", "credits_monthly"),
+    ("Debits per month (AED)", "debits_monthly"),
+]
+
+
+class StatementParser:
+    """Incremental transaction parser; feed() lines in document order, then frame()."""
+
+    def __init__(self):
+        self.header: List[str] = []
+        self._codes: Dict[str, int] = {}
+        self._dates: List[np.ndarray] = []
+        self._columns: Dict[str, List[np.ndarray]] = {"amount": [], "balance": [], "description": []}
+        self._pending = {"date": [], "amount": [], "balance": [], "description": []}
+        self._row = None
+
+    def feed(self, lines: Iterable[str]) -> None:
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+            match = _DATE.match(line)
+            if match:
+                self._close_row()
+                self._row = {"date": match.group(1), "text": [], "amounts": []}
+                line = line[match.end():]
+            elif self._row is None:
+                if len(self.header) < MAX_HEADER_LINES and not self._dates and not self._pending["date"]:
+                    self.header.append(line)
+                continue
+            self._add(line)
+
+    @property
+    def rows(self) -> int:
+        """Transactions parsed so far."""
+        return len(self._pending["date"]) + sum(len(dates) for dates in self._dates)
+
+    def _add(self, line: str) -> None:
+        row = self._row
+        amounts = _MONEY.findall(line)
+        text = _MONEY.sub(" ", line).strip() if amounts else line
+        # Description cells come before the amounts; text after them (page
+        # footers, totals) is not part of the row
+        if text and not row["amounts"] and re.search(r"[A-Za-z]", text):
+            row["text"].append(text)
+        if amounts and len(row["amounts"]) < 2:
+            row["amounts"].extend(float(a.replace(",", "")) for a in amounts)
+
+    def _close_row(self) -> None:
+        row, self._row = self._row, None
+        if row is None or not row["amounts"]:
+            return
+        description = " ".join(" ".join(row["text"]).split())[:80]
+        amounts = row["amounts"]
+        if _BALANCE_ONLY.search(description):
+            amount, balance = math.nan, amounts[-1]
+        else:
+            amount, balance = amounts[0], amounts[-1] if len(amounts) > 1 else math.nan
+        pending = self._pending
+        pending["date"].append(row["date"])
+        pending["amount"].append(amount)
+        pending["balance"].append(balance)
+        pending["description"].append(self._codes.setdefault(description, len(self._codes)))
+        if len(pending["date"]) >= FLUSH_ROWS:
+            self._flush()
+
+    def _flush(self) -> None:
+        pending = self._pending
+        if not pending["date"]:
+            return
+        dates = pd.to_datetime(pd.Series(pending["date"]), dayfirst=True, format="mixed", errors="coerce")
+        self._dates.append(dates.to_numpy(dtype="datetime64[ns]"))
+        self._columns["amount"].append(np.asarray(pending["amount"], dtype=np.float64))
+        self._columns["balance"].append(np.asarray(pending["balance"], dtype=np.float64))
+        self._columns["description"].append(np.asarray(pending["description"], dtype=np.int32))
+        self._pending = {key: [] for key in pending}
+
+    def frame(self) -> pd.DataFrame:
+        """Transactions as columns: date, description (categorical), amount (signed, NaN for balance rows), balance."""
+        self._close_row()
+        self._flush()
+        if not self._dates:
+            return pd.DataFrame({"date": pd.Series(dtype="datetime64[ns]"), "description": pd.Categorical([]),
+                                 "amount": pd.Series(dtype=float), "balance": pd.Series(dtype=float)})
+        categories = list(self._codes)
+        frame = pd.DataFrame({
+            "date": np.concatenate(self._dates),
+            "description": pd.Categorical.from_codes(np.concatenate(self._columns["description"]), categories),
+            "amount": np.concatenate(self._columns["amount"]),
+            "balance": np.concatenate(self._columns["balance"]),
+        })
+        if frame["date"].isna().any():
+            frame = frame[frame["date"].notna()].reset_index(drop=True)
+        frame["amount"] = _signed(frame)
+        return frame
+
+
+def _by_description(descriptions: pd.Series, func) -> np.ndarray:
+    """func over the distinct descriptions only, spread back to every row through the category codes."""
+    values = np.asarray(func(pd.Series(descriptions.cat.categories, dtype=object)))
+    return values[descriptions.cat.codes.to_numpy()]
+
+
+def _signed(frame: pd.DataFrame) -> pd.Series:
+    """Credits positive, debits negative: from the balance change when it matches the amount."""
+    amount = frame["amount"]
+    change = frame["balance"] - frame["balance"].ffill().shift()
+    from_balance = (change.abs() - amount).abs() < 0.01
+    credit_word = _by_description(frame["description"], lambda d: d.str.contains(_CREDIT_WORDS))
+    credit = np.where(from_balance, change > 0, credit_word)
+    return amount.abs().where(credit, -amount.abs())
+
+
+def parse_statement(pages: Iterable[str]) -> StatementParser:
+    """Feed page texts one at a time; only the current page's text is in memory."""
+    parser = StatementParser()
+    for page in pages:
+        parser.feed(page.splitlines())
+    return parser
+
+
+def _description_flags(descriptions: pd.Series):
+    """(salary flag, payer key id) per distinct description, indexed by category code."""
+    categories = pd.Series(descriptions.cat.categories, dtype=object)
+    salary = categories.str.contains(_SALARY).to_numpy(dtype=bool)
+    # Recurring payer: first three words of the description, digits and punctuation dropped
+    keys = categories.str.lower().str.replace(_KEY_NOISE, " ", regex=True).str.split().str[:3].str.join(" ")
+    _, key_ids = np.unique(keys.to_numpy(dtype=str), return_inverse=True)
+    return salary, key_ids
+
+
+def _average_balance(dates: np.ndarray, balance: np.ndarray) -> float:
+    """Mean end-of-day balance over every day from the first to the last balance."""
+    known = ~np.isnan(balance)
+    if not known.any():
+        return math.nan
+    order = np.argsort(dates[known], kind="stable")
+    days, values = dates[known][order], balance[known][order]
+    last_of_day = np.r_[days[1:] != days[:-1], True]
+    days, values = days[last_of_day], values[last_of_day]
+    # Each balance holds until the next day with one; the last one for its own day
+    held = np.r_[np.diff(days).astype(np.int64), 1]
+    return float((values * held).sum() / held.sum())
+
+
+def income_features(frame: pd.DataFrame) -> Dict[str, float]:
+    """
+    Income figures from the transactions:
+    salary_monthly    median salary credited per month that had one
+    salary_regularity share of months with a salary credit, scaled down by
+                      how much the amount varies (1.0 = same salary every month)
+    other_income      non-salary credits recurring in at least half the months
+                      (and at least two), per month
+    average_balance   day-weighted average end-of-day balance
+    """
+    amount = frame["amount"].to_numpy()
+    dated = frame["date"].to_numpy(dtype="datetime64[D]")
+    moves = ~np.isnan(amount)
+    if not moves.any():
+        return {}
+    # Length of the statement, not calendar months touched: 18 Jul - 14 Oct is 3
+    months = max(1, round(int((dated.max() - dated.min()).astype(np.int64)) / 30.44))
+
+    salary_of, key_of = _description_flags(frame["description"])
+    codes = frame["description"].cat.codes.to_numpy()[moves]
+    amount, month = amount[moves], dated[moves].astype("datetime64[M]").astype(np.int64)
+    credits = amount > 0
+    salary = credits & salary_of[codes]
+
+    salary_month, per_month = np.unique(month[salary], return_inverse=True)
+    per_month = np.bincount(per_month, weights=amount[salary]) if salary.any() else np.empty(0)
+    if len(per_month):
+        salary_monthly = float(np.median(per_month))
+        variation = float(per_month.std() / per_month.mean()) if per_month.mean() else 1.0
+        regularity = min(len(per_month) / months, 1.0) * max(0.0, 1.0 - variation)
+    else:
+        salary_monthly, regularity = 0.0, 0.0
+
+    other = credits & ~salary
+    keys = key_of[codes]
+    # Distinct (payer, month) pairs packed into one integer, then the number
+    # of months each payer shows up in
+    span = int(month.max() - month.min()) + 1
+    pairs = np.unique(keys[other].astype(np.int64) * span + (month[other] - month.min()))
+    payers, seen_in = np.unique(pairs // span, return_counts=True)
+    recurring = payers[seen_in >= max(2, math.ceil(months / 2))]
+    other_income = float(amount[other & np.isin(keys, recurring)].sum()) / months
+
+    return {
+        "transactions": int(moves.sum()),
+        "months": months,
+        "salary_monthly": round(salary_monthly, 2),
+        "salary_months": int(len(salary_month)),
+        "salary_regularity": round(regularity, 2),
+        "other_income": round(other_income, 2),
+        "average_balance": round(_average_balance(dated, frame["balance"].to_numpy()), 2),
+        "credits_monthly": round(float(amount[credits].sum()) / months, 2),
+        "debits_monthly": round(float(-amount[~credits].sum()) / months, 2),
+        "period_start": str(dated.min()),
+        "period_end": str(dated.max()),
+    }
+
+
+def statement_digest(pages: Iterable[str]) -> Optional[str]:
+    """Header lines plus income features; None when no transactions were found."""
+    return parser_digest(parse_statement(pages))
+
+
+def parser_digest(parser: StatementParser) -> Optional[str]:
+    """statement_digest() of a parser that has been fed the whole statement."""
+    features = income_features(parser.frame())
+    if not features:
+        return None
+    lines = [DIGEST_MARKER, *parser.header,
+             f"Statement period: {features['period_start']} to {features['period_end']}"]
+    for label, key in DIGEST_FIELDS:
+        value = features[key]
+        lines.append(f"{label}: {value:,.2f}" if isinstance(value, float) else f"{label}: {value}")
+    return "\n".join(lines)
+
+
+def _digest_features(text: str) -> Dict[str, float]:
+    features = {}
+    for label, key in DIGEST_FIELDS:
+        match = re.search(rf"^{re.escape(label)}: ([\d,.\-na]+)$", text, re.MULTILINE)
+        if match:
+            value = float(match.group(1).replace(",", ""))
+            features[key] = int(value) if key in ("transactions", "months", "salary_months") else value
+    period = re.search(r"^Statement period: (\S+) to (\S+)$", text, re.MULTILINE)
+    if period:
+        features.update(period_start=period.group(1), period_end=period.group(2))
+    return features
+
+
+def statement_features(text: str) -> Dict[str, float]:
+    """income_features() of a statement, from its digest or its full text."""
+    if not text or not text.strip():
+        return {}
+    if text.lstrip().startswith(DIGEST_MARKER):
+        return _digest_features(text)
+    return income_features(parse_statement([text]).frame())
@@ -0,0 +1,165 @@
+# utils/cache.py
+"""
+Content-addressed disk cache for OCR text and LLM results.
+
+Entries live in a local SQLite file, keyed by a SHA-256 of the input
+(file bytes for OCR, model + prompt for LLM calls) and grouped by namespace.
+Old entries are dropped by TTL, and least-recently-used entries are evicted
+once the store grows past its size limit.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CACHE_ENABLED = os.getenv("CACHE_ENABLED", "1") != "0"
+CACHE_PATH = os.getenv("CACHE_PATH", os.path.join(ROOT_DIR, ".cache", "social_support.sqlite"))
+CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_MB", "512")) * 1024 * 1024
+CACHE_TTL_S = float(os.getenv("CACHE_TTL_DAYS", "30")) * 24 * 3600
+
+# Size checks are a table scan, so only run them every N writes
+_EVICT_EVERY = 100
+
+
+def hash_key(*parts) -> str:
+    """SHA-256 over bytes / str / JSON-serialisable parts."""
+    h = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, (bytes, bytearray, memoryview)):
+            data = bytes(part)
+        elif isinstance(part, str):
+            data = part.encode("utf-8")
+        else:
+            data = json.dumps(part, sort_keys=True, default=str).encode("utf-8")
+        h.update(len(data).to_bytes(8, "little"))
+        h.update(data)
+    return h.hexdigest()
+
+
+class DiskCache:
+    def __init__(self, path: str = CACHE_PATH, max_bytes: int = CACHE_MAX_BYTES, ttl_s: float = CACHE_TTL_S):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl_s = ttl_s
+        self.hits = defaultdict(int)
+        self.misses = defaultdict(int)
+        self._local = threading.local()
+        self._writes = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._conn() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS entries (
+                    namespace TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created REAL NOT NULL,
+                    accessed REAL NOT NULL,
+                    PRIMARY KEY (namespace, key)
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)")
+
+    def _conn(self) -> sqlite3.Connection:
+        # One connection per thread; WAL lets Streamlit, uvicorn workers and
+        # OCR processes share the file
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, namespace: str, key: str):
+        now = time.time()
+        try:
+            conn = self._conn()
+            row = conn.execute(
+                "SELECT value, created FROM entries WHERE namespace = ? AND key = ?",
+                (namespace, key),
+            ).fetchone()
+            if row is not None and now - row[1] > self.ttl_s:
+                conn.execute("DELETE FROM entries WHERE namespace = ? AND key = ?", (namespace, key))
+                row = None
+            if row is None:
+                self.misses[namespace] += 1
+                return None
+            conn.execute(
+                "UPDATE entries SET accessed = ? WHERE namespace = ? AND key = ?",
+                (now, namespace, key),
+            )
+        except sqlite3.Error as e:
+            print(f"[WARN] Cache read failed: {e}")
+            self.misses[namespace] += 1
+            return None
+
+        self.hits[namespace] += 1
+        return json.loads(row[0])
+
+    def set(self, namespace: str, key: str, value) -> None:
+        payload = json.dumps(value)
+        now = time.time()
+        try:
+            self._conn().execute(
+                "INSERT OR REPLACE INTO entries (namespace, key, value, size, created, accessed) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (namespace, key, payload, len(payload), now, now),
+            )
+        except sqlite3.Error as e:
+            print(f"[WARN] Cache write failed: {e}")
+            return
+
+        with self._lock:
+            self._writes += 1
+            run_eviction = self._writes % _EVICT_EVERY == 0
+        if run_eviction:
+            self.evict()
+
+    def evict(self) -> int:
+        """Drop expired entries, then least-recently-used ones until under max_bytes."""
+        conn = self._conn()
+        removed = conn.execute("DELETE FROM entries WHERE created < ?", (time.time() - self.ttl_s,)).rowcount
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total > self.max_bytes:
+            # Trim to 90% so we don't evict again on the next write
+            excess = total - int(self.max_bytes * 0.9)
+            freed = 0
+            stale = []
+            for namespace, key, size in conn.execute(
+                "SELECT namespace, key, size FROM entries ORDER BY accessed"
+            ):
+                stale.append((namespace, key))
+                freed += size
+                if freed >= excess:
+                    break
+            conn.executemany("DELETE FROM entries WHERE namespace = ? AND key = ?", stale)
+            removed += len(stale)
+        return removed
+
+    def stats(self) -> dict:
+        namespaces = set(self.hits) | set(self.misses)
+        return {
+            ns: {"hits": self.hits[ns], "misses": self.misses[ns]}
+            for ns in sorted(namespaces)
+        }
+
+
+_cache = None
+
+
+def get_cache():
+    """Process-wide cache, or None when CACHE_ENABLED=0."""
+    global _cache
+    if not CACHE_ENABLED:
+        return None
+    if _cache is None:
+        _cache = DiskCache()
+    return _cache
@@ -1,58 +1,310 @@
+import argparse
+import json
 import os
 import pandas as pd
 import numpy as np
-from sklearn.model_selection import train_test_split
-from sklearn.ensemble import RandomForestClassifier
-import joblib
+import sys
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# utils.policy, also when run as a script
+if ROOT_DIR not in sys.path:
+    sys.path.append(ROOT_DIR)
+from utils.policy import Policy  # noqa: E402
+
+FEATURES = ["income", "family_size", "employment_years", "assets", "age"]
+
+FIRST_NAMES = ["Saif", "Mariam", "Omar", "Fatima", "Khalid", "Aisha", "Hamdan", "Noura", "Rashid", "Latifa"]
+LAST_NAMES = ["Alkaabi", "Almansoori", "Alnuaimi", "Alshamsi", "Aldhaheri", "Alketbi", "Almazrouei"]
+EMPLOYMENT = ["Employed", "Unemployed", "Self-employed", "Part-time"]
+MARITAL = ["Single", "Married", "Divorced", "Widowed"]
 
-# ----------------------------
-# Create required folders
-# ----------------------------
-os.makedirs("data", exist_ok=True)
-os.makedirs("models", exist_ok=True)
 
 # ----------------------------
 # Generate synthetic dataset
 # ----------------------------
-np.random.seed(42)
-N = 200  # Number of applicants
+def generate_applicants(n: int = 200, seed: int = 42) -> pd.DataFrame:
+    np.random.seed(seed)
+    data = {
+        "income": np.random.randint(2000, 10000, n),          # Monthly income in AED
+        "family_size": np.random.randint(1, 8, n),           # Number of family members
+        "employment_years": np.random.randint(0, 20, n),     # Years employed
+        "assets": np.random.randint(0, 50000, n),            # Total assets in AED
+        "age": np.random.randint(18, 65, n)                  # Applicant age
+    }
+    df = pd.DataFrame(data)
 
-data = {
-    "income": np.random.randint(2000, 10000, N),          # Monthly income in AED
-    "family_size": np.random.randint(1, 8, N),           # Number of family members
-    "employment_years": np.random.randint(0, 20, N),     # Years employed
-    "assets": np.random.randint(0, 50000, N),            # Total assets in AED
-    "age": np.random.randint(18, 65, N)                  # Applicant age
-}
+    # ----------------------------
+    # Eligibility rule (synthetic)
+    # ----------------------------
+    # Eligible if income < 5000 OR assets < 10000 AND family_size > 3
+    # (policies/synthetic_labels.json; the API's own rule is policies/support.json)
+    labels = Policy.load("synthetic_labels")
+    df["eligible"] = labels.evaluate({c: df[c].to_numpy(dtype=np.float64) for c in FEATURES})
+    df["eligible"] = df["eligible"].astype(int)  # 1 = eligible, 0 = not eligible
+    return df
 
-df = pd.DataFrame(data)
 
 # ----------------------------
-# Eligibility rule (synthetic)
+# Synthetic applicant documents
 # ----------------------------
-# Eligible if income < 5000 OR assets < 10000 AND family_size > 3
-df["eligible"] = ((df["income"] < 5000) | (df["assets"] < 10000)) & (df["family_size"] > 3)
-df["eligible"] = df["eligible"].astype(int)  # 1 = eligible, 0 = not eligible
+def _mrz_check_digit(value: str) -> str:
+    weights = [7, 3, 1]
+    total = 0
+    for i, char in enumerate(value):
+        if char.isdigit():
+            v = int(char)
+        elif char.isalpha():
+            v = ord(char.upper()) - 55
+        else:
+            v = 0
+        total += v * weights[i % 3]
+    return str(total % 10)
 
-# ----------------------------
-# Save dataset
-# ----------------------------
-df.to_csv("data/applicants.csv", index=False)
-print("✅ Synthetic dataset saved at data/applicants.csv")
 
-# ----------------------------
-# Train ML model
-# ----------------------------
-X = df[["income", "family_size", "employment_years", "assets", "age"]]
-y = df["eligible"]
+def passport_mrz(surname: str, given: str, passport_no: str, dob: str, sex: str, expiry: str) -> list:
+    """ICAO 9303 TD3 machine-readable zone; dob/expiry as YYMMDD."""
+    name = f"{surname.upper()}<<{given.upper()}".replace(" ", "<")
+    line1 = f"P<ARE{name}".ljust(44, "<")[:44]
+    number = passport_no.ljust(9, "<")[:9]
+    body = (number + _mrz_check_digit(number) + "ARE" + dob + _mrz_check_digit(dob) + sex
+            + expiry + _mrz_check_digit(expiry) + "<" * 14 + "0")
+    composite = body[0:10] + body[13:20] + body[21:43]
+    line2 = body + _mrz_check_digit(composite)
+    return [line1, line2]
 
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
 
-model = RandomForestClassifier(n_estimators=100, random_state=42)
-model.fit(X_train, y_train)
+def applicant_profile(row: pd.Series, index: int, rng: np.random.Generator) -> dict:
+    """Readable applicant details for one dataset row."""
+    given = FIRST_NAMES[rng.integers(len(FIRST_NAMES))]
+    surname = LAST_NAMES[rng.integers(len(LAST_NAMES))]
+    today = pd.Timestamp.today().normalize()
+    dob = today - pd.DateOffset(years=int(row["age"]), days=int(rng.integers(1, 360)))
+    liabilities = int(rng.integers(0, 20000))
+    return {
+        "applicant_id": f"APP{index:06d}",
+        "name": f"{given} {surname}",
+        "given_name": given,
+        "surname": surname,
+        "age": int(row["age"]),
+        "dob": dob,
+        "gender": "Male" if rng.random() < 0.5 else "Female",
+        "marital_status": MARITAL[rng.integers(len(MARITAL))],
+        "employment_status": EMPLOYMENT[rng.integers(len(EMPLOYMENT))],
+        "employment_years": int(row["employment_years"]),
+        "monthly_income": int(row["income"]),
+        "family_members": int(row["family_size"]),
+        "assets": int(row["assets"]),
+        "liabilities": liabilities,
+        "address": f"Villa {rng.integers(1, 300)}, Street {rng.integers(1, 90)}, Abu Dhabi",
+        "passport_no": f"P{rng.integers(10**7, 10**8)}",
+    }
 
-# ----------------------------
-# Save trained model
-# ----------------------------
-joblib.dump(model, "models/eligibility_model.joblib")
-print("✅ Random Forest model trained and saved at models/eligibility_model.joblib")
+
+def document_texts(profile: dict, statement_months: int = 3, rng: np.random.Generator = None) -> dict:
+    """Text content of the four documents, keyed like the front end sends them."""
+    rng = rng or np.random.default_rng(0)
+    dob = profile["dob"]
+    expiry = pd.Timestamp.today() + pd.DateOffset(years=5)
+    basic = int(profile["monthly_income"] * 0.6)
+    allowances = profile["monthly_income"] - basic
+
+    application = "\n".join([
+        "SOCIAL SUPPORT APPLICATION FORM",
+        f"Name: {profile['name']}",
+        f"Age: {profile['age']}",
+        f"Gender: {profile['gender']}",
+        f"Marital Status: {profile['marital_status']}",
+        f"Employment Status: {profile['employment_status']}",
+        f"Years of Employment: {profile['employment_years']}",
+        f"Monthly Income (AED): {profile['monthly_income']:,}",
+        f"Family Members: {profile['family_members']}",
+        f"Address: {profile['address']}",
+        f"Total Assets (AED): {profile['assets']:,}",
+        f"Total Liabilities (AED): {profile['liabilities']:,}",
+    ])
+
+    passport = "\n".join([
+        "UNITED ARAB EMIRATES",
+        "PASSPORT",
+        f"Passport No: {profile['passport_no']}",
+        f"Surname: {profile['surname'].upper()}",
+        f"Given Names: {profile['given_name'].upper()}",
+        f"Sex: {profile['gender'][0]}",
+        f"Date of Birth: {dob:%d/%m/%Y}",
+        f"Date of Expiry: {expiry:%d/%m/%Y}",
+        *passport_mrz(profile["surname"], profile["given_name"], profile["passport_no"],
+                      f"{dob:%y%m%d}", profile["gender"][0], f"{expiry:%y%m%d}"),
+    ])
+
+    salary_slip = "\n".join([
+        "SALARY SLIP",
+        f"Employee Name: {profile['name']}",
+        f"Month: {pd.Timestamp.today():%B %Y}",
+        f"Basic Salary: {basic:,}",
+        f"Allowances: {allowances:,}",
+        "Deductions: 0",
+        f"Net Salary: {profile['monthly_income']:,}",
+    ])
+
+    lines = ["BANK STATEMENT", f"Account Holder: {profile['name']}",
+             "Date        Description                  Debit      Credit     Balance"]
+    balance = float(profile["assets"])
+    start = pd.Timestamp.today().normalize() - pd.DateOffset(months=statement_months)
+    for month in range(statement_months):
+        month_start = start + pd.DateOffset(months=month)
+        day = month_start + pd.DateOffset(days=1)
+        balance += profile["monthly_income"]
+        lines.append(f"{day:%d/%m/%Y}  SALARY TRANSFER                         "
+                     f"{profile['monthly_income']:>9,.2f}  {balance:>10,.2f}")
+        for offset in sorted(rng.integers(2, 28, int(rng.integers(4, 10)))):
+            day = month_start + pd.DateOffset(days=int(offset))
+            amount = float(rng.integers(50, 1500))
+            balance -= amount
+            lines.append(f"{day:%d/%m/%Y}  POS PURCHASE                 {amount:>9,.2f}"
+                         f"             {balance:>10,.2f}")
+    bank_statement = "\n".join(lines)
+
+    return {
+        "application_form": application,
+        "passport": passport,
+        "salary_slip": salary_slip,
+        "bank_statement": bank_statement,
+    }
+
+
+def _font(size: int):
+    from PIL import ImageFont
+    try:
+        return ImageFont.load_default(size=size)
+    except TypeError:  # Pillow < 10.1
+        return ImageFont.load_default()
+
+
+def render_image(text: str, path: str, width: int = 1240, size: int = 28, photo: bool = False,
+                 rng: np.random.Generator = None) -> None:
+    """Clean scan-like image, or a phone-photo look (tilt, background, shading, blur) when photo=True."""
+    from PIL import Image, ImageDraw, ImageFilter
+    lines = text.splitlines()
+    line_height = int(size * 1.5)
+    img = Image.new("L", (width, 80 + line_height * len(lines)), color=255)
+    draw = ImageDraw.Draw(img)
+    font = _font(size)
+    for i, line in enumerate(lines):
+        draw.text((40, 40 + i * line_height), line, fill=0, font=font)
+
+    if photo:
+        rng = rng or np.random.default_rng(0)
+        border = width // 6
+        canvas = Image.new("L", (img.width + 2 * border, img.height + 2 * border), color=int(rng.integers(60, 120)))
+        canvas.paste(img, (border, border))
+        canvas = canvas.rotate(float(rng.uniform(-4, 4)), expand=True, fillcolor=canvas.getpixel((0, 0)),
+                               resample=Image.BICUBIC)
+        # Light falling off towards one side, sensor noise, slight defocus
+        shade = np.linspace(1.0, float(rng.uniform(0.6, 0.85)), canvas.width)[np.newaxis, :]
+        pixels = np.asarray(canvas, dtype=np.float32) * shade + rng.normal(0, 8, (canvas.height, canvas.width))
+        canvas = Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8)).filter(ImageFilter.GaussianBlur(1.2))
+        scale = float(rng.uniform(1.5, 2.5))  # phone cameras capture far more pixels than needed
+        img = canvas.resize((int(canvas.width * scale), int(canvas.height * scale)), Image.BICUBIC)
+        img.save(path, quality=75)
+        return
+    img.save(path)
+
+
+def render_pdf(text: str, path: str, scanned: bool = False, lines_per_page: int = 60, dpi: int = 150) -> None:
+    """Text-layer PDF, or image-only pages (like a scan) when scanned=True."""
+    import fitz
+    lines = text.splitlines()
+    doc = fitz.open()
+    out = fitz.open() if scanned else doc
+    for start in range(0, max(len(lines), 1), lines_per_page):
+        page = doc.new_page()
+        page.insert_text((36, 48), "\n".join(lines[start:start + lines_per_page]), fontsize=9, fontname="cour")
+        if scanned:
+            pix = page.get_pixmap(dpi=dpi, colorspace=fitz.csGRAY)
+            out.new_page(width=page.rect.width, height=page.rect.height).insert_image(page.rect, pixmap=pix)
+    out.save(path)
+    out.close()
+    if scanned:
+        doc.close()
+
+
+def render_documents(profile: dict, out_dir: str, scanned: bool = False, statement_months: int = 3,
+                     rng: np.random.Generator = None, photos: bool = False) -> dict:
+    """Write one applicant's form, passport, salary slip and bank statement; return their paths."""
+    texts = document_texts(profile, statement_months, rng)
+    folder = os.path.join(out_dir, profile["applicant_id"])
+    os.makedirs(folder, exist_ok=True)
+    paths = {
+        "application_form": os.path.join(folder, "application_form.pdf"),
+        "passport": os.path.join(folder, "passport.jpg"),
+        "salary_slip": os.path.join(folder, "salary_slip.jpg"),
+        "bank_statement": os.path.join(folder, "bank_statement.pdf"),
+    }
+    render_pdf(texts["application_form"], paths["application_form"], scanned=scanned)
+    render_image(texts["passport"], paths["passport"], photo=photos, rng=rng)
+    render_image(texts["salary_slip"], paths["salary_slip"], photo=photos, rng=rng)
+    render_pdf(texts["bank_statement"], paths["bank_statement"], scanned=scanned)
+    return {"paths": paths, "texts": texts}
+
+
+def generate_documents(df: pd.DataFrame, out_dir: str, count: int, scanned: bool = False,
+                       statement_months: int = 3, seed: int = 42, photos: bool = False) -> str:
+    """Render documents for the first `count` rows and write a manifest.jsonl next to them."""
+    rng = np.random.default_rng(seed)
+    os.makedirs(out_dir, exist_ok=True)
+    manifest_path = os.path.join(out_dir, "manifest.jsonl")
+    with open(manifest_path, "w") as manifest:
+        for index, row in df.head(count).iterrows():
+            profile = applicant_profile(row, index, rng)
+            rendered = render_documents(profile, out_dir, scanned, statement_months, rng, photos)
+            record = {k: v for k, v in profile.items() if k != "dob"}
+            # Paths are stored relative to the manifest's folder
+            paths = {k: os.path.relpath(v, out_dir) for k, v in rendered["paths"].items()}
+            record.update(dob=f"{profile['dob']:%Y-%m-%d}", eligible=int(row["eligible"]),
+                          paths=paths, texts=rendered["texts"])
+            manifest.write(json.dumps(record) + "\n")
+    return manifest_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate the synthetic dataset, model and applicant documents.")
+    parser.add_argument("--rows", type=int, default=200, help="Number of applicants")
+    parser.add_argument("--documents", type=int, default=0, help="Also render documents for this many applicants")
+    parser.add_argument("--out", default=os.path.join("data", "synthetic"), help="Folder for rendered documents")
+    parser.add_argument("--scanned", action="store_true", help="Render PDFs as image-only pages")
+    parser.add_argument("--photos", action="store_true", help="Render passport/salary slip like phone photos")
+    parser.add_argument("--statement-months", type=int, default=3)
+    parser.add_argument("--skip-model", action="store_true", help="Keep the existing CSV and model")
+    parser.add_argument("--model", default="forest", help="Model kind to train (see backend/training.py)")
+    args = parser.parse_args()
+
+    # ----------------------------
+    # Create required folders
+    # ----------------------------
+    os.makedirs("data", exist_ok=True)
+    os.makedirs("models", exist_ok=True)
+
+    df = generate_applicants(args.rows)
+
+    if not args.skip_model:
+        # ----------------------------
+        # Save dataset
+        # ----------------------------
+        df.to_csv("data/applicants.csv", index=False)
+        print("✅ Synthetic dataset saved at data/applicants.csv")
+
+        # ----------------------------
+        # Train, version and promote the model (backend/training.py)
+        # ----------------------------
+        sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+        from training import run
+        run("data/applicants.csv", args.model, promote=True)
+
+    if args.documents:
+        manifest = generate_documents(df, args.out, args.documents, args.scanned, args.statement_months,
+                                      photos=args.photos)
+        print(f"✅ Documents for {args.documents} applicants saved, manifest at {manifest}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,23 +1,50 @@
 import os
-from utils.ocr_utils import extract_text_from_file
+import uuid
+from utils.ocr_utils import extract_texts_from_buffers
+
+# Keep a copy of every upload under UPLOAD_DIR/<request id>/ (off when empty)
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", "")
+
+
+def document_key(file_name):
+    name = file_name.lower()
+    if "application" in name:
+        return "application_form"
+    elif "passport" in name:
+        return "passport"
+    elif "salary" in name:
+        return "salary_slip"
+    elif "bank" in name:
+        return "bank_statement"
+    return None
+
+
+def persist_uploads(files: dict, upload_dir: str = UPLOAD_DIR, request_id: str = None) -> str:
+    """Write {file_name: bytes} to a directory of its own, so concurrent requests never collide."""
+    folder = os.path.join(upload_dir, request_id or uuid.uuid4().hex)
+    os.makedirs(folder, exist_ok=True)
+    for file_name, data in files.items():
+        with open(os.path.join(folder, os.path.basename(file_name)), "wb") as f:
+            f.write(data)
+    return folder
+
+
+def texts_from_uploads(files: dict, upload_dir: str = UPLOAD_DIR, request_id: str = None) -> dict:
+    """OCR {file_name: bytes} in memory and key the texts by document type."""
+    if upload_dir:
+        persist_uploads(files, upload_dir, request_id)
+
+    # OCR the form, passport, salary slip and bank statement in parallel
+    texts = extract_texts_from_buffers(files, doc_types={name: document_key(name) for name in files})
 
-def process_uploaded_files(uploaded_files):
     info = {}
-    for file in uploaded_files:
-        os.makedirs("data", exist_ok=True)
-        file_path = os.path.join("data", file.name)
-        with open(file_path, "wb") as f:
-            f.write(file.getbuffer())
-        
-        text = extract_text_from_file(file_path)
-
-        if "application" in file.name.lower():
-            info["application_form"] = text
-        elif "passport" in file.name.lower():
-            info["passport"] = text
-        elif "salary" in file.name.lower():
-            info["salary_slip"] = text 
-        elif "bank" in file.name.lower():
-            info["bank_statement"] = text
+    for file_name, text in texts.items():
+        key = document_key(file_name)
+        if key:
+            info[key] = text
 
     return info
+
+
+def process_uploaded_files(uploaded_files):
+    return texts_from_uploads({file.name: file.getvalue() for file in uploaded_files})
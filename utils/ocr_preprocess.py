@@ -0,0 +1,114 @@
+# utils/ocr_preprocess.py
+"""
+Image clean-up before Tesseract.
+
+Photos and scans are brought to a fixed resolution, flattened to grayscale,
+binarised, deskewed and cropped to the text, then split into regions with a
+page-segmentation mode suited to the document type (the passport MRZ band is
+recognised on its own with an MRZ-only character whitelist).
+"""
+import numpy as np
+from PIL import Image, ImageFilter
+
+# Physical page width in inches, used to estimate the resolution of phone
+# photos (their DPI metadata is usually a meaningless 72)
+PAGE_WIDTH_IN = {"passport": 4.92}  # TD3 data page, 125 mm
+DEFAULT_PAGE_WIDTH_IN = 8.27        # A4
+
+# Tesseract page segmentation mode per document type
+#   3 automatic layout, 4 one column of lines (forms, slips), 6 uniform block (tables)
+PSM = {"application_form": 4, "salary_slip": 4, "bank_statement": 6, "passport": 3}
+DEFAULT_PSM = 3
+
+# Bottom share of a passport data page holding the two MRZ lines
+MRZ_BAND = 0.28
+MRZ_CONFIG = "--psm 6 -c tessedit_char_whitelist=ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789<"
+
+MAX_UPSCALE = 3.0
+DESKEW_MAX_DEGREES = 5.0
+
+
+def rescale(img: Image.Image, doc_type: str = None, dpi: float = None, target_dpi: int = 300) -> Image.Image:
+    """Resample to target_dpi; without a known dpi, estimate it from the page width."""
+    if not dpi:
+        dpi = img.width / PAGE_WIDTH_IN.get(doc_type, DEFAULT_PAGE_WIDTH_IN)
+    scale = min(target_dpi / dpi, MAX_UPSCALE)
+    if 0.87 < scale < 1.15:
+        return img
+    size = (max(int(img.width * scale), 1), max(int(img.height * scale), 1))
+    return img.resize(size, Image.LANCZOS if scale < 1 else Image.BICUBIC)
+
+
+def flatten_background(gray: Image.Image) -> Image.Image:
+    """Divide out uneven lighting (shadows, phone vignetting)."""
+    radius = max(gray.width, gray.height) // 40 or 1
+    background = np.asarray(gray.filter(ImageFilter.BoxBlur(radius)), dtype=np.float32)
+    pixels = np.asarray(gray, dtype=np.float32)
+    flat = np.clip(pixels / np.maximum(background, 1.0) * 255.0, 0, 255)
+    return Image.fromarray(flat.astype(np.uint8))
+
+
+def otsu_threshold(pixels: np.ndarray) -> int:
+    hist = np.bincount(pixels.ravel(), minlength=256).astype(np.float64)
+    weight = np.cumsum(hist)
+    mean = np.cumsum(hist * np.arange(256))
+    total, total_mean = weight[-1], mean[-1]
+    between = (total_mean * weight - mean * total) ** 2 / np.maximum(weight * (total - weight), 1e-9)
+    return int(np.argmax(between))
+
+
+def binarize(gray: Image.Image) -> Image.Image:
+    pixels = np.asarray(gray)
+    return Image.fromarray(np.where(pixels > otsu_threshold(pixels), 255, 0).astype(np.uint8))
+
+
+def skew_angle(binary: Image.Image) -> float:
+    """Rotation (degrees) that makes text rows sharpest in the horizontal projection."""
+    small = binary.copy()
+    small.thumbnail((800, 800))
+    ink = Image.fromarray(255 - np.asarray(small))
+
+    def score(angle):
+        rows = np.asarray(ink.rotate(angle, expand=True, fillcolor=0), dtype=np.float32).sum(axis=1)
+        return float(np.square(np.diff(rows)).sum())
+
+    coarse = max(np.arange(-DESKEW_MAX_DEGREES, DESKEW_MAX_DEGREES + 0.01, 0.5), key=score)
+    return float(max(np.arange(coarse - 0.4, coarse + 0.41, 0.1), key=score))
+
+
+def deskew(binary: Image.Image) -> Image.Image:
+    angle = skew_angle(binary)
+    if abs(angle) < 0.2:
+        return binary
+    return binary.rotate(angle, expand=True, fillcolor=255, resample=Image.BICUBIC)
+
+
+def crop_to_text(binary: Image.Image, margin: int = 20) -> Image.Image:
+    """Crop to rows/columns with some ink; all-dark edges (table or photo background) are dropped."""
+    ink = np.asarray(binary) < 128
+    rows, cols = ink.mean(axis=1), ink.mean(axis=0)
+    text_rows = np.flatnonzero((rows > 0.002) & (rows < 0.6))
+    text_cols = np.flatnonzero((cols > 0.002) & (cols < 0.6))
+    if not len(text_rows) or not len(text_cols):
+        return binary
+    top, bottom = max(text_rows[0] - margin, 0), min(text_rows[-1] + margin + 1, binary.height)
+    left, right = max(text_cols[0] - margin, 0), min(text_cols[-1] + margin + 1, binary.width)
+    return binary.crop((left, top, right, bottom))
+
+
+def prepare(img: Image.Image, doc_type: str = None, dpi: float = None, target_dpi: int = 300) -> Image.Image:
+    gray = img.convert("L")
+    gray = rescale(gray, doc_type, dpi, target_dpi)
+    binary = binarize(flatten_background(gray))
+    return crop_to_text(deskew(binary))
+
+
+def regions(img: Image.Image, doc_type: str = None, dpi: float = None, target_dpi: int = 300) -> list:
+    """[(image, tesseract config)] to recognise, in reading order."""
+    page = prepare(img, doc_type, dpi, target_dpi)
+    config = f"--psm {PSM.get(doc_type, DEFAULT_PSM)}"
+    if doc_type != "passport":
+        return [(page, config)]
+    split = int(page.height * (1 - MRZ_BAND))
+    return [(page.crop((0, 0, page.width, split)), config),
+            (page.crop((0, split, page.width, page.height)), MRZ_CONFIG)]
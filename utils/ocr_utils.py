@@ -1,50 +1,270 @@
 # utils/ocr_utils.py
-import fitz  # PyMuPDF
-import pytesseract
-from PIL import Image
+# PyMuPDF, pytesseract and PIL are imported on first use (see preload), so
+# importing this module stays cheap for the API and for pool workers
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 import io
 import os
+from utils.cache import get_cache, hash_key
 
-# 🧠 Function to extract text from PDF or image file
-def extract_text_from_file(file_path: str) -> str:
+# Worker processes used for Tesseract. 1 disables the pool and OCRs in-process.
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", str(os.cpu_count() or 1)))
+
+# Resolution scanned PDF pages are rasterised at, and photos resampled to,
+# before OCR (Tesseract is most accurate around 300)
+OCR_DPI = int(os.getenv("OCR_DPI", "300"))
+
+# Deskew / binarise / crop and per-document page segmentation (ocr_preprocess.py)
+OCR_PREPROCESS = os.getenv("OCR_PREPROCESS", "1") != "0"
+
+# Bank statement PDFs are read page by page into a short digest of income
+# figures (utils/bank_statement.py) instead of being kept as full text
+STATEMENT_DIGEST = os.getenv("STATEMENT_DIGEST", "1") != "0"
+
+IMAGE_EXTENSIONS = [".png", ".jpg", ".jpeg"]
+
+_pool = None
+_pool_workers = 0
+
+# Plan marker for statements read through iter_pdf_pages
+_STATEMENT = object()
+
+
+def preload() -> None:
+    """Import the OCR libraries now instead of on the first document."""
+    import fitz  # noqa: F401  PyMuPDF
+    import pytesseract  # noqa: F401
+    from PIL import Image  # noqa: F401
+
+
+def get_ocr_pool(workers: int = OCR_WORKERS) -> ProcessPoolExecutor:
+    """Shared process pool, kept alive across Streamlit reruns and requests."""
+    global _pool, _pool_workers
+    if _pool is None or _pool_workers != workers:
+        if _pool is not None:
+            _pool.shutdown(wait=False)
+        _pool = ProcessPoolExecutor(max_workers=workers)
+        _pool_workers = workers
+    return _pool
+
+
+# ---- Worker functions (run inside the pool, must stay picklable) ----
+
+def _recognise(img, doc_type: str, dpi, target_dpi: int, preprocess: bool) -> str:
+    import pytesseract
+    if not preprocess:
+        return pytesseract.image_to_string(img)
+    from utils.ocr_preprocess import regions
+    parts = [pytesseract.image_to_string(region, config=config)
+             for region, config in regions(img, doc_type, dpi, target_dpi)]
+    return "\n".join(part.strip() for part in parts)
+
+
+def _ocr_pixmap(samples: bytes, width: int, height: int, doc_type: str = None,
+                dpi: int = OCR_DPI, preprocess: bool = OCR_PREPROCESS) -> str:
+    from PIL import Image
+    # Raw grayscale pixmap bytes straight from PyMuPDF, no PNG encode/decode
+    img = Image.frombytes("L", (width, height), samples)
+    return _recognise(img, doc_type, dpi, dpi, preprocess)
+
+
+def _ocr_image_bytes(data: bytes, doc_type: str = None, dpi: int = OCR_DPI,
+                     preprocess: bool = OCR_PREPROCESS) -> str:
+    from PIL import Image
+    with Image.open(io.BytesIO(data)) as img:
+        # Photo resolution is estimated from the document type, not known
+        return _recognise(img, doc_type, None, dpi, preprocess)
+
+
+# ---- Job planning ----
+
+def _plan_jobs(name: str, data: bytes, dpi: int, doc_type: str = None, preprocess: bool = OCR_PREPROCESS) -> list:
     """
-    Extract text from a PDF or image file using PyMuPDF and Tesseract OCR.
-    Supports both scanned PDFs and image uploads.
+    Split a document (file name + content) into OCR jobs. Each job is either
+    already-extracted text (PDF pages with a text layer) or a (function, args)
+    pair for the pool.
     """
-    try:
-        text = ""
-        file_ext = os.path.splitext(file_path)[1].lower()
+    file_ext = os.path.splitext(name)[1].lower()
+
+    # ---- Case 1: PDF ----
+    if file_ext == ".pdf":
+        import fitz  # PyMuPDF
+        jobs = []
+        with fitz.open(stream=data, filetype="pdf") as pdf:
+            for page in pdf:
+                # Try to extract text directly
+                page_text = page.get_text("text")
 
-        # ---- Case 1: PDF ----
-        if file_ext == ".pdf":
-            with fitz.open(file_path) as pdf:
-                for page_index in range(len(pdf)):
-                    page = pdf.load_page(page_index)
+                # If no text (i.e., scanned), rasterise for OCR
+                if page_text.strip():
+                    jobs.append(page_text)
+                else:
+                    pix = page.get_pixmap(dpi=dpi, colorspace=fitz.csGRAY, alpha=False)
+                    jobs.append((_ocr_pixmap, (pix.samples, pix.width, pix.height, doc_type, dpi, preprocess)))
+        return jobs
 
-                    # Try to extract text directly
-                    page_text = page.get_text("text")
+    # ---- Case 2: Image ----
+    if file_ext in IMAGE_EXTENSIONS:
+        return [(_ocr_image_bytes, (data, doc_type, dpi, preprocess))]
 
-                    # If no text (i.e., scanned), use OCR on image
-                    if not page_text.strip():
-                        pix = page.get_pixmap()
-                        img = Image.open(io.BytesIO(pix.tobytes("png")))
-                        page_text = pytesseract.image_to_string(img)
+    raise ValueError("Unsupported file type. Please upload PDF or image.")
 
-                    text += page_text + "\n"
 
-        # ---- Case 2: Image ----
-        elif file_ext in [".png", ".jpg", ".jpeg"]:
-            img = Image.open(file_path)
-            text = pytesseract.image_to_string(img)
+def iter_pdf_pages(data: bytes, dpi: int = OCR_DPI, doc_type: str = None, preprocess: bool = OCR_PREPROCESS,
+                   pool: ProcessPoolExecutor = None, window: int = 8):
+    """
+    Page texts in order, one page open at a time. Pages without a text layer
+    are OCRed (on the pool when given, at most `window` pages in flight).
+    """
+    import fitz  # PyMuPDF
+    pending = deque()
+    with fitz.open(stream=data, filetype="pdf") as pdf:
+        for page in pdf:
+            text = page.get_text("text")
+            if text.strip():
+                pending.append(text)
+            else:
+                pix = page.get_pixmap(dpi=dpi, colorspace=fitz.csGRAY, alpha=False)
+                args = (pix.samples, pix.width, pix.height, doc_type, dpi, preprocess)
+                pending.append(pool.submit(_ocr_pixmap, *args) if pool is not None else _ocr_pixmap(*args))
+            while pending and (isinstance(pending[0], str) or len(pending) > window):
+                slot = pending.popleft()
+                yield slot if isinstance(slot, str) else slot.result()
+    while pending:
+        slot = pending.popleft()
+        yield slot if isinstance(slot, str) else slot.result()
 
-        else:
-            raise ValueError("Unsupported file type. Please upload PDF or image.")
 
-        if not text.strip():
-            raise ValueError("No text extracted — check file quality or format.")
+def _statement_text(name: str, data: bytes, dpi: int, preprocess: bool, pool) -> str:
+    from utils.bank_statement import StatementParser, parser_digest
+    parser = StatementParser()
+    # Page texts are kept only until the first transaction parses, so a
+    # statement without a recognised table falls back without a second OCR pass
+    pages = []
+    for page in iter_pdf_pages(data, dpi, "bank_statement", preprocess, pool):
+        parser.feed(page.splitlines())
+        if pages is not None and parser.rows:
+            pages = None
+        elif pages is not None:
+            pages.append(page)
+    digest = parser_digest(parser)
+    if digest is not None:
+        return digest
+    if pages is None:
+        # Rows parsed but nothing usable in them (rare): read the text again
+        pages = list(iter_pdf_pages(data, dpi, "bank_statement", preprocess, pool))
+    # No transaction table recognised: keep the statement's text as before
+    return _join_pages(name, pages)
 
-        return text.strip()
 
-    except Exception as e:
-        print(f"Error extracting text from {file_path}: {e}")
+def _join_pages(file_path: str, pages: list) -> str:
+    text = "\n".join(pages)
+    if not text.strip():
+        print(f"Error extracting text from {file_path}: No text extracted — check file quality or format.")
         return ""
+    return text.strip()
+
+
+def extract_texts_from_buffers(documents: dict, workers: int = OCR_WORKERS, dpi: int = OCR_DPI,
+                               doc_types: dict = None, preprocess: bool = OCR_PREPROCESS) -> dict:
+    """
+    OCR several in-memory documents at once, {name: bytes} -> {name: text}.
+    The name only needs the right extension; doc_types ({name: document
+    type}) picks the page segmentation and regions used for each. Pages of every document are
+    fanned out over one process pool, so a multi-page scan and a passport
+    photo are recognised in parallel; failed documents map to "".
+    Results are cached by content, so re-uploads skip OCR entirely.
+    """
+    cache = get_cache()
+    results = {}
+    cache_keys = {}
+    plans = {}
+    doc_types = doc_types or {}
+    for name, data in documents.items():
+        doc_type = doc_types.get(name)
+        digest = STATEMENT_DIGEST and doc_type == "bank_statement" and name.lower().endswith(".pdf")
+        try:
+            if cache is not None:
+                cache_keys[name] = hash_key(data, dpi, doc_type, preprocess, *(["digest"] if digest else []))
+                cached = cache.get("ocr", cache_keys[name])
+                if cached is not None:
+                    results[name] = cached
+                    continue
+            # Statements are streamed while the pool works on the other documents
+            plans[name] = _STATEMENT if digest else _plan_jobs(name, data, dpi, doc_type, preprocess)
+        except Exception as e:
+            print(f"Error extracting text from {name}: {e}")
+            plans[name] = None
+
+    pool = get_ocr_pool(workers) if workers > 1 else None
+
+    # Submit everything first, then collect in page order
+    pending = {}
+    for name, jobs in plans.items():
+        if jobs is None or jobs is _STATEMENT:
+            continue
+        slots = []
+        for job in jobs:
+            if isinstance(job, str):
+                slots.append(job)
+            elif pool is None:
+                slots.append(job)
+            else:
+                func, args = job
+                slots.append(pool.submit(func, *args))
+        pending[name] = slots
+
+    for name in documents:
+        if name in results:
+            continue
+        slots = pending.get(name)
+        if slots is None and plans.get(name) is not _STATEMENT:
+            results[name] = ""
+            continue
+        try:
+            if slots is None:
+                results[name] = _statement_text(name, documents[name], dpi, preprocess, pool)
+                if cache is not None and results[name]:
+                    cache.set("ocr", cache_keys[name], results[name])
+                continue
+            pages = []
+            for slot in slots:
+                if isinstance(slot, str):
+                    pages.append(slot)
+                elif isinstance(slot, tuple):
+                    func, args = slot
+                    pages.append(func(*args))
+                else:
+                    pages.append(slot.result())
+            results[name] = _join_pages(name, pages)
+            if cache is not None and results[name]:
+                cache.set("ocr", cache_keys[name], results[name])
+        except Exception as e:
+            print(f"Error extracting text from {name}: {e}")
+            results[name] = ""
+    return results
+
+
+def extract_texts(file_paths: list, workers: int = OCR_WORKERS, dpi: int = OCR_DPI,
+                  doc_types: dict = None, preprocess: bool = OCR_PREPROCESS) -> dict:
+    """OCR files on disk, {file_path: text}. Each file is read once."""
+    documents = {}
+    for file_path in file_paths:
+        try:
+            with open(file_path, "rb") as f:
+                documents[file_path] = f.read()
+        except OSError as e:
+            print(f"Error extracting text from {file_path}: {e}")
+    results = extract_texts_from_buffers(documents, workers=workers, dpi=dpi,
+                                         doc_types=doc_types, preprocess=preprocess)
+    return {file_path: results.get(file_path, "") for file_path in file_paths}
+
+
+# 🧠 Function to extract text from PDF or image file
+def extract_text_from_file(file_path: str, workers: int = OCR_WORKERS, dpi: int = OCR_DPI) -> str:
+    """
+    Extract text from a PDF or image file using PyMuPDF and Tesseract OCR.
+    Supports both scanned PDFs and image uploads. Scanned pages are OCRed
+    in parallel when `workers` > 1.
+    """
+    return extract_texts([file_path], workers=workers, dpi=dpi)[file_path]
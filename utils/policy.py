@@ -0,0 +1,422 @@
+# utils/policy.py
+"""
+Declarative eligibility policies, compiled to vectorised NumPy predicates.
+
+A policy is a JSON file in policies/: named parameters (thresholds and the
+benefit schedule) and a rule of nested "all" / "any" / "not" clauses whose
+leaves compare a feature with a number or a parameter:
+
+    {"all": [{"feature": "income", "op": "<", "value": "max_income"},
+             {"feature": "family_size", "op": ">=", "value": "min_family"}]}
+
+The same compiled rule serves one applicant (Policy.check, behind the rule
+fallback in scoring.py) and whole caseloads (Policy.evaluate over column
+arrays). Policy.sweep reruns it over a grid of parameter values and reports
+eligible households and monthly cost against the current parameters; a sweep
+of one threshold is answered from a single sort of the caseload.
+
+    python utils/policy.py data/applicants.csv --sweep max_income=2000:12000:1000
+    python utils/policy.py caseload.csv --policy synthetic_labels --sweep family_above=1,2,3,4 --set max_assets=20000
+"""
+import argparse
+import itertools
+import json
+import operator
+import os
+import re
+import time
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+POLICY_DIR = os.getenv("POLICY_DIR", os.path.join(ROOT_DIR, "policies"))
+# The policy the backend's rule fallback applies
+ELIGIBILITY_POLICY = os.getenv("ELIGIBILITY_POLICY", "support")
+
+# operator functions work on arrays (caseloads) and plain floats (one applicant) alike
+OPS = {"<": operator.lt, "<=": operator.le, ">": operator.gt, ">=": operator.ge,
+       "==": operator.eq, "!=": operator.ne}
+# Features computed from stored columns
+DERIVED = {"net_assets": ("assets", "liabilities")}
+STORED = ("income", "family_size", "employment_years", "assets", "age", "liabilities")
+FEATURES = set(STORED) | set(DERIVED)
+# Stored columns a caseload or record may leave out
+DEFAULTS = {"liabilities": 0.0, "other_income": 0.0}
+# Extracted field names (see scoring.py) for the feature names
+ALIASES = {"income": "monthly_income", "family_size": "family_members"}
+
+Columns = Dict[str, np.ndarray]
+
+
+class PolicyError(ValueError):
+    """A policy file that can't be compiled, or a caseload it can't run on."""
+
+
+def _number(value, default: float) -> float:
+    """First number in a value ("AED 7,300" -> 7300.0); missing -> default, unreadable -> NaN."""
+    if value is None or value == "":
+        return default
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    match = re.search(r"-?\d[\d,]*(?:\.\d+)?", str(value))
+    return float(match.group(0).replace(",", "")) if match else float("nan")
+
+
+class Policy:
+    def __init__(self, spec: Dict[str, Any]):
+        self.spec = spec
+        self.name = spec.get("name", "policy")
+        self.params = dict(spec.get("params", {}))
+        self.benefit_spec = spec.get("benefit", {})
+        if "rule" not in spec:
+            raise PolicyError(f"policy {self.name}: no rule")
+        self._uses = {}  # param -> leaves comparing against it
+        self._predicate = self._compile(spec["rule"])
+        # Top-level clauses of an "all" rule, for reasons and one-threshold sweeps
+        clauses = spec["rule"].get("all", [spec["rule"]])
+        self._clauses = [(clause, self._compile(clause, register=False)) for clause in clauses]
+        for key in self.benefit_spec.values():
+            self._param(key)
+
+    @classmethod
+    def load(cls, name_or_path: str) -> "Policy":
+        """A policy by name (policies/<name>.json) or by path."""
+        path = name_or_path if name_or_path.endswith(".json") else os.path.join(POLICY_DIR, f"{name_or_path}.json")
+        if not os.path.exists(path):
+            raise PolicyError(f"no policy {name_or_path} ({path})")
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    # ----------------------------
+    # Compilation
+    # ----------------------------
+    def _param(self, value):
+        if isinstance(value, str) and value not in self.params:
+            raise PolicyError(f"policy {self.name}: unknown parameter {value!r}")
+        return value
+
+    def _compile(self, node: Dict[str, Any], register: bool = True):
+        for key, combine in (("all", operator.and_), ("any", operator.or_)):
+            if key in node:
+                parts = [self._compile(child, register) for child in node[key]]
+                if not parts:
+                    raise PolicyError(f"policy {self.name}: empty {key!r}")
+                return self._combine(parts, combine)
+        if "not" in node:
+            part = self._compile(node["not"], register)
+            # ^ True rather than ~, which would turn a plain bool into -1 / -2
+            return lambda columns, params, memo: part(columns, params, memo) ^ True
+
+        feature, op, value = node.get("feature"), node.get("op"), self._param(node.get("value"))
+        if feature not in FEATURES:
+            raise PolicyError(f"policy {self.name}: unknown feature {feature!r} (one of {sorted(FEATURES)})")
+        if op not in OPS:
+            raise PolicyError(f"policy {self.name}: unknown operator {op!r}")
+        if register and isinstance(value, str):
+            self._uses.setdefault(value, []).append(node)
+        compare = OPS[op]
+
+        def leaf(columns, params, memo):
+            threshold = params[value] if isinstance(value, str) else value
+            # Leaves are shared between clauses and between sweep points
+            key = (feature, op, threshold)
+            if key not in memo:
+                memo[key] = compare(self.column(columns, feature, memo), threshold)
+            return memo[key]
+        return leaf
+
+    @staticmethod
+    def _combine(parts, combine):
+        def predicate(columns, params, memo):
+            result = parts[0](columns, params, memo)
+            for part in parts[1:]:
+                result = combine(result, part(columns, params, memo))
+            return result
+        return predicate
+
+    # ----------------------------
+    # Evaluation
+    # ----------------------------
+    @staticmethod
+    def column(columns: Columns, feature: str, memo: Optional[dict] = None) -> np.ndarray:
+        if feature in columns:
+            return columns[feature]
+        if feature not in DERIVED:
+            raise PolicyError(f"caseload has no {feature!r} column")
+        memo = {} if memo is None else memo
+        if feature not in memo:
+            assets, liabilities = DERIVED[feature]
+            memo[feature] = columns[assets] - columns[liabilities]
+        return memo[feature]
+
+    @property
+    def features(self) -> set:
+        """Stored columns the rule and the benefit schedule read."""
+        needed = set()
+
+        def walk(node):
+            for key in ("all", "any"):
+                for child in node.get(key, []):
+                    walk(child)
+            if "not" in node:
+                walk(node["not"])
+            if "feature" in node:
+                needed.update(DERIVED.get(node["feature"], (node["feature"],)))
+        walk(self.spec["rule"])
+        if self.benefit_spec.get("per_member"):
+            needed.add("family_size")
+        return needed
+
+    def resolve(self, params: Optional[Dict[str, float]] = None) -> Dict[str, float]:
+        for key in params or {}:
+            self._param(key)
+        return {**self.params, **(params or {})}
+
+    def evaluate(self, columns: Columns, params: Optional[Dict[str, float]] = None,
+                 memo: Optional[dict] = None) -> np.ndarray:
+        """Boolean eligibility per row of `columns` ({feature: array})."""
+        return np.asarray(self._predicate(columns, self.resolve(params), {} if memo is None else memo))
+
+    def _amount(self, key: str, params: Dict[str, float]) -> float:
+        value = self.benefit_spec.get(key) or 0
+        return float(params[value] if isinstance(value, str) else value)
+
+    def benefit(self, columns: Columns, params: Optional[Dict[str, float]] = None) -> np.ndarray:
+        """Monthly benefit per row if eligible: base + per_member * family_size, capped."""
+        params = self.resolve(params)
+        rows = len(next(iter(columns.values())))
+        amount = np.full(rows, self._amount("base", params))
+        if self._amount("per_member", params):
+            amount = amount + self._amount("per_member", params) * np.nan_to_num(columns["family_size"])
+        if self._amount("cap", params):
+            amount = np.minimum(amount, self._amount("cap", params))
+        return amount
+
+    def describe(self, node: Dict[str, Any], params: Dict[str, float]) -> str:
+        for key in ("all", "any"):
+            if key in node:
+                joiner = " and " if key == "all" else " or "
+                return "(" + joiner.join(self.describe(child, params) for child in node[key]) + ")"
+        if "not" in node:
+            return f"not {self.describe(node['not'], params)}"
+        value = params[node["value"]] if isinstance(node["value"], str) else node["value"]
+        return f"{node['feature']} {node['op']} {value:g}"
+
+    def check(self, record: Dict[str, Any], params: Optional[Dict[str, float]] = None) -> Dict[str, Any]:
+        """
+        One applicant, as a dict with feature names or extracted field names
+        (monthly_income plus optional other_income, family_members, ...).
+        Returns {"eligible", "failed": [clauses not met], "policy"}.
+        """
+        params = self.resolve(params)
+        columns = record_columns(record)
+        memo = {}
+        eligible = bool(self._predicate(columns, params, memo))
+        failed = [] if eligible else [self.describe(clause, params) for clause, predicate in self._clauses
+                                      if not predicate(columns, params, memo)]
+        return {"eligible": eligible, "failed": failed, "policy": self.name}
+
+    # ----------------------------
+    # What-if runs
+    # ----------------------------
+    def sweep(self, columns: Columns, grid: Dict[str, Iterable[float]],
+              params: Optional[Dict[str, float]] = None) -> pd.DataFrame:
+        """
+        Eligible households and monthly cost for every combination of the
+        values in `grid` ({param: values}), with the changes against the
+        current parameters (the policy's own, overridden by `params`).
+        """
+        base = self.resolve(params)
+        grid = {self._param(key): [float(v) for v in values] for key, values in grid.items()}
+        memo = {}
+        baseline = self.evaluate(columns, base, memo)
+        amounts = self.benefit(columns, base)
+        base_count, base_cost = int(baseline.sum()), float(amounts[baseline].sum())
+
+        fast = self._threshold_sweep(columns, grid, base, amounts, memo)
+        if fast is not None:
+            counts, costs = fast
+            delta = counts - base_count
+            rows = {next(iter(grid)): next(iter(grid.values())), "eligible": counts,
+                    "gained": np.maximum(delta, 0), "lost": np.maximum(-delta, 0), "monthly_cost": costs}
+            frame = pd.DataFrame(rows)
+        else:
+            benefit_params = {v for v in self.benefit_spec.values() if isinstance(v, str)}
+            records = []
+            for point in itertools.product(*grid.values()):
+                point = dict(zip(grid, point))
+                point_params = {**base, **point}
+                mask = self.evaluate(columns, point_params, memo)
+                point_amounts = self.benefit(columns, point_params) if benefit_params & set(point) else amounts
+                records.append({**point, "eligible": int(mask.sum()),
+                                "gained": int((mask & ~baseline).sum()), "lost": int((baseline & ~mask).sum()),
+                                "monthly_cost": float(point_amounts[mask].sum())})
+            frame = pd.DataFrame.from_records(records, columns=list(grid) + ["eligible", "gained", "lost",
+                                                                             "monthly_cost"])
+        frame["eligible_change"] = frame["eligible"] - base_count
+        frame["cost_change"] = frame["monthly_cost"] - base_cost
+        frame = frame[list(grid) + ["eligible", "eligible_change", "gained", "lost", "monthly_cost", "cost_change"]]
+        frame.attrs.update(policy=self.name, rows=len(baseline), eligible=base_count, monthly_cost=base_cost)
+        return frame
+
+    def _threshold_sweep(self, columns: Columns, grid, base, amounts, memo):
+        """
+        (counts, costs) for a sweep of one threshold that only one top-level
+        clause of an "all" rule compares against, else None. The other
+        clauses are evaluated once; the swept feature of the rows they pass
+        is sorted, and each value is a binary search into it plus a
+        cumulative sum of their benefits.
+        """
+        if len(grid) != 1:
+            return None
+        (param, values), = grid.items()
+        uses = self._uses.get(param, [])
+        top = [clause for clause, _ in self._clauses]
+        if (len(uses) != 1 or uses[0]["op"] not in ("<", "<=", ">", ">=") or not any(uses[0] is c for c in top)
+                or param in self.benefit_spec.values()):
+            return None
+        leaf = uses[0]
+        rest = np.ones(len(amounts), dtype=bool)
+        for clause, predicate in self._clauses:
+            if clause is not leaf:
+                rest &= predicate(columns, base, memo)
+        x = self.column(columns, leaf["feature"], memo)[rest]
+        finite = np.isfinite(x)
+        order = np.argsort(x[finite], kind="stable")
+        xs = x[finite][order]
+        cumulative = np.concatenate([[0.0], np.cumsum(amounts[rest][finite][order])])
+
+        values = np.asarray(values, dtype=float)
+        side = "left" if leaf["op"] in ("<", ">=") else "right"
+        index = np.searchsorted(xs, values, side=side)
+        if leaf["op"] in ("<", "<="):
+            return index, cumulative[index]
+        return len(xs) - index, cumulative[-1] - cumulative[index]
+
+
+def record_columns(record: Dict[str, Any]) -> Dict[str, float]:
+    """Feature values of one applicant dict (feature or extracted field names)."""
+    columns = {}
+    for feature in STORED:
+        value = record.get(feature, record.get(ALIASES.get(feature, feature)))
+        columns[feature] = _number(value, DEFAULTS.get(feature, 0.0))
+    # Like coerce_features: recurring other income counts toward income
+    columns["income"] = columns["income"] + _number(record.get("other_income"), 0.0)
+    return columns
+
+
+def frame_columns(frame: pd.DataFrame, features: Iterable[str]) -> Columns:
+    """Float columns of a caseload frame (feature or extracted column names)."""
+    columns = {}
+    for feature in features:
+        name = next((n for n in (feature, ALIASES.get(feature)) if n in frame), None)
+        if name is None:
+            if feature not in DEFAULTS:
+                raise PolicyError(f"caseload has no {feature!r} column")
+            columns[feature] = np.full(len(frame), DEFAULTS[feature])
+        else:
+            columns[feature] = pd.to_numeric(frame[name], errors="coerce").to_numpy(dtype=np.float64)
+    if "income" in columns and "other_income" in frame:
+        columns["income"] = columns["income"] + pd.to_numeric(frame["other_income"], errors="coerce").fillna(0).to_numpy()
+    return columns
+
+
+def load_caseload(path: str, features: Iterable[str], chunksize: int = 500_000,
+                  max_rows: Optional[int] = None) -> Columns:
+    """Stream the columns a policy needs from a CSV (or Parquet with pyarrow) caseload."""
+    features = set(features)
+    wanted = features | {ALIASES[f] for f in features if f in ALIASES} | {"other_income"}
+    if path.endswith(".parquet"):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise SystemExit(f"Reading Parquet needs pyarrow ({e}); convert to CSV or pip install pyarrow")
+        parquet = pq.ParquetFile(path)
+        present = [c for c in parquet.schema_arrow.names if c in wanted]
+        chunks = (batch.to_pandas() for batch in parquet.iter_batches(batch_size=chunksize, columns=present))
+    else:
+        chunks = pd.read_csv(path, usecols=lambda c: c in wanted, chunksize=chunksize)
+
+    parts, rows = [], 0
+    for chunk in chunks:
+        if max_rows is not None:
+            chunk = chunk.iloc[:max_rows - rows]
+        parts.append(frame_columns(chunk, features))
+        rows += len(chunk)
+        if max_rows is not None and rows >= max_rows:
+            break
+    if not parts:
+        raise PolicyError(f"{path} has no rows")
+    return {feature: np.concatenate([part[feature] for part in parts]) for feature in features}
+
+
+@lru_cache(maxsize=None)
+def get_policy(name: str = ELIGIBILITY_POLICY) -> Policy:
+    """Compiled policy, loaded once per process."""
+    return Policy.load(name)
+
+
+def _values(text: str) -> List[float]:
+    """"2000:12000:1000" (inclusive) or "3,4,5"."""
+    if ":" in text:
+        start, stop, step = (float(v) for v in text.split(":"))
+        return list(np.round(np.arange(start, stop + step / 2, step), 6))
+    return [float(v) for v in text.split(",")]
+
+
+def _assignments(items: List[str]) -> Dict[str, str]:
+    pairs = {}
+    for item in items or []:
+        key, sep, value = item.partition("=")
+        if not sep:
+            raise SystemExit(f"expected PARAM=VALUE, got {item!r}")
+        pairs[key] = value
+    return pairs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="What-if runs of an eligibility policy over a stored caseload")
+    parser.add_argument("source", nargs="?", default=os.path.join(ROOT_DIR, "data", "applicants.csv"),
+                        help="CSV (or .parquet) caseload")
+    parser.add_argument("--policy", default=ELIGIBILITY_POLICY, help="Name in policies/ or a .json path")
+    parser.add_argument("--sweep", action="append", metavar="PARAM=START:STOP:STEP|V1,V2,...",
+                        help="Parameter values to try; several --sweep run every combination")
+    parser.add_argument("--set", action="append", metavar="PARAM=VALUE", help="Change a parameter for the whole run")
+    parser.add_argument("--chunksize", type=int, default=500_000, help="Rows read at a time")
+    parser.add_argument("--max-rows", type=int, default=None, help="Only read this many rows")
+    parser.add_argument("--out", help="Also write the table to this CSV")
+    args = parser.parse_args()
+
+    policy = Policy.load(args.policy)
+    params = {key: float(value) for key, value in _assignments(args.set).items()}
+    grid = {key: _values(value) for key, value in _assignments(args.sweep).items()}
+
+    start = time.perf_counter()
+    columns = load_caseload(args.source, policy.features, args.chunksize, args.max_rows)
+    load_s = time.perf_counter() - start
+    start = time.perf_counter()
+    table = policy.sweep(columns, grid, params)
+    sweep_s = time.perf_counter() - start
+
+    info = table.attrs
+    print(f"📋 Policy {policy.name} over {info['rows']:,} applicants from {args.source} "
+          f"(read {load_s:.1f}s, {max(len(table), 1)} run(s) in {sweep_s:.2f}s)")
+    print(f"   current parameters: {', '.join(f'{k}={v:g}' for k, v in policy.resolve(params).items())}")
+    print(f"   eligible now: {info['eligible']:,} ({info['eligible'] / max(info['rows'], 1):.1%}), "
+          f"monthly cost {info['monthly_cost']:,.0f} AED")
+    if grid:
+        shown = table.copy()
+        for column in ("monthly_cost", "cost_change"):
+            shown[column] = shown[column].map("{:,.0f}".format)
+        print(shown.to_string(index=False))
+    if args.out:
+        table.to_csv(args.out, index=False)
+        print(f"✅ Saved {args.out}")
+
+
+if __name__ == "__main__":
+    main()